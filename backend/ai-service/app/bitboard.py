@@ -0,0 +1,146 @@
+from typing import List
+import random
+
+# Board dimensions (same orientation as the JSON board: row 0 is the top)
+ROWS = 6
+COLS = 7
+
+# Each column uses ROWS + 1 bits: the extra bit on top of every column is a
+# sentinel that stays empty so shifted masks never wrap into the next column.
+COLUMN_HEIGHT = ROWS + 1
+
+BOTTOM_MASK = sum(1 << (col * COLUMN_HEIGHT) for col in range(COLS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+
+# Zobrist keys, one per (player, bit). The seed is fixed so every process
+# computes the same hash for the same position.
+_zobrist_rng = random.Random(0x434F4E4E454354)
+ZOBRIST = [[_zobrist_rng.getrandbits(64) for _ in range(COLS * COLUMN_HEIGHT)] for _ in range(3)]
+
+# Same keys for the left-right mirror of each bit, to hash the mirrored position
+MIRROR_ZOBRIST = [
+    [keys[(COLS - 1 - bit // COLUMN_HEIGHT) * COLUMN_HEIGHT + bit % COLUMN_HEIGHT] for bit in range(COLS * COLUMN_HEIGHT)]
+    for keys in ZOBRIST
+]
+
+
+def bottom_mask(col: int) -> int:
+    """
+    Bit of the lowest cell of a column.
+    """
+    return 1 << (col * COLUMN_HEIGHT)
+
+
+def top_mask(col: int) -> int:
+    """
+    Bit of the highest playable cell of a column.
+    """
+    return 1 << (col * COLUMN_HEIGHT + ROWS - 1)
+
+
+def has_won(mask: int) -> bool:
+    """
+    Check if a player mask contains four aligned pieces.
+    Shifts by 1 (vertical), 7 (horizontal), 6 and 8 (diagonals).
+    """
+    for shift in (1, COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1):
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+class Position:
+    """
+    Connect 4 position stored as one 64-bit mask per player plus the
+    next free bit of every column, so a move is played or undone in O(1).
+    Zobrist hashes of the pieces and of their mirror image are kept up to
+    date on every move.
+    """
+
+    __slots__ = ("pieces", "heights", "plies", "hash", "mirror_hash")
+
+    def __init__(self):
+        self.pieces = [0, 0, 0]  # Indexed by player id (1 or 2), index 0 unused
+        self.heights = [col * COLUMN_HEIGHT for col in range(COLS)]
+        self.plies = 0  # Number of pieces on the board
+        self.hash = 0
+        self.mirror_hash = 0
+
+    @classmethod
+    def from_board(cls, board: List[List[int]]) -> "Position":
+        """
+        Build a position from the JSON board (list of rows, top row first).
+        """
+        position = cls()
+        rows = len(board)
+        for col in range(COLS):
+            for row in range(rows - 1, -1, -1):
+                piece = board[row][col]
+                if piece:
+                    bit = col * COLUMN_HEIGHT + rows - 1 - row
+                    position.pieces[piece] |= 1 << bit
+                    position.heights[col] = bit + 1
+                    position.plies += 1
+                    position.hash ^= ZOBRIST[piece][bit]
+                    position.mirror_hash ^= MIRROR_ZOBRIST[piece][bit]
+        return position
+
+    def to_board(self) -> List[List[int]]:
+        """
+        Convert the position back to the JSON board format.
+        """
+        board = [[0] * COLS for _ in range(ROWS)]
+        for col in range(COLS):
+            for height in range(ROWS):
+                bit = 1 << (col * COLUMN_HEIGHT + height)
+                if self.pieces[1] & bit:
+                    board[ROWS - 1 - height][col] = 1
+                elif self.pieces[2] & bit:
+                    board[ROWS - 1 - height][col] = 2
+        return board
+
+    @property
+    def mask(self) -> int:
+        return self.pieces[1] | self.pieces[2]
+
+    def can_play(self, col: int) -> bool:
+        return self.heights[col] < col * COLUMN_HEIGHT + ROWS
+
+    def next_row(self, col: int) -> int:
+        """
+        Row index (JSON orientation) where a piece dropped in the column lands.
+        """
+        return ROWS - 1 - (self.heights[col] - col * COLUMN_HEIGHT)
+
+    def play(self, col: int, piece: int):
+        bit = self.heights[col]
+        self.pieces[piece] |= 1 << bit
+        self.hash ^= ZOBRIST[piece][bit]
+        self.mirror_hash ^= MIRROR_ZOBRIST[piece][bit]
+        self.heights[col] = bit + 1
+        self.plies += 1
+
+    def undo(self, col: int, piece: int):
+        bit = self.heights[col] - 1
+        self.heights[col] = bit
+        self.plies -= 1
+        self.pieces[piece] ^= 1 << bit
+        self.hash ^= ZOBRIST[piece][bit]
+        self.mirror_hash ^= MIRROR_ZOBRIST[piece][bit]
+
+    def is_winning(self, piece: int) -> bool:
+        return has_won(self.pieces[piece])
+
+    def is_full(self) -> bool:
+        return self.mask == BOARD_MASK
+
+    def copy(self) -> "Position":
+        position = Position.__new__(Position)
+        position.pieces = self.pieces.copy()
+        position.heights = self.heights.copy()
+        position.plies = self.plies
+        position.hash = self.hash
+        position.mirror_hash = self.mirror_hash
+        return position
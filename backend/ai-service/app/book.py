@@ -0,0 +1,161 @@
+"""
+Opening book: best AI moves precomputed for every position up to a given ply.
+
+Build it from backend/ai-service with:
+    python -m app.book --ply 6 --depth 12
+
+The ai-service only uses a book searched at least AI_BOOK_MIN_DEPTH deep
+(12 by default, about the depth its live "hard" search reaches).
+
+File layout (little endian):
+    header  16 bytes: magic "C4BK", entry count (uint32), max ply (uint16), search depth (uint16), padding
+    keys    count * uint64, sorted canonical position hashes
+    moves   count * uint8, best column for the canonical orientation
+
+The canonical hash of a position is the smaller of its hash and the hash of its
+mirror image, so mirrored positions share one entry.
+"""
+from bisect import bisect_left
+from multiprocessing import Pool
+from typing import Dict, Iterator, Optional, Tuple
+import argparse
+import math
+import mmap
+import os
+import struct
+import time
+
+from app.bitboard import Position, COLS
+
+MAGIC = b"C4BK"
+HEADER = struct.Struct("<4sIHH4x")
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "data", "opening_book.bin")
+
+PLAYER_AI = 2
+PLAYER_HUMAN = 1
+
+
+def canonical_key(position: Position) -> Tuple[int, bool]:
+    """
+    Returns (canonical hash, True if the canonical orientation is the mirror image).
+    """
+    if position.mirror_hash < position.hash:
+        return position.mirror_hash, True
+    return position.hash, False
+
+
+class OpeningBook:
+    """
+    Read-only book memory-mapped from disk, looked up by binary search.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.max_ply, self.depth = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an opening book")
+        keys_end = HEADER.size + self.count * 8
+        self.keys = memoryview(self.map)[HEADER.size:keys_end].cast("Q")
+        self.moves = memoryview(self.map)[keys_end:keys_end + self.count]
+
+    def lookup(self, position: Position) -> Optional[int]:
+        """
+        Best column for the AI in this position, or None if it is not in the book.
+        """
+        key, mirrored = canonical_key(position)
+        index = bisect_left(self.keys, key)
+        if index == self.count or self.keys[index] != key:
+            return None
+        move = self.moves[index]
+        return COLS - 1 - move if mirrored else move
+
+    def close(self):
+        self.keys.release()
+        self.moves.release()
+        self.map.close()
+
+
+def load_book(path: str = DEFAULT_PATH) -> Optional[OpeningBook]:
+    """
+    Open the book if the file exists.
+    """
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def write_book(path: str, entries: Dict[int, int], max_ply: int, depth: int):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    keys = sorted(entries)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(keys), max_ply, depth))
+        file.write(struct.pack(f"<{len(keys)}Q", *keys))
+        file.write(bytes(entries[key] for key in keys))
+
+
+def book_positions(max_ply: int) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+    """
+    Yield (first player, moves) for one representative of every canonical
+    position up to max_ply where the AI is to move and nobody has won yet.
+    Games started by either player are covered.
+    """
+    seen = set()
+
+    def walk(position, moves, first, piece):
+        if position.is_winning(PLAYER_AI) or position.is_winning(PLAYER_HUMAN):
+            return
+        key, _ = canonical_key(position)
+        if (key, piece) in seen:
+            return
+        seen.add((key, piece))
+        if piece == PLAYER_AI:
+            yield first, tuple(moves)
+        if len(moves) == max_ply:
+            return
+        for col in range(COLS):
+            if position.can_play(col):
+                position.play(col, piece)
+                moves.append(col)
+                yield from walk(position, moves, first, 3 - piece)
+                moves.pop()
+                position.undo(col, piece)
+
+    for first in (PLAYER_HUMAN, PLAYER_AI):
+        yield from walk(Position(), [], first, first)
+
+
+def _search_book_move(args) -> Tuple[int, int]:
+    from app.routers.ai import minimax, transposition_table
+
+    first, moves, depth = args
+    position = Position()
+    piece = first
+    for col in moves:
+        position.play(col, piece)
+        piece = 3 - piece
+    transposition_table.clear()  # Plain depth-limited result, independent of the build order
+    col, _ = minimax(position, depth, -math.inf, math.inf, True)
+    key, mirrored = canonical_key(position)
+    return key, COLS - 1 - col if mirrored else col
+
+
+def build_book(path: str, max_ply: int, depth: int, workers: int):
+    positions = [(first, moves, depth) for first, moves in book_positions(max_ply)]
+    print(f"Searching {len(positions)} positions up to ply {max_ply} at depth {depth}")
+    start = time.time()
+    with Pool(workers) as pool:
+        entries = dict(pool.imap_unordered(_search_book_move, positions, chunksize=16))
+    write_book(path, entries, max_ply, depth)
+    print(f"Wrote {len(entries)} entries to {path} in {time.time() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the AI opening book")
+    parser.add_argument("--ply", type=int, default=6, help="last ply stored in the book")
+    parser.add_argument("--depth", type=int, default=12, help="minimax depth used for each position")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    args = parser.parse_args()
+    build_book(args.output, args.ply, args.depth, args.workers)
@@ -1,8 +1,10 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import ai
 
-app = FastAPI()
+# Responses serialized with orjson
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,6 +16,14 @@ app.add_middleware(
 
 app.include_router(ai.router, prefix="/ai")
 
+@app.on_event("startup")
+def start_search_pool():
+    ai.start_search_pool()
+
+@app.on_event("shutdown")
+def stop_search_pool():
+    ai.stop_search_pool()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the AI Service for Connect 4"}
\ No newline at end of file
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+
+# Une position à évaluer dans une requête groupée
+class MoveRequest(BaseModel):
+    board: Union[List[List[int]], str]  # Plateau (6 lignes, 7 colonnes, ligne 0 en haut), bitboard ou suite de coups
+    difficulty: str = "medium"
+    time_budget: Optional[int] = Field(None, gt=0, le=10000)  # Budget de recherche en ms
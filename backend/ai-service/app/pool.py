@@ -0,0 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+import asyncio
+import multiprocessing
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when every worker is busy and the waiting queue is full.
+    """
+
+
+class SearchPool:
+    """
+    Process pool for CPU-bound searches with a bounded number of pending jobs.
+
+    With workers=0 the jobs run on the default thread pool of the event loop
+    (handy for development and tests, no extra processes).
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_pending = max(1, workers) + max_queue
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self, initializer: Optional[Callable] = None, initargs: tuple = ()):
+        if self.workers > 0 and self.executor is None:
+            # spawn: workers must not inherit the threads of the running server
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs,
+            )
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def has_capacity(self, jobs: int = 1) -> bool:
+        return self.pending + jobs <= self.max_pending
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) on the pool. Raises PoolSaturated instead of queueing
+        more than max_pending jobs.
+        """
+        if not self.has_capacity():
+            self.rejected += 1
+            raise PoolSaturated()
+        self.pending += 1
+        try:
+            loop = asyncio.get_event_loop()
+            result = await loop.run_in_executor(self.executor, fn, *args)
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -1,8 +1,21 @@
-from fastapi import APIRouter, HTTPException, Body, Query
-from typing import List, Tuple
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Tuple, Optional, Union
 import time
 import math
 import random
+import os
+import asyncio
+import orjson
+from multiprocessing.shared_memory import SharedMemory
+from app.bitboard import Position, ROWS, COLS, has_won
+from app.transposition import TranspositionTable, EXACT, LOWER, UPPER, ENTRY_BYTES, table_size
+from app.pool import SearchPool, PoolSaturated
+from app.book import load_book, DEFAULT_PATH as DEFAULT_BOOK_PATH
+from app.model_move import MoveRequest
+from app.board_codec import decode_board
+from app.evaluation import window_score_table, score_positions, score_bitboard
+from app.solver import Solver, SolverBudgetExceeded
 
 router = APIRouter()
 
@@ -11,6 +24,138 @@ EMPTY = 0
 PLAYER_AI = 2
 PLAYER_HUMAN = 1
 
+# Terminal scores
+WIN_SCORE = 100000000000000
+LOSS_SCORE = -10000000000000
+
+# Maximum search depth and default time budget (ms) for each difficulty
+DIFFICULTY_SETTINGS = {
+    "easy": {"max_depth": 1, "time_budget": 50},  # Profondeur 1 pour rendre l'IA moins performante
+    "medium": {"max_depth": 4, "time_budget": 300},
+    # Bounded depth: a position searched to depth 12 answers before the end of its budget
+    "hard": {"max_depth": 12, "time_budget": 1000, "parallel": True, "book": True},
+    # Perfect play when the solver finishes within its node budget, hard search otherwise
+    "expert": {"max_depth": 12, "time_budget": 1000, "solver": True},
+}
+
+# Hash key XORed in when the human is to move, so both sides get distinct entries
+SIDE_KEY = 0x9E3779B97F4A7C15
+
+# Search memory shared by every request handled by this process
+# (and by every pool worker once the pool is started, see start_search_pool)
+TT_SIZE_MB = float(os.getenv("AI_TT_MB", "16"))
+transposition_table = TranspositionTable(TT_SIZE_MB)
+shared_table_memory: Optional[SharedMemory] = None
+
+# Precomputed moves for the first plies (None when the book has not been built)
+opening_book = load_book(os.getenv("AI_BOOK_PATH", DEFAULT_BOOK_PATH))
+
+# A book move replaces the live "hard" search, which goes up to depth 12 in the
+# opening: a book searched less deeply would make the AI weaker, so it is ignored
+BOOK_MIN_DEPTH = int(os.getenv("AI_BOOK_MIN_DEPTH", "12"))
+if opening_book is not None and opening_book.depth < BOOK_MIN_DEPTH:
+    print(f"Opening book ignored: searched at depth {opening_book.depth}, AI_BOOK_MIN_DEPTH is {BOOK_MIN_DEPTH}")
+    opening_book = None
+
+# Perfect-play solver of the "expert" difficulty, and the nodes it may visit per move
+solver = Solver(int(os.getenv("AI_SOLVER_TABLE_SIZE", str(1 << 20))))
+SOLVER_NODE_BUDGET = int(os.getenv("AI_SOLVER_NODES", "50000"))
+
+# Worker processes running the searches, and how many requests may wait for one
+search_pool = SearchPool(
+    workers=int(os.getenv("AI_POOL_WORKERS", str(os.cpu_count() or 1))),
+    max_queue=int(os.getenv("AI_POOL_QUEUE", "32")),
+)
+
+# Number of root moves of a "parallel" difficulty searched at the same time (1 = serial)
+PARALLEL_WORKERS = int(os.getenv("AI_PARALLEL_WORKERS", "1"))
+
+# Delay (ms) the client should leave between the request and playing the move
+THINK_TIME_MS = int(os.getenv("AI_THINK_TIME_MS", "1000"))
+
+# Largest accepted /moves batch, and size from which its results are streamed as NDJSON
+BATCH_MAX_ITEMS = int(os.getenv("AI_BATCH_MAX_ITEMS", "1000"))
+BATCH_STREAM_MIN = int(os.getenv("AI_BATCH_STREAM_MIN", "32"))
+
+# Last transposition table counters reported by each worker process
+worker_stats = {}
+
+class SearchTimeout(Exception):
+    """
+    Raised inside minimax when the time budget of the search is spent.
+    """
+
+# Static move order: central columns take part in more alignments
+CENTER_ORDER = [3, 2, 4, 1, 5, 0, 6]
+
+class MoveOrdering:
+    """
+    Move ordering heuristics for alpha-beta, kept across the iterations of a search:
+    transposition table move first, then the two killer moves of the ply (moves that
+    caused a cutoff in a sibling node), then by history score (cutoffs caused by
+    the same piece on the same cell), ties broken centre-first.
+    Killers and history are not used at the root ply so that the root order
+    only depends on the transposition table (see combine_root_results).
+    """
+
+    def __init__(self, root_plies: int = -1, center: bool = True, tt_move: bool = True,
+                 killers: bool = True, history: bool = True):
+        self.root_plies = root_plies
+        self.center = center
+        self.use_tt_move = tt_move
+        self.use_killers = killers
+        self.use_history = history
+        self.killers = [[None, None] for _ in range(ROWS * COLS + 1)]
+        self.history = [[0] * (COLS * (ROWS + 1)) for _ in range(3)]
+
+    def order(self, board: Position, valid_columns: List[int], tt_col: Optional[int], piece: int) -> List[int]:
+        columns = [col for col in CENTER_ORDER if col in valid_columns] if self.center else valid_columns
+        if board.plies != self.root_plies:
+            if self.use_history:
+                history = self.history[piece]
+                heights = board.heights
+                columns.sort(key=lambda col: -history[heights[col]])
+            if self.use_killers:
+                for killer in reversed(self.killers[board.plies]):
+                    if killer is not None and killer in columns:
+                        columns.remove(killer)
+                        columns.insert(0, killer)
+        if self.use_tt_move and tt_col is not None and tt_col in columns:
+            columns.remove(tt_col)
+            columns.insert(0, tt_col)
+        return columns
+
+    def record_cutoff(self, board: Position, col: int, piece: int, depth: int):
+        killers = self.killers[board.plies]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[piece][board.heights[col]] += depth * depth
+
+class SearchContext:
+    """
+    Per-search state: node counter, move ordering heuristics and optional deadline
+    (time.monotonic() value, comparable between the processes of the pool).
+    horizon is the last ply the search may look at (root plies + max depth of
+    the difficulty): transposition table entries searched beyond it, left by
+    a stronger difficulty, do not end the search.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, ordering: Optional[MoveOrdering] = None,
+                 horizon: Optional[int] = None):
+        self.deadline = deadline
+        self.ordering = ordering if ordering is not None else MoveOrdering()
+        self.horizon = horizon
+        self.nodes = 0
+        self.ticks = 0  # Calls of tick() only: evaluate_leaves counts its leaves in nodes without ticking
+
+    def tick(self):
+        self.nodes += 1
+        self.ticks += 1
+        # Only read the clock every 256 ticks
+        if self.deadline is not None and not self.ticks & 255 and time.monotonic() > self.deadline:
+            raise SearchTimeout()
+
 def evaluate_window(window: List[int], player: int) -> int:
     """
     Evaluate a window of 4 slots for scoring.
@@ -30,6 +175,9 @@ def evaluate_window(window: List[int], player: int) -> int:
 
     return score
 
+# evaluate_window score of each of the 81 window codes, for the vectorized evaluator
+AI_WINDOW_SCORES = window_score_table(evaluate_window, PLAYER_AI)
+
 def score_position(board: List[List[int]], player: int) -> int:
     """
     Score the current board for the given player.
@@ -67,142 +215,463 @@ def score_position(board: List[List[int]], player: int) -> int:
 
     return score
 
-def is_valid_location(board: List[List[int]], col: int) -> bool:
+def is_valid_location(board: Position, col: int) -> bool:
     """
     Check if a column is valid for a move.
     """
-    return board[0][col] == EMPTY
+    return board.can_play(col)
 
-def get_valid_columns(board: List[List[int]]) -> List[int]:
+def get_valid_columns(board: Position) -> List[int]:
     """
     Get all valid columns for a move.
     """
-    return [col for col in range(len(board[0])) if is_valid_location(board, col)]
+    return [col for col in range(COLS) if board.can_play(col)]
 
-def drop_piece(board: List[List[int]], row: int, col: int, piece: int):
+def get_next_open_row(board: Position, col: int) -> int:
     """
-    Drop a piece in the board at the specified location.
+    Get the next open row in a column.
     """
-    board[row][col] = piece
+    if board.can_play(col):
+        return board.next_row(col)
 
-def get_next_open_row(board: List[List[int]], col: int) -> int:
+def winning_move(board: Position, piece: int) -> bool:
     """
-    Get the next open row in a column.
+    Check if the given piece has four in a row.
     """
-    for row in range(len(board) - 1, -1, -1):
-        if board[row][col] == EMPTY:
-            return row
+    return has_won(board.pieces[piece])
 
-def winning_move(board: List[List[int]], piece: int) -> bool:
+def evaluate_leaves(board: Position, valid_columns: List[int], maximizingPlayer: bool,
+                    context: SearchContext) -> Tuple[int, int]:
     """
-    Check if the given piece has a winning move.
+    Score every child of a depth-1 node, the non-terminal ones in a single
+    vectorized call. Returns the first best (column, score) in valid_columns order.
     """
-    rows, cols = len(board), len(board[0])
-
-    # Check horizontal locations
-    for row in range(rows):
-        for col in range(cols - 3):
-            if all(board[row][col + i] == piece for i in range(4)):
-                return True
-
-    # Check vertical locations
-    for col in range(cols):
-        for row in range(rows - 3):
-            if all(board[row + i][col] == piece for i in range(4)):
-                return True
+    piece = PLAYER_AI if maximizingPlayer else PLAYER_HUMAN
+    context.nodes += len(valid_columns)
+    scores = [0] * len(valid_columns)
+    leaves, masks_human, masks_ai = [], [], []
+    for index, col in enumerate(valid_columns):
+        board.play(col, piece)
+        won = winning_move(board, piece)
+        if not won and not board.is_full():
+            leaves.append(index)
+            masks_human.append(board.pieces[PLAYER_HUMAN])
+            masks_ai.append(board.pieces[PLAYER_AI])
+        board.undo(col, piece)
+        if won:  # Nothing beats an immediate win
+            return col, WIN_SCORE if maximizingPlayer else LOSS_SCORE
 
-    # Check positive diagonals
-    for row in range(rows - 3):
-        for col in range(cols - 3):
-            if all(board[row + i][col + i] == piece for i in range(4)):
-                return True
+    if leaves:
+        leaf_scores = score_positions(masks_human, masks_ai, AI_WINDOW_SCORES, PLAYER_AI).tolist()
+        for index, score in zip(leaves, leaf_scores):
+            scores[index] = score
 
-    # Check negative diagonals
-    for row in range(rows - 3):
-        for col in range(3, cols):
-            if all(board[row + i][col - i] == piece for i in range(4)):
-                return True
+    best = max(scores) if maximizingPlayer else min(scores)
+    return valid_columns[scores.index(best)], best
 
-    return False
-
-def minimax(board: List[List[int]], depth: int, alpha: float, beta: float, maximizingPlayer: bool) -> Tuple[int, int]:
+def minimax(board: Position, depth: int, alpha: float, beta: float, maximizingPlayer: bool,
+            context: Optional[SearchContext] = None) -> Tuple[int, int]:
     """
     Minimax algorithm with alpha-beta pruning.
+    Moves are played and undone in place on the bitboard instead of copying the board,
+    and results are memoized in the transposition table. Moves are tried in the
+    order given by the MoveOrdering of the context.
     """
+    if context is None:
+        context = SearchContext()
+    context.tick()
+
+    if winning_move(board, PLAYER_AI):
+        return (None, WIN_SCORE)
+    if winning_move(board, PLAYER_HUMAN):
+        return (None, LOSS_SCORE)
+
     valid_columns = get_valid_columns(board)
-    is_terminal = winning_move(board, PLAYER_AI) or winning_move(board, PLAYER_HUMAN) or not valid_columns
-
-    if depth == 0 or is_terminal:
-        if is_terminal:
-            if winning_move(board, PLAYER_AI):
-                return (None, 100000000000000)
-            elif winning_move(board, PLAYER_HUMAN):
-                return (None, -10000000000000)
-            else:  # No valid moves (draw)
-                return (None, 0)
-        else:  # Depth is zero
-            return (None, score_position(board, PLAYER_AI))
+    if not valid_columns:  # No valid moves (draw)
+        return (None, 0)
+
+    key = board.hash if maximizingPlayer else board.hash ^ SIDE_KEY
+    alpha_orig, beta_orig = alpha, beta
+    entry = transposition_table.probe(key)
+    tt_col = None
+    if entry is not None:
+        tt_depth, flag, tt_value, tt_col = entry
+        if tt_depth >= depth and (context.horizon is None or board.plies + tt_depth <= context.horizon):
+            if flag == EXACT:
+                return tt_col, tt_value
+            if flag == LOWER:
+                alpha = max(alpha, tt_value)
+            else:
+                beta = min(beta, tt_value)
+            if alpha >= beta:
+                return tt_col, tt_value
+
+    if depth == 0:
+        value = score_bitboard(board, AI_WINDOW_SCORES, PLAYER_AI)
+        transposition_table.store(key, 0, EXACT, value, None)
+        return (None, value)
+
+    piece = PLAYER_AI if maximizingPlayer else PLAYER_HUMAN
+    valid_columns = context.ordering.order(board, valid_columns, tt_col, piece)
+
+    if depth == 1:
+        best_col, value = evaluate_leaves(board, valid_columns, maximizingPlayer, context)
+        transposition_table.store(key, 1, EXACT, value, best_col)
+        return best_col, value
 
     if maximizingPlayer:
         value = -math.inf
-        best_col = random.choice(valid_columns)
+        best_col = valid_columns[0]
         for col in valid_columns:
-            row = get_next_open_row(board, col)
-            temp_board = [row.copy() for row in board]
-            drop_piece(temp_board, row, col, PLAYER_AI)
-            new_score = minimax(temp_board, depth - 1, alpha, beta, False)[1]
+            board.play(col, PLAYER_AI)
+            new_score = minimax(board, depth - 1, alpha, beta, False, context)[1]
+            board.undo(col, PLAYER_AI)
             if new_score > value:
                 value = new_score
                 best_col = col
             alpha = max(alpha, value)
             if alpha >= beta:
+                context.ordering.record_cutoff(board, col, PLAYER_AI, depth)
                 break
-        return best_col, value
 
     else:  # Minimizing player
         value = math.inf
-        best_col = random.choice(valid_columns)
+        best_col = valid_columns[0]
         for col in valid_columns:
-            row = get_next_open_row(board, col)
-            temp_board = [row.copy() for row in board]
-            drop_piece(temp_board, row, col, PLAYER_HUMAN)
-            new_score = minimax(temp_board, depth - 1, alpha, beta, True)[1]
+            board.play(col, PLAYER_HUMAN)
+            new_score = minimax(board, depth - 1, alpha, beta, True, context)[1]
+            board.undo(col, PLAYER_HUMAN)
             if new_score < value:
                 value = new_score
                 best_col = col
             beta = min(beta, value)
             if alpha >= beta:
+                context.ordering.record_cutoff(board, col, PLAYER_HUMAN, depth)
                 break
-        return best_col, value
 
-@router.post("/move")
-def get_ai_move(board: List[List[int]] = Body(...), difficulty: str = Query("medium")):
+    if value <= alpha_orig:
+        flag = UPPER
+    elif value >= beta_orig:
+        flag = LOWER
+    else:
+        flag = EXACT
+    transposition_table.store(key, depth, flag, value, best_col)
+    return best_col, value
+
+def iterative_deepening(board: Position, max_depth: int, time_budget: float,
+                        ordering: Optional[MoveOrdering] = None) -> Tuple[int, int, int, int]:
     """
-    AI endpoint using Minimax algorithm with difficulty levels.
+    Run minimax at increasing depths until max_depth or the time budget (ms) is reached.
+    Returns (column, score, depth, nodes) of the deepest finished iteration; each
+    iteration leaves its best moves in the transposition table, killers and history
+    to order the next one.
     """
-    start_time = time.time()
-    valid_columns = get_valid_columns(board)
-    if not valid_columns:
+    deadline = time.monotonic() + time_budget / 1000
+    empty_cells = ROWS * COLS - board.plies
+    if ordering is None:
+        ordering = MoveOrdering(root_plies=board.plies)
+    result = None
+    nodes = 0
+    for depth in range(1, min(max_depth, empty_cells) + 1):
+        # The first iteration always completes so there is a move to return
+        context = SearchContext(deadline if result is not None else None, ordering, board.plies + max_depth)
+        try:
+            col, value = minimax(board, depth, -math.inf, math.inf, True, context)
+        except SearchTimeout:
+            nodes += context.nodes
+            break
+        nodes += context.nodes
+        result = (col, value, depth)
+        if value >= WIN_SCORE or value <= LOSS_SCORE or time.monotonic() >= deadline:
+            break  # Forced result found or no time left for a deeper iteration
+    col, value, depth = result
+    return col, value, depth, nodes
+
+def read_board(board: Union[List[List[int]], str]) -> List[List[int]]:
+    """
+    Board of a request, sent as a list of rows or compactly encoded
+    (bitboard or move sequence, see app/board_codec.py).
+    """
+    try:
+        return decode_board(board)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid board encoding: {exc}")
+
+def parse_board(board: List[List[int]]) -> Position:
+    """
+    Validate the JSON board and convert it to a bitboard position.
+    """
+    if len(board) != ROWS or any(len(row) != COLS for row in board):
+        raise HTTPException(status_code=400, detail="Board must have 6 rows of 7 columns")
+    if any(cell not in (EMPTY, PLAYER_HUMAN, PLAYER_AI) for row in board for cell in row):
+        raise HTTPException(status_code=400, detail="Invalid cell value")
+    return Position.from_board(board)
+
+def search_move(board: List[List[int]], difficulty: str, time_budget: int) -> dict:
+    """
+    Pick the AI move for a validated board. Runs inside a pool worker.
+    """
+    position = Position.from_board(board)
+    settings = DIFFICULTY_SETTINGS[difficulty]
+    transposition_table.new_search()
+    result = {"pid": os.getpid()}
+
+    game_over = winning_move(position, PLAYER_AI) or winning_move(position, PLAYER_HUMAN)
+    if settings.get("solver") and not game_over:
+        start = time.monotonic()
+        try:
+            col, value = solver.best_move(position, PLAYER_AI, SOLVER_NODE_BUDGET)
+            result.update(column=col, depth="solved", value=value, nodes=solver.nodes)
+        except SolverBudgetExceeded:
+            # Too early in the game to solve: search with what is left of the budget
+            time_budget = max(1, time_budget - (time.monotonic() - start) * 1000)
+
+    if "column" not in result:
+        # Introduire un élément de hasard en mode facile
+        if difficulty == "easy" and random.random() < 0.5:
+            result.update(column=random.choice(get_valid_columns(position)), depth=0, nodes=0)
+        else:
+            col, _, depth, nodes = iterative_deepening(position, settings["max_depth"], time_budget)
+            result.update(column=col, depth=depth, nodes=nodes)
+
+    result["transposition_table"] = transposition_table.stats()
+    return result
+
+def search_root_move(board: List[List[int]], col: int, max_depth: int, deadline: float) -> dict:
+    """
+    Play one root move for the AI and search the reply with iterative deepening.
+    Runs inside a pool worker. values[d - 1] is the exact score of the move for a
+    root search of depth d; final is set when deeper searches cannot change it.
+    """
+    position = Position.from_board(board)
+    position.play(col, PLAYER_AI)
+    transposition_table.new_search()
+    empty_cells = ROWS * COLS - position.plies
+    ordering = MoveOrdering()
+    values = []
+    nodes = 0
+    final = False
+    for depth in range(1, max_depth + 1):
+        context = SearchContext(deadline if values else None, ordering, position.plies - 1 + max_depth)
+        try:
+            _, value = minimax(position, depth - 1, -math.inf, math.inf, False, context)
+        except SearchTimeout:
+            nodes += context.nodes
+            break
+        nodes += context.nodes
+        values.append(value)
+        if value >= WIN_SCORE or value <= LOSS_SCORE or depth - 1 >= empty_cells:
+            final = True
+            break
+        if time.monotonic() >= deadline:
+            break
+    return {
+        "values": values,
+        "final": final,
+        "nodes": nodes,
+        "pid": os.getpid(),
+        "transposition_table": transposition_table.stats(),
+    }
+
+def combine_root_results(root_order: List[int], results: dict) -> Tuple[int, int, int]:
+    """
+    Pick the move of a parallel root search, as the serial search would have.
+    Returns (column, score, depth) for the deepest depth finished by every root move.
+    Ties are broken like minimax: the best move of the previous depth first, then root_order.
+    """
+    def value_at(col, depth):
+        values = results[col]["values"]
+        return values[min(depth, len(values)) - 1]  # Final scores hold at any deeper depth
+
+    unfinished = [len(result["values"]) for result in results.values() if not result["final"]]
+    depth = min(unfinished) if unfinished else max(len(result["values"]) for result in results.values())
+    order = list(root_order)
+    best_col, best_value = order[0], None
+    for current_depth in range(1, depth + 1):
+        best_value = None
+        for col in order:
+            value = value_at(col, current_depth)
+            if best_value is None or value > best_value:
+                best_col, best_value = col, value
+        order.remove(best_col)
+        order.insert(0, best_col)
+    return best_col, best_value, depth
+
+async def parallel_root_search(pool: SearchPool, board: List[List[int]], max_depth: int,
+                               time_budget: float, workers: int) -> Tuple[int, int, int, int]:
+    """
+    Split the root moves across the pool workers (at most `workers` at once).
+    The workers share the transposition table. Returns (column, score, depth, nodes)
+    and picks the same move as iterative_deepening at equal depth.
+    """
+    position = Position.from_board(board)
+    entry = transposition_table.probe(position.hash)
+    root_order = MoveOrdering(root_plies=position.plies).order(
+        position, get_valid_columns(position), entry[3] if entry else None, PLAYER_AI
+    )
+
+    empty_cells = ROWS * COLS - position.plies
+    max_depth = min(max_depth, empty_cells)
+    deadline = time.monotonic() + time_budget / 1000
+    semaphore = asyncio.Semaphore(workers)
+
+    async def search(col):
+        async with semaphore:
+            return await pool.run(search_root_move, board, col, max_depth, deadline)
+
+    results = dict(zip(root_order, await asyncio.gather(*(search(col) for col in root_order))))
+    for result in results.values():
+        worker_stats[result["pid"]] = result["transposition_table"]
+    col, value, depth = combine_root_results(root_order, results)
+    return col, value, depth, sum(result["nodes"] for result in results.values())
+
+def init_worker(shared_memory_name: str, size_mb: float):
+    """
+    Pool worker initializer: attach the transposition table to the shared memory block.
+    """
+    global transposition_table, shared_table_memory
+    # Spawned workers share the resource tracker of the parent, which unlinks the block
+    shared_table_memory = SharedMemory(name=shared_memory_name)
+    transposition_table = TranspositionTable(size_mb, buffer=shared_table_memory.buf)
+
+def start_search_pool():
+    """
+    Create the shared transposition table and start the pool workers on it.
+    """
+    global transposition_table, shared_table_memory
+    if search_pool.workers == 0 or shared_table_memory is not None:
+        return
+    shared_table_memory = SharedMemory(create=True, size=table_size(TT_SIZE_MB) * ENTRY_BYTES)
+    transposition_table = TranspositionTable(TT_SIZE_MB, buffer=shared_table_memory.buf)
+    search_pool.start(init_worker, (shared_table_memory.name, TT_SIZE_MB))
+
+def stop_search_pool():
+    global transposition_table, shared_table_memory
+    search_pool.shutdown()
+    if shared_table_memory is not None:
+        transposition_table = TranspositionTable(TT_SIZE_MB)
+        shared_table_memory.close()
+        shared_table_memory.unlink()
+        shared_table_memory = None
+
+def check_move_request(board: List[List[int]], difficulty: str) -> Position:
+    """
+    Validate a move request and return the position to search.
+    """
+    position = parse_board(board)
+    if not get_valid_columns(position):
         raise HTTPException(status_code=400, detail="No valid moves available")
-    
-    # Set depth based on difficulty
-    if difficulty == "easy":
-        depth = 1  # Réduire la profondeur à 1 pour rendre l'IA moins performante
-    elif difficulty == "medium":
-        depth = 4
-    elif difficulty == "hard":
-        depth = 6
-    else:
+    if difficulty not in DIFFICULTY_SETTINGS:
         raise HTTPException(status_code=400, detail="Invalid difficulty level")
+    return position
 
-    # Introduire un élément de hasard en mode facile
-    if difficulty == "easy" and random.random() < 0.5:
-        col = random.choice(valid_columns)
-    else:
-        col, _ = minimax(board, depth=depth, alpha=-math.inf, beta=math.inf, maximizingPlayer=True)
-    
-    end_time = time.time()
+async def compute_move(position: Position, board: List[List[int]], difficulty: str,
+                       time_budget: Optional[int]) -> dict:
+    """
+    Find the AI move for a validated request: opening book first, then a search
+    on the pool. Returns {"column", "depth"} plus the game-theoretic "value" when the
+    position was solved; raises PoolSaturated when the pool is full.
+    """
+    settings = DIFFICULTY_SETTINGS[difficulty]
+    if time_budget is None:
+        time_budget = settings["time_budget"]
+
+    if settings.get("book") and opening_book is not None:
+        book_col = opening_book.lookup(position)
+        if book_col is not None and position.can_play(book_col):
+            return {"column": book_col, "depth": "book"}
+
+    if settings.get("parallel") and PARALLEL_WORKERS > 1:
+        col, _, depth, _ = await parallel_root_search(
+            search_pool, board, settings["max_depth"], time_budget, PARALLEL_WORKERS
+        )
+        return {"column": col, "depth": depth}
+
+    result = await search_pool.run(search_move, board, difficulty, time_budget)
+    worker_stats[result.pop("pid")] = result.pop("transposition_table")
+    result.pop("nodes")
+    return result
+
+@router.post("/move")
+async def get_ai_move(
+    board: Union[List[List[int]], str] = Body(...),
+    difficulty: str = Query("medium"),
+    time_budget: Optional[int] = Query(None, gt=0, le=10000)
+):
+    """
+    AI endpoint using iterative deepening Minimax with difficulty levels.
+    time_budget (ms) overrides the default budget of the difficulty.
+    The search runs on the process pool; think_ms tells the client how long
+    to wait before playing the move to simulate thinking time.
+    The board is a list of rows, a bitboard string or a move sequence.
+    """
+    start_time = time.time()
+    board = read_board(board)
+    position = check_move_request(board, difficulty)
+    try:
+        result = await compute_move(position, board, difficulty, time_budget)
+    except PoolSaturated:
+        raise HTTPException(status_code=503, detail="AI service is busy", headers={"Retry-After": "1"})
+
+    elapsed_ms = int((time.time() - start_time) * 1000)
+    print(f"AI selected column {result['column']} in {elapsed_ms}ms at depth {result['depth']} with difficulty {difficulty}")
+    response = {"column": result["column"], "think_ms": max(0, THINK_TIME_MS - elapsed_ms)}
+    if "value" in result:
+        response["value"] = result["value"]
+    return response
+
+@router.post("/moves")
+async def get_ai_moves(request: Request, items: List[MoveRequest] = Body(...)):
+    """
+    Batch version of /move: every board is searched concurrently on the pool
+    and the results come back in request order. Batches of at least
+    BATCH_STREAM_MIN items (or requested with Accept: application/x-ndjson)
+    are streamed as NDJSON, one result per line, as soon as they are ready.
+    """
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ITEMS} boards")
+    positions = []
+    for index, item in enumerate(items):
+        try:
+            item.board = read_board(item.board)
+            positions.append(check_move_request(item.board, item.difficulty))
+        except HTTPException as exc:
+            raise HTTPException(status_code=exc.status_code, detail=f"Board {index}: {exc.detail}")
+    if not search_pool.has_capacity():
+        raise HTTPException(status_code=503, detail="AI service is busy", headers={"Retry-After": "1"})
 
-    print(f"AI selected column {col} in {end_time - start_time:.2f}s with difficulty {difficulty}")
-    time.sleep(1)  # Simulate AI thinking time
-    return {"column": col}
\ No newline at end of file
+    # Keep at most one job per worker in flight for this batch
+    semaphore = asyncio.Semaphore(max(1, search_pool.workers))
+
+    async def evaluate(position, item):
+        async with semaphore:
+            while True:
+                try:
+                    return await compute_move(position, item.board, item.difficulty, item.time_budget)
+                except PoolSaturated:
+                    await asyncio.sleep(0.05)  # The batch was admitted: wait for a free slot
+
+    tasks = [asyncio.ensure_future(evaluate(position, item)) for position, item in zip(positions, items)]
+
+    if len(items) >= BATCH_STREAM_MIN or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def stream():
+            try:
+                for task in tasks:
+                    yield orjson.dumps(await task) + b"\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return await asyncio.gather(*tasks)
+
+@router.get("/stats")
+def get_ai_stats():
+    """
+    Transposition table counters of each worker, to size AI_TT_MB for the hardware.
+    """
+    return {
+        "pool": search_pool.stats(),
+        # orjson only accepts string keys
+        "transposition_tables": {str(pid): stats for pid, stats in worker_stats.items()},
+    }
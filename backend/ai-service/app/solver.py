@@ -0,0 +1,194 @@
+"""
+Perfect-play solver for 7x6 Connect 4.
+
+Null-window negamax on bitboards (same layout as app.bitboard), with a
+transposition table of upper bounds, pruning of moves that let the opponent
+win and ordering of the moves by the number of threats they create.
+
+Scores are seen from the player to move: a positive score is a win, the
+sooner the larger (score = (43 - moves played before the winning move) // 2),
+a negative score is a loss and 0 a draw.
+"""
+from typing import List, Tuple
+
+from app.bitboard import Position, ROWS, COLS, COLUMN_HEIGHT, BOTTOM_MASK, BOARD_MASK, has_won
+
+CELLS = ROWS * COLS
+MIN_SCORE = -CELLS // 2 + 3
+MAX_SCORE = (CELLS + 1) // 2 - 3
+
+# Explore central columns first
+COLUMN_ORDER = [3, 2, 4, 1, 5, 0, 6]
+COLUMN_MASKS = [((1 << ROWS) - 1) << (col * COLUMN_HEIGHT) for col in range(COLS)]
+
+
+class SolverBudgetExceeded(Exception):
+    """
+    Raised when a solve visits more nodes than its budget.
+    """
+
+
+def _half(value: int) -> int:
+    """
+    Division by 2 rounding toward zero (the C semantics the bounds rely on).
+    """
+    return int(value / 2)
+
+
+def winning_cells(position: int, mask: int) -> int:
+    """
+    Empty cells that would complete four in a row for the stones in `position`.
+    """
+    # Vertical
+    result = (position << 1) & (position << 2) & (position << 3)
+    # Horizontal and both diagonals
+    for shift in (COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1):
+        pair = (position << shift) & (position << 2 * shift)
+        result |= pair & (position << 3 * shift)
+        result |= pair & (position >> shift)
+        pair = (position >> shift) & (position >> 2 * shift)
+        result |= pair & (position << shift)
+        result |= pair & (position >> 3 * shift)
+    return result & (BOARD_MASK ^ mask)
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count("1")
+
+
+class Solver:
+    """
+    Solves positions for the player to move. The transposition table is a
+    fixed-size pair of lists (key, upper bound) and is kept between solves.
+    """
+
+    def __init__(self, table_size: int = 1 << 20):
+        self.table_size = table_size
+        self.keys = [0] * table_size
+        self.values = [0] * table_size
+        self.nodes = 0
+        self.node_budget = 0
+
+    def reset(self):
+        self.keys = [0] * self.table_size
+        self.values = [0] * self.table_size
+
+    def negamax(self, current: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        """
+        Score of the position if it lies in ]alpha, beta[, otherwise a bound on
+        the side of the window it falls. The player to move must not be able to win
+        with their next move.
+        """
+        self.nodes += 1
+        if self.nodes > self.node_budget:
+            raise SolverBudgetExceeded()
+
+        opponent = current ^ mask
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        opponent_wins = winning_cells(opponent, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return -_half(CELLS - moves)  # Two threats to block: lost
+            possible = forced
+        non_losing = possible & ~(opponent_wins >> 1)
+        if not non_losing:
+            return -_half(CELLS - moves)
+
+        if moves >= CELLS - 2:
+            return 0  # Draw: no one can win with the last stones
+
+        low = -_half(CELLS - 2 - moves)  # The opponent cannot win with their next move
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+
+        high = _half(CELLS - 1 - moves)  # We cannot win with our next move
+        key = current + mask
+        index = key % self.table_size
+        if self.values[index] and self.keys[index] == key:  # Value 0 marks an empty slot (key 0 is the empty board)
+            high = self.values[index] + MIN_SCORE - 1
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        # Order the moves by the number of winning cells they create
+        candidates = []
+        for col in COLUMN_ORDER:
+            move = non_losing & COLUMN_MASKS[col]
+            if move:
+                candidates.append((-_popcount(winning_cells(current | move, mask)), len(candidates), move))
+        candidates.sort()
+
+        for _, _, move in candidates:
+            score = -self.negamax(opponent, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.keys[index] = key
+        self.values[index] = alpha - MIN_SCORE + 1
+        return alpha
+
+    def solve(self, current: int, mask: int, moves: int) -> int:
+        """
+        Exact score of the position, found by successive null-window searches.
+        """
+        if winning_cells(current, mask) & (mask + BOTTOM_MASK) & BOARD_MASK:
+            return (CELLS + 1 - moves) // 2
+        low = -_half(CELLS - moves)
+        high = _half(CELLS + 1 - moves)
+        while low < high:
+            middle = low + (high - low) // 2
+            if middle <= 0 and _half(low) < middle:
+                middle = _half(low)
+            elif middle >= 0 and _half(high) > middle:
+                middle = _half(high)
+            result = self.negamax(current, mask, moves, middle, middle + 1)
+            if result <= middle:
+                high = result
+            else:
+                low = result
+        return low
+
+    def best_move(self, position: Position, piece: int, node_budget: int) -> Tuple[int, int]:
+        """
+        Solve the position for `piece` (the player to move) and return
+        (column, score). Raises SolverBudgetExceeded after node_budget nodes.
+        """
+        current = position.pieces[piece]
+        mask = position.mask
+        moves = position.plies
+        self.nodes = 0
+        self.node_budget = node_budget
+        playable = [col for col in COLUMN_ORDER if position.can_play(col)]
+
+        for col in playable:
+            if has_won(current | (mask + BOTTOM_MASK) & COLUMN_MASKS[col]):
+                return col, (CELLS + 1 - moves) // 2
+
+        score = self.solve(current, mask, moves)
+        best_col, best_score = playable[0], None
+        for col in playable:
+            move = (mask + BOTTOM_MASK) & COLUMN_MASKS[col]
+            child_current, child_mask = current ^ mask, mask | move
+            if winning_cells(child_current, child_mask) & (child_mask + BOTTOM_MASK) & BOARD_MASK:
+                value = -((CELLS + 1 - moves - 1) // 2)  # The opponent wins right away
+            else:
+                # Null window around -score: the move is optimal if the reply cannot do better
+                value = -self.negamax(child_current, child_mask, moves + 1, -score, -score + 1)
+            if value >= score:
+                return col, score
+            if best_score is None or value > best_score:
+                best_col, best_score = col, value
+        return best_col, score
+
+
+def parse_moves(moves: str) -> List[int]:
+    """
+    Columns of a move sequence in the usual solver notation ("4453": 1-based columns).
+    """
+    return [int(char) - 1 for char in moves]
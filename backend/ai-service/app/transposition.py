@@ -0,0 +1,125 @@
+from typing import Optional, Tuple
+
+# Bound types of a stored score
+EXACT = 0
+LOWER = 1  # Search failed high: the real score is >= value
+UPPER = 2  # Search failed low: the real score is <= value
+
+# Each entry is two unsigned 64-bit words: (key ^ data, data).
+# data = value (48 bits, offset) | depth (6) | flag (2) | move + 1 (3) | generation (5)
+ENTRY_BYTES = 16
+_VALUE_BITS = 48
+_VALUE_OFFSET = 1 << (_VALUE_BITS - 1)
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_DEPTH_SHIFT = 48
+_FLAG_SHIFT = 54
+_MOVE_SHIFT = 56
+_GENERATION_SHIFT = 59
+_GENERATION_MASK = 0x1F
+
+
+def table_size(size_mb: float) -> int:
+    """
+    Number of entries that fit in size_mb megabytes.
+    """
+    return max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed by Zobrist hash.
+
+    Entries live in a flat buffer of 64-bit words so the memory used is
+    bounded by the size given at creation. The key word is stored XORed with
+    the data word, so a torn or foreign entry is detected as a miss.
+
+    Replacement policy: an entry is overwritten if it belongs to the same
+    position, comes from an older search, or was searched to a depth lower
+    than or equal to the new one.
+
+    The buffer can be a shared memory block, in which case every process
+    attached to it reads and writes the same table (counters stay local).
+    """
+
+    def __init__(self, size_mb: float = 16, buffer=None):
+        self.size = table_size(size_mb)
+        if buffer is None:
+            buffer = bytearray(self.size * ENTRY_BYTES)
+        self.slots = memoryview(buffer)[:self.size * ENTRY_BYTES].cast("Q")
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self):
+        """
+        Start a new search generation: older entries become replaceable.
+        """
+        self.generation = (self.generation + 1) & _GENERATION_MASK
+
+    def clear(self):
+        self.slots.cast("B")[:] = bytes(self.size * ENTRY_BYTES)
+        self.generation = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, Optional[int]]]:
+        """
+        Look up a position. Returns (depth, flag, value, best_move) or None.
+        """
+        self.probes += 1
+        index = (key % self.size) << 1
+        data = self.slots[index + 1]
+        if not data:
+            return None
+        if self.slots[index] ^ data != key:
+            self.collisions += 1
+            return None
+        self.hits += 1
+        move = (data >> _MOVE_SHIFT) & 0x7
+        return (
+            (data >> _DEPTH_SHIFT) & 0x3F,
+            (data >> _FLAG_SHIFT) & 0x3,
+            (data & _VALUE_MASK) - _VALUE_OFFSET,
+            move - 1 if move else None,
+        )
+
+    def store(self, key: int, depth: int, flag: int, value: int, move: Optional[int]):
+        """
+        Save a search result, following the replacement policy.
+        """
+        index = (key % self.size) << 1
+        old_data = self.slots[index + 1]
+        if old_data:
+            same_key = self.slots[index] ^ old_data == key
+            old_generation = (old_data >> _GENERATION_SHIFT) & _GENERATION_MASK
+            old_depth = (old_data >> _DEPTH_SHIFT) & 0x3F
+            if not same_key and old_generation == self.generation and old_depth > depth:
+                return
+            if not same_key:
+                self.overwrites += 1
+        data = (
+            (int(value) + _VALUE_OFFSET) & _VALUE_MASK
+            | depth << _DEPTH_SHIFT
+            | flag << _FLAG_SHIFT
+            | (0 if move is None else move + 1) << _MOVE_SHIFT
+            | self.generation << _GENERATION_SHIFT
+        )
+        self.slots[index] = key ^ data
+        self.slots[index + 1] = data
+        self.stores += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "memory_bytes": self.size * ENTRY_BYTES,
+            "probes": self.probes,
+            "hits": self.hits,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+        }
@@ -0,0 +1,64 @@
+"""
+Property check and timing of the vectorized evaluator.
+
+Run from backend/ai-service:  python -m benchmarks.evaluation [boards]
+
+Random positions (random legal games stopped at a random ply) are scored for
+both players with score_position and with the vectorized evaluator, one board
+at a time and as one batch; every score must match exactly.
+"""
+import random
+import sys
+import time
+
+from app.bitboard import Position, COLS
+from app.evaluation import window_score_table, score_positions, score_bitboard
+from app.routers import ai
+
+
+def random_position(rng: random.Random) -> Position:
+    position = Position()
+    piece = rng.choice([ai.PLAYER_HUMAN, ai.PLAYER_AI])
+    for _ in range(rng.randint(0, 42)):
+        columns = [col for col in range(COLS) if position.can_play(col)]
+        if not columns:
+            break
+        position.play(rng.choice(columns), piece)
+        piece = 3 - piece
+    return position
+
+
+def main(count: int):
+    rng = random.Random(42)
+    positions = [random_position(rng) for _ in range(count)]
+    boards = [position.to_board() for position in positions]
+    masks_human = [position.pieces[ai.PLAYER_HUMAN] for position in positions]
+    masks_ai = [position.pieces[ai.PLAYER_AI] for position in positions]
+
+    for player in (ai.PLAYER_HUMAN, ai.PLAYER_AI):
+        table = window_score_table(ai.evaluate_window, player)
+
+        start = time.perf_counter()
+        expected = [ai.score_position(board, player) for board in boards]
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        single = [score_bitboard(position, table, player) for position in positions]
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = score_positions(masks_human, masks_ai, table, player).tolist()
+        batch_time = time.perf_counter() - start
+
+        for index, (board, score) in enumerate(zip(boards, expected)):
+            assert single[index] == score, f"single board {board}: {single[index]} != {score}"
+            assert batch[index] == score, f"batched board {board}: {batch[index]} != {score}"
+
+        print(
+            f"player {player}: {count} boards match; score_position {reference_time / count * 1e6:.1f} us/board, "
+            f"vectorized {single_time / count * 1e6:.1f} us/board, batched {batch_time / count * 1e6:.2f} us/board"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,52 @@
+"""
+Node counts of the iterative deepening search with each move ordering heuristic.
+
+Run from backend/ai-service:  python -m benchmarks.move_ordering [depth ...]
+
+Every position of the suite is searched to each depth on a fresh transposition
+table; the total number of nodes shows how much alpha-beta prunes.
+"""
+import sys
+import time
+
+from app.bitboard import Position
+from app.routers import ai
+
+# Positions given as the sequence of columns played, human first
+POSITIONS = ["", "3", "33", "323", "3324", "2234", "33443", "012345", "3322114", "33332222"]
+DEPTHS = [4, 6, 8, 10]
+
+ORDERINGS = {
+    "column order": dict(center=False, tt_move=False, killers=False, history=False),
+    "+ tt move": dict(center=False, tt_move=True, killers=False, history=False),
+    "+ centre first": dict(center=True, tt_move=True, killers=False, history=False),
+    "+ killers": dict(center=True, tt_move=True, killers=True, history=False),
+    "+ history": dict(center=True, tt_move=True, killers=True, history=True),
+}
+
+
+def position_from_moves(moves: str) -> Position:
+    position = Position()
+    for i, col in enumerate(moves):
+        position.play(int(col), ai.PLAYER_HUMAN if i % 2 == 0 else ai.PLAYER_AI)
+    return position
+
+
+def main(depths):
+    print(f"{'ordering':<16}" + "".join(f"{f'depth {depth}':>16}" for depth in depths))
+    for name, flags in ORDERINGS.items():
+        row = f"{name:<16}"
+        for depth in depths:
+            nodes = 0
+            start = time.perf_counter()
+            for moves in POSITIONS:
+                position = position_from_moves(moves)
+                ai.transposition_table.clear()
+                ordering = ai.MoveOrdering(root_plies=position.plies, **flags)
+                nodes += ai.iterative_deepening(position, depth, float("inf"), ordering)[3]
+            row += f"{nodes:>10} {time.perf_counter() - start:4.1f}s"
+        print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main([int(depth) for depth in sys.argv[1:]] or DEPTHS)
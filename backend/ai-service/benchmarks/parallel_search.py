@@ -0,0 +1,64 @@
+"""
+Nodes/sec scaling of the parallel root search.
+
+Run from backend/ai-service:  python -m benchmarks.parallel_search [depth]
+
+For each worker count, every position of the suite is searched serially and in
+parallel at the same depth on a fresh transposition table; the moves must match.
+"""
+import asyncio
+import sys
+import time
+
+from app.bitboard import Position
+from app.pool import SearchPool
+from app.routers import ai
+
+# Positions given as the sequence of columns played, human first
+POSITIONS = ["3", "33", "323", "3324", "2234", "33443", "012345"]
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def board_from_moves(moves: str):
+    position = Position()
+    for i, col in enumerate(moves):
+        position.play(int(col), ai.PLAYER_HUMAN if i % 2 == 0 else ai.PLAYER_AI)
+    return position.to_board()
+
+
+def main(depth: int):
+    boards = [board_from_moves(moves) for moves in POSITIONS]
+    for workers in WORKER_COUNTS:
+        ai.search_pool = SearchPool(workers, max_queue=len(boards) * 7)
+        ai.start_search_pool()
+        try:
+            # Spawn the workers before timing
+            asyncio.run(ai.parallel_root_search(ai.search_pool, boards[0], 1, 1000, workers))
+            serial_nodes = parallel_nodes = 0
+            serial_time = parallel_time = 0.0
+            for moves, board in zip(POSITIONS, boards):
+                ai.transposition_table.clear()
+                start = time.perf_counter()
+                serial_col, _, _, nodes = ai.iterative_deepening(Position.from_board(board), depth, float("inf"))
+                serial_time += time.perf_counter() - start
+                serial_nodes += nodes
+
+                ai.transposition_table.clear()
+                start = time.perf_counter()
+                col, _, _, nodes = asyncio.run(
+                    ai.parallel_root_search(ai.search_pool, board, depth, float("inf"), workers)
+                )
+                parallel_time += time.perf_counter() - start
+                parallel_nodes += nodes
+                assert col == serial_col, f"{moves}: parallel played {col}, serial played {serial_col}"
+        finally:
+            ai.stop_search_pool()
+        print(
+            f"workers={workers}: serial {serial_nodes / serial_time:9.0f} nodes/s ({serial_time:.2f}s), "
+            f"parallel {parallel_nodes / parallel_time:9.0f} nodes/s ({parallel_time:.2f}s), "
+            f"speedup x{serial_time / parallel_time:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
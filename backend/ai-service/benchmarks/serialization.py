@@ -0,0 +1,47 @@
+"""
+Serialization cost of the /ai/moves results, stdlib json vs orjson.
+
+Run from backend/ai-service:  python -m benchmarks.serialization [results]
+
+The results of a batch are generated (no search is run) and rendered as the
+JSON array of a small batch (jsonable_encoder + stdlib json before, orjson
+now) and as the NDJSON lines of a streamed batch (json.dumps before,
+orjson.dumps now). Both renderings must decode to the same JSON.
+"""
+import json
+import random
+import sys
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def compare(name: str, repeat: int, before, after):
+    assert [json.loads(line) for line in before().splitlines()] == \
+        [json.loads(line) for line in after().splitlines()], f"{name}: bodies differ"
+    timings = []
+    for render in (before, after):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = render()
+        timings.append((time.perf_counter() - start) / repeat * 1e3)
+    print(f"{name:<36}{len(body):>10} B{timings[0]:>12.3f} ms{timings[1]:>12.3f} ms{timings[0] / timings[1]:>8.1f}x")
+
+
+def main(count: int):
+    rng = random.Random(42)
+    results = [{"column": rng.randrange(7), "depth": rng.randint(1, 12)} for _ in range(count)]
+    repeat = max(1, 20000 // count)
+
+    print(f"{'endpoint':<36}{'body':>12}{'json':>15}{'orjson':>15}{'gain':>9}")
+    compare(f"POST /ai/moves array ({count})", repeat,
+            lambda: JSONResponse(jsonable_encoder(results)).body, lambda: ORJSONResponse(results).body)
+    compare(f"POST /ai/moves NDJSON ({count})", repeat,
+            lambda: b"".join((json.dumps(result) + "\n").encode() for result in results),
+            lambda: b"".join(orjson.dumps(result) + b"\n" for result in results))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
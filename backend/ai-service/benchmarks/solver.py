@@ -0,0 +1,126 @@
+"""
+Regression suite of the perfect-play solver.
+
+Run from backend/ai-service:  python -m benchmarks.solver
+Regenerate the suite:         python -m benchmarks.solver --generate
+
+solver_positions.txt holds one position per line: the moves played (1-based
+columns, "4453") and the exact score for the player to move. The scores were
+computed by exhaustive search (exact_score below, independent of app.solver).
+Each position is solved from an empty transposition table and the solve time
+is reported.
+"""
+import os
+import random
+import sys
+import time
+
+from app.bitboard import Position, ROWS, COLS, has_won
+from app.solver import Solver, parse_moves
+
+SUITE_PATH = os.path.join(os.path.dirname(__file__), "solver_positions.txt")
+CELLS = ROWS * COLS
+
+
+def position_from_moves(moves: str):
+    """
+    Returns (position, player to move).
+    """
+    position = Position()
+    piece = 1
+    for col in parse_moves(moves):
+        position.play(col, piece)
+        piece = 3 - piece
+    return position, piece
+
+
+def can_win_now(position: Position, piece: int) -> bool:
+    for col in range(COLS):
+        if position.can_play(col):
+            position.play(col, piece)
+            won = has_won(position.pieces[piece])
+            position.undo(col, piece)
+            if won:
+                return True
+    return False
+
+
+def exact_score(position: Position, piece: int, cache: dict) -> int:
+    """
+    Plain exhaustive negamax, memoized on the exact position.
+    """
+    key = (position.pieces[1], position.pieces[2])
+    if key in cache:
+        return cache[key]
+    if can_win_now(position, piece):
+        cache[key] = (CELLS + 1 - position.plies) // 2
+        return cache[key]
+    columns = [col for col in range(COLS) if position.can_play(col)]
+    if not columns:
+        return 0
+    best = None
+    for col in columns:
+        position.play(col, piece)
+        score = -exact_score(position, 3 - piece, cache)
+        position.undo(col, piece)
+        best = score if best is None else max(best, score)
+    cache[key] = best
+    return best
+
+
+def generate(count: int = 40, min_empty: int = 10, max_empty: int = 18):
+    rng = random.Random(2024)
+    lines = []
+    while len(lines) < count:
+        empty = rng.randint(min_empty, max_empty)
+        position, piece, moves = Position(), 1, ""
+        while position.plies < CELLS - empty:
+            columns = [col for col in range(COLS) if position.can_play(col)]
+            col = rng.choice(columns)
+            position.play(col, piece)
+            if has_won(position.pieces[piece]):
+                break
+            moves += str(col + 1)
+            piece = 3 - piece
+        else:
+            position, piece = position_from_moves(moves)
+            if not can_win_now(position, piece):
+                lines.append(f"{moves} {exact_score(position, piece, {})}")
+    with open(SUITE_PATH, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    print(f"Wrote {len(lines)} positions to {SUITE_PATH}")
+
+
+def main():
+    with open(SUITE_PATH) as file:
+        suite = [line.split() for line in file if line.strip()]
+    total = 0.0
+    failures = 0
+    for moves, expected in suite:
+        position, piece = position_from_moves(moves)
+        solver = Solver(table_size=1 << 16)
+        start = time.perf_counter()
+        col, score = solver.best_move(position, piece, node_budget=10 ** 9)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+
+        # The move must reach the score: check it with the exhaustive search
+        position.play(col, piece)
+        if has_won(position.pieces[piece]):
+            move_score = (CELLS + 1 - (position.plies - 1)) // 2
+        else:
+            move_score = -exact_score(position, 3 - piece, {})
+        ok = score == int(expected) and move_score == score
+        failures += not ok
+        print(f"{moves:<42} expected {int(expected):>3} got {score:>3} move {col + 1} "
+              f"{'ok ' if ok else 'FAIL'} {solver.nodes:>7} nodes {elapsed * 1000:8.1f} ms")
+    print(f"{len(suite) - failures}/{len(suite)} positions correct, {total / len(suite) * 1000:.1f} ms per solve")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if "--generate" in sys.argv:
+        generate()
+    else:
+        main()
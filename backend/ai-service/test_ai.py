@@ -0,0 +1,338 @@
+from fastapi.testclient import TestClient
+import asyncio
+import json
+import os
+import pytest
+import random
+import time
+from unittest.mock import patch
+
+# Searches sur le pool de threads de la boucle, pas de processus (avant d'importer le routeur)
+os.environ["AI_POOL_WORKERS"] = "0"
+
+from app.bitboard import Position, ROWS, COLS, has_won
+from app.board_codec import encode_bitboard
+from app.evaluation import window_score_table, score_positions, score_bitboard
+from app.main import app
+from app.pool import SearchPool
+from app.routers import ai
+from app.solver import Solver, parse_moves
+from app.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+def random_position(rng: random.Random) -> Position:
+    """
+    Position d'une partie aléatoire arrêtée à un coup au hasard (ou à la victoire).
+    """
+    position = Position()
+    piece = ai.PLAYER_HUMAN
+    for _ in range(rng.randint(0, 42)):
+        columns = [col for col in range(COLS) if position.can_play(col)]
+        if not columns:
+            break
+        position.play(rng.choice(columns), piece)
+        if has_won(position.pieces[piece]):
+            break
+        piece = 3 - piece
+    return position
+
+
+def test_vectorized_evaluation_matches_score_position():
+    rng = random.Random(42)
+    positions = [random_position(rng) for _ in range(300)]
+    boards = [position.to_board() for position in positions]
+    masks_human = [position.pieces[ai.PLAYER_HUMAN] for position in positions]
+    masks_ai = [position.pieces[ai.PLAYER_AI] for position in positions]
+
+    for player in (ai.PLAYER_HUMAN, ai.PLAYER_AI):
+        table = window_score_table(ai.evaluate_window, player)
+        expected = [ai.score_position(board, player) for board in boards]
+        # Un plateau à la fois, et tous les plateaux en un seul appel
+        assert [score_bitboard(position, table, player) for position in positions] == expected
+        assert score_positions(masks_human, masks_ai, table, player).tolist() == expected
+
+
+def test_ai_window_scores_match_evaluate_window():
+    table = window_score_table(ai.evaluate_window, ai.PLAYER_AI)
+    assert (table == ai.AI_WINDOW_SCORES).all()
+    # Code base 3 de la fenêtre [2, 2, 2, 0] : 2 + 2 * 3 + 2 * 9
+    assert ai.AI_WINDOW_SCORES[26] == ai.evaluate_window([2, 2, 2, 0], ai.PLAYER_AI) == 5
+
+
+# Suite de positions à la valeur connue de benchmarks/solver.py
+SOLVER_SUITE_PATH = os.path.join(os.path.dirname(__file__), "benchmarks", "solver_positions.txt")
+
+
+def test_solver_known_values():
+    with open(SOLVER_SUITE_PATH) as file:
+        suite = [line.split() for line in file if line.strip()]
+    # Sous-ensemble rapide : les positions d'au plus 17 cases vides (quelques ms chacune)
+    suite = [(moves, int(expected)) for moves, expected in suite if len(moves) >= ROWS * COLS - 17]
+    assert len(suite) >= 20
+    for moves, expected in suite:
+        position, piece = Position(), ai.PLAYER_HUMAN
+        for col in parse_moves(moves):
+            position.play(col, piece)
+            piece = 3 - piece
+        col, score = Solver(table_size=1 << 16).best_move(position, piece, node_budget=10 ** 6)
+        assert score == expected, moves
+
+        # Le coup renvoyé doit atteindre ce score
+        position.play(col, piece)
+        if has_won(position.pieces[piece]):
+            move_score = (ROWS * COLS + 1 - (position.plies - 1)) // 2
+        else:
+            move_score = -Solver(table_size=1 << 16).best_move(position, 3 - piece, node_budget=10 ** 6)[1]
+        assert move_score == score, moves
+
+
+def list_winning_move(board, piece):
+    """
+    Ancienne détection de victoire, par parcours des listes du plateau.
+    """
+    rows, cols = len(board), len(board[0])
+    for row in range(rows):
+        for col in range(cols - 3):
+            if all(board[row][col + i] == piece for i in range(4)):
+                return True
+    for col in range(cols):
+        for row in range(rows - 3):
+            if all(board[row + i][col] == piece for i in range(4)):
+                return True
+    for row in range(rows - 3):
+        for col in range(cols - 3):
+            if all(board[row + i][col + i] == piece for i in range(4)):
+                return True
+    for row in range(rows - 3):
+        for col in range(3, cols):
+            if all(board[row + i][col - i] == piece for i in range(4)):
+                return True
+    return False
+
+
+def position_state(position: Position) -> list:
+    # Tous les attributs de la position, listes copiées
+    return [list(value) if isinstance(value, list) else value
+            for value in (getattr(position, name) for name in Position.__slots__)]
+
+
+def test_bitboard_play_and_has_won_match_list_board():
+    rng = random.Random(7)
+    for _ in range(200):
+        position, board = Position(), [[0] * COLS for _ in range(ROWS)]
+        piece = ai.PLAYER_HUMAN
+        while True:
+            columns = [col for col in range(COLS) if board[0][col] == 0]
+            assert [col for col in range(COLS) if position.can_play(col)] == columns
+            if not columns:
+                break
+            col = rng.choice(columns)
+            row = max(row for row in range(ROWS) if board[row][col] == 0)
+            assert position.next_row(col) == row
+            position.play(col, piece)
+            board[row][col] = piece
+            assert position.to_board() == board
+            for player in (ai.PLAYER_HUMAN, ai.PLAYER_AI):
+                assert has_won(position.pieces[player]) == list_winning_move(board, player)
+            if has_won(position.pieces[piece]):
+                break
+            piece = 3 - piece
+        # Le plateau reconverti donne la même position, hash compris
+        assert position_state(Position.from_board(board)) == position_state(position)
+
+
+def test_bitboard_undo_restores_position():
+    position = Position.from_board([[0] * COLS for _ in range(ROWS)])
+    for col in (3, 3, 2, 4):
+        position.play(col, ai.PLAYER_HUMAN)
+    before = position_state(position)
+    position.play(5, ai.PLAYER_AI)
+    position.undo(5, ai.PLAYER_AI)
+    assert position_state(position) == before
+
+
+def test_transposition_table_store_and_probe():
+    table = TranspositionTable(0.001)
+    assert table.probe(12345) is None
+    table.store(12345, 5, LOWER, -42, 3)
+    assert table.probe(12345) == (5, LOWER, -42, 3)
+    table.store(12345, 2, EXACT, 10 ** 14, None)  # Même position : toujours remplacée
+    assert table.probe(12345) == (2, EXACT, 10 ** 14, None)
+    # Même case, autre clé : un échec, compté comme collision
+    assert table.probe(12345 + table.size) is None
+    assert table.stats()["collisions"] == 1
+
+
+def test_transposition_table_replacement():
+    table = TranspositionTable(0.001)
+    key, other = 99, 99 + table.size  # Même case
+    table.store(key, 6, EXACT, 10, 1)
+    table.store(other, 4, UPPER, 20, 2)  # Moins profonde, même recherche : ignorée
+    assert table.probe(key) == (6, EXACT, 10, 1)
+    assert table.probe(other) is None
+    table.store(other, 6, UPPER, 20, 2)  # Aussi profonde : remplace
+    assert table.probe(other) == (6, UPPER, 20, 2)
+    table.new_search()
+    table.store(key, 1, EXACT, 30, None)  # Recherche précédente : remplace
+    assert table.probe(key) == (1, EXACT, 30, None)
+    assert table.stats()["overwrites"] == 2
+    table.clear()
+    assert table.probe(key) is None
+
+
+def test_iterative_deepening_stops_at_time_budget():
+    ai.transposition_table.clear()
+    position = Position()
+    start = time.monotonic()
+    col, value, depth, nodes = ai.iterative_deepening(position, ROWS * COLS, 100)
+    elapsed = time.monotonic() - start
+    assert col in range(COLS)
+    assert 1 <= depth < ROWS * COLS
+    assert nodes > 0
+    # Seule l'itération en cours dépasse le budget, et au plus de 256 nœuds
+    assert elapsed < 1
+
+
+def test_iterative_deepening_max_depth_and_forced_win():
+    ai.transposition_table.clear()
+    position = Position()
+    assert ai.iterative_deepening(position, 3, 10000)[2] == 3
+    # L'IA gagne en colonne 0 : trouvé dès la profondeur 1
+    for col in (0, 1, 0, 1, 0, 2):
+        position.play(col, ai.PLAYER_AI if col == 0 else ai.PLAYER_HUMAN)
+    col, value, depth, _ = ai.iterative_deepening(position, ROWS * COLS, 10000)
+    assert (col, value, depth) == (0, ai.WIN_SCORE, 1)
+
+
+def test_search_context_checks_the_clock_every_256_ticks():
+    context = ai.SearchContext(deadline=time.monotonic() - 1)
+    context.nodes += 7  # Feuilles comptées par evaluate_leaves, sans tick
+    for _ in range(255):
+        context.tick()
+    with pytest.raises(ai.SearchTimeout):
+        context.tick()
+
+
+def root_result(values, final=False):
+    return {"values": values, "final": final, "nodes": 1}
+
+
+def test_combine_root_results_deepest_common_depth():
+    # La colonne 4 n'a fini que la profondeur 1 : les autres sont comparées à cette profondeur
+    results = {3: root_result([5, 1]), 2: root_result([4, 6]), 4: root_result([2])}
+    assert ai.combine_root_results([3, 2, 4], results) == (3, 5, 1)
+    # Un score final vaut à toutes les profondeurs
+    results[4] = root_result([9], final=True)
+    assert ai.combine_root_results([3, 2, 4], results) == (4, 9, 2)
+    results = {3: root_result([1], final=True), 2: root_result([0, 0, -2], final=True)}
+    assert ai.combine_root_results([3, 2], results) == (3, 1, 3)
+
+
+def test_combine_root_results_ties_keep_previous_best():
+    # Profondeur 1 : 2 est le meilleur coup ; profondeur 2 : égalité, 2 passe avant 3 comme dans minimax
+    results = {3: root_result([1, 7]), 2: root_result([5, 7]), 4: root_result([0, 7])}
+    assert ai.combine_root_results([3, 2, 4], results) == (2, 7, 2)
+    # Sans meilleur coup précédent différent, l'ordre de la racine départage
+    results = {3: root_result([7, 7]), 2: root_result([7, 7])}
+    assert ai.combine_root_results([3, 2], results) == (3, 7, 2)
+
+
+def test_parallel_root_search_matches_serial():
+    # Pool sans processus : les coups de la racine sont cherchés sur des threads
+    pool = SearchPool(workers=0, max_queue=COLS)
+    for moves in ("3", "33", "323", "3324", "33443", "012345"):
+        position = Position()
+        for index, col in enumerate(moves):
+            position.play(int(col), ai.PLAYER_HUMAN if index % 2 == 0 else ai.PLAYER_AI)
+        board = position.to_board()
+        ai.transposition_table.clear()
+        serial = ai.iterative_deepening(Position.from_board(board), 4, float("inf"))
+        ai.transposition_table.clear()
+        parallel = asyncio.run(ai.parallel_root_search(pool, board, 4, float("inf"), 3))
+        assert parallel[:3] == serial[:3], moves
+
+
+def ai_wins_in_column_0():
+    board = [[0] * COLS for _ in range(ROWS)]
+    board[5][0] = board[4][0] = board[3][0] = ai.PLAYER_AI
+    board[5][1] = board[4][1] = board[5][2] = ai.PLAYER_HUMAN
+    return board
+
+
+def test_ai_move_list_board():
+    client = TestClient(app)
+    for difficulty in ("medium", "hard", "expert"):
+        response = client.post(f"/ai/move?difficulty={difficulty}", json=ai_wins_in_column_0())
+        assert response.status_code == 200
+        assert response.json()["column"] == 0
+        assert response.json()["think_ms"] >= 0
+    # En mode facile, un coup sur deux est joué au hasard
+    for _ in range(10):
+        response = client.post("/ai/move?difficulty=easy&time_budget=50", json=ai_wins_in_column_0())
+        assert response.status_code == 200
+        assert response.json()["column"] in range(COLS)
+
+
+def test_ai_move_compact_boards():
+    client = TestClient(app)
+    response = client.post("/ai/move", json=encode_bitboard(ai_wins_in_column_0()))
+    assert response.status_code == 200
+    assert response.json()["column"] == 0
+    # Suite de coups : l'humain (1) commence, l'IA (2) aligne trois pièces en colonne 1
+    response = client.post("/ai/move", json="4141415")
+    assert response.status_code == 200
+    assert response.json()["column"] == 0
+
+
+def test_ai_move_invalid_requests():
+    client = TestClient(app)
+    full_board = [[1 + (row // 2 + col) % 2 for col in range(COLS)] for row in range(ROWS)]
+    cases = [
+        ("/ai/move?difficulty=impossible", [[0] * COLS for _ in range(ROWS)], "Invalid difficulty level"),
+        ("/ai/move", [[0] * COLS for _ in range(5)], "Board must have 6 rows of 7 columns"),
+        ("/ai/move", [[3] + [0] * 6] + [[0] * COLS for _ in range(5)], "Invalid cell value"),
+        ("/ai/move", full_board, "No valid moves available"),
+        ("/ai/move", "4444444", "Invalid board encoding: column 4 is full"),
+        ("/ai/move", "A" * 15 + "C", "Invalid board encoding: bitboard has a floating piece"),
+    ]
+    for url, board, detail in cases:
+        response = client.post(url, json=board)
+        assert response.status_code == 400
+        assert response.json()["detail"] == detail
+    assert client.post("/ai/move?time_budget=0", json=[[0] * COLS for _ in range(ROWS)]).status_code == 422
+
+
+def test_ai_moves_batch():
+    client = TestClient(app)
+    items = [
+        {"board": ai_wins_in_column_0(), "difficulty": "expert"},
+        {"board": "4141415"},
+        {"board": encode_bitboard(ai_wins_in_column_0()), "difficulty": "hard", "time_budget": 100},
+    ]
+    response = client.post("/ai/moves", json=items)
+    assert response.status_code == 200
+    assert [result["column"] for result in response.json()] == [0, 0, 0]
+
+    # Demandé en NDJSON : une ligne par plateau, dans l'ordre de la requête
+    response = client.post("/ai/moves", json=items, headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["column"] for line in response.text.splitlines()] == [0, 0, 0]
+
+
+def test_ai_moves_invalid_batch():
+    client = TestClient(app)
+    items = [{"board": "4444"}, {"board": "44444444"}]
+    response = client.post("/ai/moves", json=items)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Board 1: Invalid board encoding: column 4 is full"
+
+    items = [{"board": [[0] * COLS for _ in range(ROWS)], "difficulty": "impossible"}]
+    response = client.post("/ai/moves", json=items)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Board 0: Invalid difficulty level"
+
+    with patch.object(ai, "BATCH_MAX_ITEMS", 1):
+        response = client.post("/ai/moves", json=[{"board": "4"}, {"board": "4"}])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Batch is limited to 1 boards"
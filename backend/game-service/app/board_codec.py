@@ -0,0 +1,120 @@
+"""
+Compact encodings of a 6x7 board, accepted alongside the JSON list of rows.
+
+- bitboard: 16 url-safe base64 characters, the two 42-bit masks of players 1
+  and 2, each on 6 bytes (big-endian). Bit col * 6 + height is the cell at
+  that height (0 = bottom) of the column. The 6 unused high bits of every
+  mask make the first character always "A".
+- moves: the columns played, 1 to 7, by players 1 and 2 in turn ("4453").
+
+The same module is used by the game-service and the ai-service.
+"""
+from typing import List, Union
+import base64
+import binascii
+
+ROWS = 6
+COLS = 7
+CELLS = ROWS * COLS
+BITBOARD_LENGTH = 16  # base64 of 2 x 6 bytes
+MASK_BYTES = 6
+COLUMN_MASK = (1 << ROWS) - 1
+
+BOARD_FORMATS = ("list", "bitboard")
+
+
+def can_encode(board: List[List[int]]) -> bool:
+    return (len(board) == ROWS and all(len(row) == COLS for row in board)
+            and all(cell in (0, 1, 2) for row in board for cell in row))
+
+
+def board_masks(board: List[List[int]]) -> List[int]:
+    """
+    [0, player 1 mask, player 2 mask] of a 6x7 board.
+    """
+    masks = [0, 0, 0]
+    for row_index, row in enumerate(board):
+        height = ROWS - 1 - row_index
+        for col, cell in enumerate(row):
+            if cell:
+                masks[cell] |= 1 << (col * ROWS + height)
+    return masks
+
+
+def masks_board(mask1: int, mask2: int) -> List[List[int]]:
+    board = [[0] * COLS for _ in range(ROWS)]
+    for col in range(COLS):
+        pieces1 = mask1 >> (col * ROWS) & COLUMN_MASK
+        pieces2 = mask2 >> (col * ROWS) & COLUMN_MASK
+        row = ROWS - 1
+        while pieces1 | pieces2:  # Pieces are stacked from the bottom: stop at the first empty cell
+            if pieces1 & 1:
+                board[row][col] = 1
+            elif pieces2 & 1:
+                board[row][col] = 2
+            pieces1 >>= 1
+            pieces2 >>= 1
+            row -= 1
+    return board
+
+
+def encode_bitboard(board: List[List[int]]) -> str:
+    _, mask1, mask2 = board_masks(board)
+    data = mask1.to_bytes(MASK_BYTES, "big") + mask2.to_bytes(MASK_BYTES, "big")
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_bitboard(value: str) -> List[List[int]]:
+    if len(value) != BITBOARD_LENGTH:
+        raise ValueError("bitboard must be 16 base64 characters")
+    try:
+        data = base64.urlsafe_b64decode(value.encode())
+    except (binascii.Error, UnicodeEncodeError):
+        raise ValueError("bitboard is not valid base64")
+    mask1 = int.from_bytes(data[:MASK_BYTES], "big")
+    mask2 = int.from_bytes(data[MASK_BYTES:], "big")
+    if (mask1 | mask2) >> CELLS or mask1 & mask2:
+        raise ValueError("bitboard masks overlap or exceed 42 cells")
+    for col in range(COLS):
+        column = (mask1 | mask2) >> (col * ROWS) & COLUMN_MASK
+        if column & (column + 1):
+            raise ValueError("bitboard has a floating piece")
+    return masks_board(mask1, mask2)
+
+
+def decode_moves(value: str) -> List[List[int]]:
+    if len(value) > CELLS:
+        raise ValueError("more moves than cells")
+    board = [[0] * COLS for _ in range(ROWS)]
+    heights = [0] * COLS
+    for index, char in enumerate(value):
+        if char < "1" or char > "7":
+            raise ValueError("moves must be columns 1 to 7")
+        col = ord(char) - ord("1")
+        if heights[col] == ROWS:
+            raise ValueError(f"column {char} is full")
+        board[ROWS - 1 - heights[col]][col] = 1 if index % 2 == 0 else 2
+        heights[col] += 1
+    return board
+
+
+def decode_board(value: Union[str, List[List[int]]]) -> List[List[int]]:
+    """
+    Board from any accepted format: a list of rows is returned as is, a
+    string is a bitboard when it has 16 characters and starts with "A",
+    a move sequence otherwise. Raises ValueError on a malformed string.
+    """
+    if not isinstance(value, str):
+        return value
+    if len(value) == BITBOARD_LENGTH and value[0] == "A":
+        return decode_bitboard(value)
+    return decode_moves(value)
+
+
+def encode_board(board: List[List[int]], board_format: str) -> Union[str, List[List[int]]]:
+    """
+    Board in the requested response format; boards that are not 6x7 stay lists.
+    """
+    if board_format == "bitboard" and can_encode(board):
+        return encode_bitboard(board)
+    return board
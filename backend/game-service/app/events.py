@@ -0,0 +1,133 @@
+from typing import Callable, Dict, Hashable, List, Optional, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GameEvents:
+    """
+    Fan-out of online game events (join, move, end, reset, closed) to the
+    WebSocket connections of each game, and wake-up of the long-polling
+    requests waiting for a game to change.
+
+    publish() can be called from any thread: the REST handlers are plain
+    functions run in the thread pool, so events are handed over to the event
+    loop with call_soon_threadsafe. Every connection reads from its own
+    bounded queue; a connection that falls `max_queue` events behind gets a
+    None sentinel and is closed, the client then reloads the game over REST.
+
+    When the games are shared by several workers, watch() forwards the
+    changes made by the other workers as full "state" events.
+    """
+
+    def __init__(self, max_queue: int = 64):
+        self.max_queue = max_queue
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.waiters: Dict[str, asyncio.Event] = {}
+        self.waiting: Dict[str, int] = {}
+        self.versions: Dict[str, int] = {}  # Last version pushed to the subscribers of each game
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, code: str, version: int) -> asyncio.Queue:
+        """
+        Register a connection to a game whose state was read at `version`.
+        Must be called from the event loop.
+        """
+        self.loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(self.max_queue)
+        self.subscribers.setdefault(code, set()).add(queue)
+        self.versions[code] = max(version, self.versions.get(code, version))
+        return queue
+
+    def unsubscribe(self, code: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(code)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[code]
+                self.versions.pop(code, None)
+
+    async def wait(self, code: str, timeout: float, changed: Callable[[], bool]) -> bool:
+        """
+        Wait until an event is published for the game or changed() is true.
+        Returns False on timeout. changed() is checked once the waiter is
+        registered: a change made by another thread before that point is seen
+        by changed(), one made after it is published to the waiter.
+        """
+        self.loop = asyncio.get_event_loop()
+        event = self.waiters.get(code)
+        if event is None:
+            event = self.waiters[code] = asyncio.Event()
+        self.waiting[code] = self.waiting.get(code, 0) + 1
+        try:
+            if changed():
+                return True
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting[code] -= 1
+            if not self.waiting[code]:
+                del self.waiting[code]
+                if self.waiters.get(code) is event:
+                    del self.waiters[code]
+
+    def publish(self, code: str, event: dict):
+        # Nothing to do (and no loop to wake up) when nobody listens to this game
+        if self.loop is None or (code not in self.subscribers and code not in self.waiters):
+            return
+        self.published += 1
+        self.loop.call_soon_threadsafe(self._deliver, code, event)
+
+    def _deliver(self, code: str, event: dict):
+        waiter = self.waiters.pop(code, None)
+        if waiter is not None:
+            waiter.set()  # The next waiters of this game get a new Event
+        if "version" in event and code in self.versions:
+            self.versions[code] = max(event["version"], self.versions[code])
+        for queue in list(self.subscribers.get(code, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.overflows += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def watch(self, fetch_games: Callable[[List[Hashable]], Dict[Hashable, dict]], interval: float):
+        """
+        Every `interval` seconds, read the games that have subscribers here
+        (fetch_games runs in the thread pool) and push a "state" event for each
+        game changed by another worker, or "closed" if it is gone. Events go
+        through publish(), like the ones of this worker.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            codes = list(self.subscribers)
+            if not codes:
+                continue
+            try:
+                games = await loop.run_in_executor(None, fetch_games, codes)
+            except Exception:
+                logger.exception("Could not read the watched games")
+                continue
+            for code in codes:
+                game = games.get(code)
+                if game is None:
+                    self.publish(code, {"type": "closed"})
+                elif game["version"] > self.versions.get(code, game["version"]):
+                    self.publish(code, {"type": "state", **game})
+
+    def stats(self) -> dict:
+        return {
+            "games": len(self.subscribers),
+            "connections": sum(len(queues) for queues in self.subscribers.values()),
+            "long_polls": sum(self.waiting.values()),
+            "published": self.published,
+            "overflows": self.overflows,
+        }
@@ -1,8 +1,10 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import game, player
 
-app = FastAPI()
+# Réponses sérialisées par orjson
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Configurer les en-têtes CORS
 app.add_middleware(
@@ -11,12 +13,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permettre toutes les méthodes
     allow_headers=["*"],  # Permettre tous les en-têtes
+    expose_headers=["ETag"],  # Lu par le long polling du frontend
 )
 
 # Inclure les routes du service de jeu
 app.include_router(game.router, prefix="/game", tags=["game"])
 app.include_router(game.router_online, prefix="/game-online", tags=["game-online"])
 
+# Stockage des parties (index MongoDB) et relais des coups joués sur les autres workers
+@app.on_event("startup")
+def start_game_state():
+    game.start_state_watcher()
+
+@app.on_event("shutdown")
+def stop_game_state():
+    game.stop_state_watcher()
+
+# Tampon d'écriture des scores (GAME_SCORE_BUFFER=1), vidé à l'arrêt
+@app.on_event("startup")
+def start_score_buffer():
+    game.start_score_buffer()
+
+@app.on_event("shutdown")
+def stop_score_buffer():
+    game.stop_score_buffer()
+
 # Route d'accueil
 @app.get("/")
 def read_root():
@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from typing import List, Optional
 from app.model_player import Player
+from app.utils import count_pieces
+from app.board_codec import decode_board
 
 # Modèle pour une partie de Puissance 4
 class Game(BaseModel):
@@ -9,3 +11,14 @@ class Game(BaseModel):
     current_turn: int  # ID du joueur dont c'est le tour
     board: List[List[int]]  # Représentation du plateau (6 lignes, 7 colonnes)
     status: Optional[str] = "active"  # Statut de la partie (active, won, draw)
+    moves: int = 0  # Nombre de pions sur le plateau (détection du match nul)
+
+    @validator("board", pre=True)
+    def decode_compact_board(cls, value):
+        # Plateau reçu en bitboard ou en suite de coups (voir app/board_codec.py)
+        return decode_board(value)
+
+    @validator("moves", always=True)
+    def count_moves(cls, value, values):
+        # Le compteur est tenu par le serveur : il part toujours du plateau reçu
+        return count_pieces(values.get("board", []))
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+import threading
+import time
+
+
+class GameRepository:
+    """
+    In-memory games keyed by id (or game code) with O(1) get, put and delete.
+
+    Entries are kept in least-recently-used order. A game that has not been
+    read or written for `ttl` seconds is considered abandoned and is evicted,
+    a finished game (see `is_finished`) after `finished_ttl` seconds. When
+    more than `max_games` games are stored the least recently used one is
+    dropped. Expiry is checked on every access and the oldest entries are
+    swept on writes, so no background task is needed.
+
+    The dict operations used by the routers (in, [], del, get, values, len)
+    are supported. Every operation holds `lock`, which callers can also take
+    to make a check followed by a write atomic.
+    """
+
+    def __init__(self, max_games: int, ttl: float, finished_ttl: float,
+                 is_finished: Callable[[Any], bool] = lambda game: False,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_games = max_games
+        self.ttl = ttl
+        self.finished_ttl = finished_ttl
+        self.is_finished = is_finished
+        self.clock = clock
+        self.entries: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [game, last access]
+        self.evicted = 0
+        self.lock = threading.RLock()
+
+    def _expired(self, entry: list, now: float) -> bool:
+        game, last_access = entry
+        ttl = self.finished_ttl if self.is_finished(game) else self.ttl
+        return now - last_access > ttl
+
+    def _stored(self, key: Hashable, game: Any):
+        """
+        Called after a game is written (subclasses maintain their indexes here).
+        """
+
+    def _removed(self, key: Hashable, game: Any):
+        """
+        Called after a game is deleted or evicted.
+        """
+
+    def _evict(self, key: Hashable):
+        game, _ = self.entries.pop(key)
+        self.evicted += 1
+        self._removed(key, game)
+
+    def _sweep(self, now: float):
+        # The front holds the least recently used games: stop at the first live one
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_games and not self._expired(entry, now):
+                break
+            self._evict(key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            now = self.clock()
+            if self._expired(entry, now):
+                self._evict(key)
+                return default
+            entry[1] = now
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, game: Any):
+        with self.lock:
+            now = self.clock()
+            previous = self.entries.get(key)
+            if previous is not None and previous[0] is not game:
+                self._removed(key, previous[0])
+            self.entries[key] = [game, now]
+            self.entries.move_to_end(key)
+            self._stored(key, game)
+            self._sweep(now)
+
+    def delete(self, key: Hashable) -> bool:
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return False
+            self._removed(key, entry[0])
+            return True
+
+    def values(self) -> List[Any]:
+        with self.lock:
+            now = self.clock()
+            self._sweep(now)
+            return [entry[0] for entry in self.entries.values() if not self._expired(entry, now)]
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self.delete(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: Hashable) -> Any:
+        game = self.get(key)
+        if game is None:
+            raise KeyError(key)
+        return game
+
+    def __setitem__(self, key: Hashable, game: Any):
+        self.put(key, game)
+
+    def __delitem__(self, key: Hashable):
+        if not self.delete(key):
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self.entries))
+
+    def stats(self) -> dict:
+        return {"games": len(self.entries), "max_games": self.max_games, "evicted": self.evicted}
+
+
+class OnlineGameRepository(GameRepository):
+    """
+    Online games keyed by game code, with an index of the player names
+    (player1 / player2 of each game) to their game code.
+
+    The index is updated under the repository lock whenever a game is
+    written, deleted or evicted, so a name is in use exactly as long as a
+    live game holds it. After changing the players of a stored game in
+    place, write it back with put() to refresh the index.
+    """
+
+    PLAYER_FIELDS = ("player1", "player2")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.players: Dict[str, Hashable] = {}
+
+    def _stored(self, key: Hashable, game: dict):
+        for field in self.PLAYER_FIELDS:
+            name = game.get(field)
+            if name is not None:
+                self.players[name] = key
+
+    def _removed(self, key: Hashable, game: dict):
+        for field in self.PLAYER_FIELDS:
+            name = game.get(field)
+            if name is not None and self.players.get(name) == key:
+                del self.players[name]
+
+    def game_of(self, name: str) -> Optional[Hashable]:
+        """
+        Code of the live game in which this player name is used, or None.
+        """
+        with self.lock:
+            key = self.players.get(name)
+            if key is None or self.get(key) is None:  # get() evicts the game if it expired
+                return None
+            return key
+
+    def name_in_use(self, name: str) -> bool:
+        return self.game_of(name) is not None
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, WebSocket, Request, Response, Query
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from app.model_game import Game
-from app.utils import check_winner
-from typing import List
+from app.utils import check_winner_at, is_board_full
+from app.board_codec import BOARD_FORMATS, encode_board
+from app.repository import GameRepository, OnlineGameRepository
+from app.events import GameEvents
+from app.state import MemoryGameStore, MongoGameStore, GameExists, GameNotFound, NameInUse, StateConflict
+from app.scores import ScoreBuffer, add_score, increment_scores, read_scores
+from typing import Callable, Hashable, List, Optional, Tuple
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, PyMongoError
 import os
 import logging
+import asyncio
+import time
 from pydantic import BaseModel
 
 logging.basicConfig(level=logging.INFO)
@@ -17,13 +27,80 @@ mongo_uri = os.getenv("MONGO_URI", "mongodb://mongo:27017")
 client = MongoClient(mongo_uri)
 db = client["user_db"]
 
-games: List[Game] = []
-online_games = {}
+# Stockage des parties : "memory" (ce processus seulement) ou "mongo" (partagé entre workers / réplicas).
+# Les parties sont indexées par id / code et expirées quand elles sont finies ou abandonnées.
+GAME_STATE_BACKEND = os.getenv("GAME_STATE_BACKEND", "memory")
+GAME_STORE_MAX = int(os.getenv("GAME_STORE_MAX", "10000"))
+GAME_STORE_TTL = float(os.getenv("GAME_STORE_TTL", "3600"))
+GAME_STORE_FINISHED_TTL = float(os.getenv("GAME_STORE_FINISHED_TTL", "600"))
+FINISHED_STATUSES = ("won", "draw")
+
+# Tentatives d'un coup quand un autre worker modifie la même partie en même temps
+CAS_RETRIES = int(os.getenv("GAME_CAS_RETRIES", "16"))
+# Avec un stockage partagé : fréquence de relecture des parties suivies (WebSocket, long polling)
+STATE_POLL_MS = int(os.getenv("GAME_STATE_POLL_MS", "250"))
+
+def is_finished(game: dict) -> bool:
+    return game["status"] in FINISHED_STATUSES
+
+def create_store(name: str, online: bool):
+    if GAME_STATE_BACKEND == "mongo":
+        state_db = client[os.getenv("GAME_STATE_DB", "game_db")]
+        return MongoGameStore(state_db[name], GAME_STORE_TTL, GAME_STORE_FINISHED_TTL, is_finished, index_players=online)
+    repository = (OnlineGameRepository if online else GameRepository)(
+        GAME_STORE_MAX, GAME_STORE_TTL, GAME_STORE_FINISHED_TTL, is_finished=is_finished
+    )
+    return MemoryGameStore(repository)
+
+games = create_store("games", online=False)
+online_games = create_store("online_games", online=True)
+
+# Événements poussés aux joueurs connectés en WebSocket (GET /game-online/{gameCode} reste disponible)
+game_events = GameEvents(int(os.getenv("GAME_EVENTS_QUEUE", "64")))
+watch_task: Optional[asyncio.Task] = None
+
+MAX_WAIT_MS = int(os.getenv("GAME_MAX_WAIT_MS", "30000"))
+
+# Scores : écrits tout de suite, ou regroupés puis écrits en lot (GAME_SCORE_BUFFER=1)
+score_buffer: Optional[ScoreBuffer] = None
+if os.getenv("GAME_SCORE_BUFFER", "0") == "1":
+    score_buffer = ScoreBuffer(
+        db["users"],
+        interval=int(os.getenv("GAME_SCORE_FLUSH_MS", "1000")) / 1000,
+        max_players=int(os.getenv("GAME_SCORE_FLUSH_PLAYERS", "500")),
+    )
 
 class Move(BaseModel):
     column: int
     player_id: int
 
+class ScoreDelta(BaseModel):
+    name: str
+    score: int
+
+class GameScores(BaseModel):
+    gameCode: str
+    scores: List[ScoreDelta]
+
+def requested_board_format(board_format: Optional[str], request: Optional[Request]) -> str:
+    """
+    Board format of a response: the board_format query flag, else a
+    board=bitboard parameter in the Accept header, else the list of rows.
+    """
+    if board_format is None and request is not None:
+        if "board=bitboard" in request.headers.get("accept", "").replace(" ", ""):
+            board_format = "bitboard"
+    if board_format is None:
+        return "list"
+    if board_format not in BOARD_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid board format")
+    return board_format
+
+def with_board(game: dict, board_format: str) -> dict:
+    if board_format == "list" or "board" not in game:
+        return game
+    return {**game, "board": encode_board(game["board"], board_format)}
+
 def drop_piece(board: List[List[int]], column: int, player_id: int) -> int:
     for row_index in range(len(board) - 1, -1, -1):
         if board[row_index][column] == 0:
@@ -31,193 +108,444 @@ def drop_piece(board: List[List[int]], column: int, player_id: int) -> int:
             return row_index
     return -1
 
+def update_game(store, key: Hashable, change: Callable[[dict], object], not_found: str,
+                saved: Optional[Callable[[dict, object], None]] = None) -> Tuple[dict, object]:
+    """
+    Read a game, apply change(game) to it and save it with compare-and-set,
+    starting again from a fresh read when another worker saved the game in
+    between. The updates of one game are serialized in this process by the
+    per-game lock of the store. change may raise HTTPException; its result is
+    returned with the saved game.
+
+    saved(game, result) runs once the game is saved, still under the lock:
+    the events it publishes are queued in version order.
+    """
+    with store.locked(key):
+        for _ in range(CAS_RETRIES):
+            game = store.get_for_update(key)
+            if game is None:
+                raise HTTPException(status_code=404, detail=not_found)
+            result = change(game)
+            try:
+                game = store.save(key, game)
+            except StateConflict:
+                continue
+            except GameNotFound:
+                raise HTTPException(status_code=404, detail=not_found)
+            if saved is not None:
+                saved(game, result)
+            return game, result
+    raise HTTPException(status_code=409, detail="Game is being modified, please retry.")
+
+def start_state_watcher():
+    """
+    With a shared store, forward to this worker's WebSocket clients the changes
+    made by the other workers.
+    """
+    global watch_task
+    online_games.setup()
+    games.setup()
+    if online_games.shared and watch_task is None:
+        watch_task = asyncio.ensure_future(game_events.watch(online_games.get_many, STATE_POLL_MS / 1000))
+
+def stop_state_watcher():
+    global watch_task
+    if watch_task is not None:
+        watch_task.cancel()
+        watch_task = None
+
+def start_score_buffer():
+    if score_buffer is not None:
+        score_buffer.start()
+
+def stop_score_buffer():
+    # Les points encore en mémoire sont écrits avant l'arrêt
+    if score_buffer is not None:
+        score_buffer.stop()
+
+def write_scores(deltas: dict):
+    """
+    Add score deltas (name -> points) in one bulk write, or to the write-behind buffer.
+    """
+    if score_buffer is None:
+        increment_scores(db["users"], deltas)
+    else:
+        score_buffer.add(deltas)
+
+def current_scores(names: List[str]) -> dict:
+    """
+    Scores of players, including the deltas still waiting in the write-behind buffer.
+    """
+    if score_buffer is None:
+        return read_scores(db["users"], names)
+    return score_buffer.scores(names)
+
+def record_scores(deltas: dict) -> dict:
+    """
+    Add score deltas (name -> points) and return the new scores.
+    """
+    if score_buffer is None and len(deltas) == 1:
+        (name, delta), = deltas.items()
+        return {name: add_score(db["users"], name, delta)}
+    write_scores(deltas)
+    return current_scores(list(deltas))
+
+# Fields of a game in the responses (those of the Game model, without the stored version)
+GAME_FIELDS = tuple(Game.__fields__)
+
 @router.get("/", response_model=List[Game])
-def get_games():
-    return games
+def get_games(board_format: Optional[str] = None, request: Request = None):
+    # Games are stored from validated Game objects: sent as they are, without
+    # validation by the response model (kept for the OpenAPI schema)
+    board_format = requested_board_format(board_format, request)
+    return ORJSONResponse([
+        with_board({field: game[field] for field in GAME_FIELDS}, board_format) for game in games.values()
+    ])
 
 @router.post("/", response_model=Game)
-def create_game(game: Game):
+def create_game(game: Game, board_format: Optional[str] = None, request: Request = None):
+    board_format = requested_board_format(board_format, request)
     game.status = "active"
-    games.append(game)
+    games.put(game.id, game.dict())
     logger.info(f"Game created with ID: {game.id}")
+    if board_format != "list":
+        # The board is a string here: not valid for the Game response model
+        return ORJSONResponse(with_board(game.dict(), board_format))
     return game
 
 @router.delete("/{game_id}")
 def delete_game(game_id: int):
-    for game in games:
-        if game.id == game_id:
-            games.remove(game)
-            return {"message": "Game deleted successfully"}
-    raise HTTPException(status_code=404, detail="Game not found")
+    if not games.delete(game_id):
+        raise HTTPException(status_code=404, detail="Game not found")
+    return {"message": "Game deleted successfully"}
 
 @router.put("/{game_id}")
-def play_move(game_id: int, move: Move):
-    for game in games:
-        if game.id == game_id:
-            if move.column < 0 or move.column >= len(game.board[0]):
-                raise HTTPException(status_code=400, detail="Invalid column")
-
-            row_index = drop_piece(game.board, move.column, move.player_id)
-            if row_index == -1:
-                raise HTTPException(status_code=400, detail="Column is full")
-
-            if check_winner(game.board, move.player_id):
-                game.status = "won"
-                return {
-                    "message": f"Player {move.player_id} wins!",
-                    "board": game.board,
-                    "status": game.status,
-                    "id": game.id,
-                    "row": row_index,
-                    "player_id": move.player_id
-                }
-
-            if all(cell != 0 for row in game.board for cell in row):
-                game.status = "draw"
-                return {
-                    "message": "The game is a draw!",
-                    "board": game.board,
-                    "status": game.status,
-                    "id": game.id,
-                    "row": row_index,
-                    "player_id": move.player_id
-                }
-
-            game.current_turn = 2 if move.player_id == 1 else 1
+def play_move(game_id: int, move: Move, board_format: Optional[str] = None, request: Request = None):
+    board_format = requested_board_format(board_format, request)
+
+    def play(game: dict) -> dict:
+        if move.column < 0 or move.column >= len(game["board"][0]):
+            raise HTTPException(status_code=400, detail="Invalid column")
+
+        row_index = drop_piece(game["board"], move.column, move.player_id)
+        if row_index == -1:
+            raise HTTPException(status_code=400, detail="Column is full")
+
+        game["moves"] += 1
+        if check_winner_at(game["board"], row_index, move.column, move.player_id):
+            game["status"] = "won"
+            return {
+                "message": f"Player {move.player_id} wins!",
+                "status": game["status"],
+                "id": game["id"],
+                "row": row_index,
+                "player_id": move.player_id
+            }
+
+        if is_board_full(game["board"], game["moves"]):
+            game["status"] = "draw"
             return {
-                "message": f"Player {move.player_id} played in column {move.column}",
-                "board": game.board,
-                "status": game.status,
-                "current_turn": game.current_turn,
+                "message": "The game is a draw!",
+                "status": game["status"],
+                "id": game["id"],
                 "row": row_index,
                 "player_id": move.player_id
             }
 
-    raise HTTPException(status_code=404, detail="Game not found")
+        game["current_turn"] = 2 if move.player_id == 1 else 1
+        return {
+            "message": f"Player {move.player_id} played in column {move.column}",
+            "status": game["status"],
+            "current_turn": game["current_turn"],
+            "row": row_index,
+            "player_id": move.player_id
+        }
+
+    game, result = update_game(games, game_id, play, "Game not found")
+    return {**result, "board": encode_board(game["board"], board_format)}
 
 
 @router_online.post("/")
 def create_online_game(playerName: str = Body(...), gameCode: str = Body(...)):
-    if gameCode in online_games:
-        raise HTTPException(status_code=400, detail="Game code already exists.")
-
     # Check for duplicate player names in all online games
-    if any(game["player1"] == playerName or game["player2"] == playerName for game in online_games.values()):
+    if online_games.name_in_use(playerName):
         raise HTTPException(status_code=400, detail="Player name is already in use.")
 
-    online_games[gameCode] = {
-        "player1": playerName,
-        "player2": None,
-        "board": [[0]*7 for _ in range(6)],
-        "current_turn": 1,
-        "status": "waiting"
-    }
+    try:
+        online_games.create(gameCode, {
+            "player1": playerName,
+            "player2": None,
+            "board": [[0]*7 for _ in range(6)],
+            "current_turn": 1,
+            "status": "waiting",
+            "moves": 0
+        })
+    except GameExists:
+        raise HTTPException(status_code=400, detail="Game code already exists.")
+    except NameInUse:
+        raise HTTPException(status_code=400, detail="Player name is already in use.")
     return {"message": "Online game created successfully."}
 
 @router_online.post("/join")
-def join_online_game(playerName: str = Body(...), gameCode: str = Body(...)):
-    if gameCode not in online_games:
-        raise HTTPException(status_code=404, detail="Game not found.")
+def join_online_game(playerName: str = Body(...), gameCode: str = Body(...),
+                     board_format: Optional[str] = None, request: Request = None):
+    board_format = requested_board_format(board_format, request)
 
-    game = online_games[gameCode]
-    if game["player2"] is not None:
-        raise HTTPException(status_code=400, detail="Game already has two players.")
+    def join(game: dict):
+        if game["player2"] is not None:
+            raise HTTPException(status_code=400, detail="Game already has two players.")
 
-    # Check for duplicate player names
-    if playerName in [game["player1"], game["player2"]] or any(
-        game["player1"] == playerName or game["player2"] == playerName for game in online_games.values()
-    ):
-        raise HTTPException(status_code=400, detail="Player name is already in use.")
+        # Check for duplicate player names
+        if playerName == game["player1"] or online_games.name_in_use(playerName):
+            raise HTTPException(status_code=400, detail="Player name is already in use.")
 
-    game["player2"] = playerName
-    game["status"] = "ready"
-    return {"message": "Joined game successfully.", "game": game}
+        game["player2"] = playerName
+        game["status"] = "ready"
 
-@router_online.get("/{gameCode}")
-def get_online_game_status(gameCode: str):
-    if gameCode not in online_games:
-        raise HTTPException(status_code=404, detail="Game not found.")
-    return online_games[gameCode]
+    def joined(game: dict, _):
+        publish(gameCode, game, {"type": "join", "player2": playerName, "status": game["status"]})
 
-@router_online.put("/{gameCode}")
-def play_online_move(gameCode: str, column: int, player_id: int):
-    if gameCode not in online_games:
+    try:
+        game, _ = update_game(online_games, gameCode, join, "Game not found.", joined)
+    except NameInUse:
+        raise HTTPException(status_code=400, detail="Player name is already in use.")
+    return {"message": "Joined game successfully.", "game": with_board(game, board_format)}
+
+def publish(gameCode: str, game: dict, *events: dict):
+    """
+    Push the events describing a saved change of a game, with its new version
+    (WebSocket clients and long-polling requests are woken up). Called by
+    update_game under the lock of the game, so versions are queued in order.
+    """
+    for event in events:
+        game_events.publish(gameCode, {**event, "version": game["version"]})
+
+def publish_move(gameCode: str, game: dict, column: int, row: int, player_id: int):
+    """
+    Push a move as a diff (column, row, player) to the players of the game,
+    followed by an end event when the move won or filled the board.
+    """
+    events = [{
+        "type": "move",
+        "column": column,
+        "row": row,
+        "player_id": player_id,
+        "moves": game["moves"],
+        "status": game["status"],
+        "current_turn": game["current_turn"],
+    }]
+    if game["status"] in FINISHED_STATUSES:
+        end = {"type": "end", "status": game["status"]}
+        if "winner_id" in game:
+            end["winner_id"] = game["winner_id"]
+        events.append(end)
+    publish(gameCode, game, *events)
+
+def game_etag(game: dict, board_format: str = "list") -> str:
+    # One representation per board format
+    if board_format != "list":
+        return f'"{game["version"]}-{board_format}"'
+    return f'"{game["version"]}"'
+
+async def read_online_game(gameCode: str) -> Optional[dict]:
+    # MongoDB is read in the thread pool so as not to block the event loop
+    if online_games.shared:
+        return await run_in_threadpool(online_games.get, gameCode)
+    return online_games.get(gameCode)
+
+@router_online.websocket("/{gameCode}/ws")
+async def online_game_socket(websocket: WebSocket, gameCode: str):
+    """
+    Push channel of an online game: the current state ({"type": "state", ...})
+    on connection, then the join, move, end, reset and closed events.
+    The board of the state is sent in the board_format of the query string.
+    """
+    board_format = websocket.query_params.get("board_format", "list")
+    if board_format not in BOARD_FORMATS:
+        await websocket.close(code=4400)
+        return
+    game = await read_online_game(gameCode)
+    if game is None:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    # Subscribed before the state sent is read: a change saved meanwhile is
+    # either in that state or queued (and skipped below if it is in both)
+    queue = game_events.subscribe(gameCode, game["version"])
+    game = await read_online_game(gameCode)
+
+    async def send_events():
+        if game is None:  # Destroyed before the subscription
+            await websocket.send_json({"type": "closed"})
+            return
+        await websocket.send_json({"type": "state", **with_board(game, board_format)})
+        while True:
+            event = await queue.get()
+            if event is None:  # Client too slow: it reloads the game and reconnects
+                break
+            if event.get("version", game["version"] + 1) <= game["version"]:
+                continue  # Already in the state
+            await websocket.send_json(event)
+            if event["type"] == "closed":
+                break
+
+    async def receive_until_disconnect():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    sender = asyncio.ensure_future(send_events())
+    receiver = asyncio.ensure_future(receive_until_disconnect())
+    try:
+        await asyncio.wait([sender, receiver], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        game_events.unsubscribe(gameCode, queue)
+        for task in (sender, receiver):
+            task.cancel()
+    if sender.done() and not sender.cancelled() and sender.exception() is None:
+        await websocket.close()
+
+@router_online.get("/scores/stats")
+def get_score_buffer_stats():
+    """
+    Counters of the write-behind score buffer; lag_seconds is the age of the
+    oldest delta not written yet.
+    """
+    return {"buffered": score_buffer is not None, **(score_buffer.stats() if score_buffer else {})}
+
+@router_online.get("/{gameCode}")
+async def get_online_game_status(gameCode: str, request: Request,
+                                 wait: Optional[int] = Query(None, ge=0, le=MAX_WAIT_MS),
+                                 board_format: Optional[str] = None):
+    """
+    State of an online game, with its version as ETag. When If-None-Match
+    holds the current ETag the answer is a bodyless 304; with wait=<ms> the
+    request first waits up to that long for the game to change (long polling).
+    """
+    board_format = requested_board_format(board_format, request)
+    game = await read_online_game(gameCode)
+    if game is None:
         raise HTTPException(status_code=404, detail="Game not found.")
 
-    game = online_games[gameCode]
-    if game["status"] not in ("waiting", "ready", "active"):
-        raise HTTPException(status_code=400, detail="Game is not in a playable state.")
+    etag = request.headers.get("if-none-match")
+    if etag == game_etag(game, board_format) and wait:
+        # Changes of this worker wake the request up; with a shared store, the
+        # game is also read again every STATE_POLL_MS for the other workers' changes
+        deadline = time.monotonic() + wait / 1000
+        slice_seconds = STATE_POLL_MS / 1000 if online_games.shared else wait / 1000
+        version = game["version"]
+
+        def changed() -> bool:
+            # Local store only: a move saved between the read and the wait
+            current = None if online_games.shared else online_games.get(gameCode)
+            return current is not None and current["version"] != version
+
+        while etag == game_etag(game, board_format) and time.monotonic() < deadline:
+            remaining = deadline - time.monotonic()
+            await game_events.wait(gameCode, min(slice_seconds, remaining), changed)
+            game = await read_online_game(gameCode)
+            if game is None:
+                raise HTTPException(status_code=404, detail="Game not found.")
+    if etag == game_etag(game, board_format):
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+
+    return ORJSONResponse(with_board(game, board_format),
+                          headers={"ETag": game_etag(game, board_format), "Vary": "Accept"})
 
+@router_online.put("/{gameCode}")
+def play_online_move(gameCode: str, column: int, player_id: int,
+                     board_format: Optional[str] = None, request: Request = None):
+    board_format = requested_board_format(board_format, request)
     if player_id not in [1, 2]:
         raise HTTPException(status_code=400, detail="Invalid player ID")
 
     if column < 0 or column >= 7:
         raise HTTPException(status_code=400, detail="Invalid column")
 
-    row_index = drop_piece(game["board"], column, player_id)
-    if row_index == -1:
-        raise HTTPException(status_code=400, detail="Column is full")
+    def play(game: dict) -> dict:
+        if game["status"] not in ("waiting", "ready", "active"):
+            raise HTTPException(status_code=400, detail="Game is not in a playable state.")
 
-    # Check for a winner
-    if check_winner(game["board"], player_id):
-        game["status"] = "won"
-        game["winner_id"] = player_id  # Lock the winner
-        return {
-            "message": f"Player {player_id} wins!",
-            "board": game["board"],
-            "status": game["status"],
-            "winner_id": player_id,  # Include winner ID in the response
-            "row": row_index
-        }
+        # Checked on the game being saved: two quick moves of the same player cannot both pass
+        if game["current_turn"] != player_id:
+            raise HTTPException(status_code=400, detail="Not your turn.")
 
-    # Check for a draw
-    if all(cell != 0 for row in game["board"] for cell in row):
-        game["status"] = "draw"
+        row_index = drop_piece(game["board"], column, player_id)
+        if row_index == -1:
+            raise HTTPException(status_code=400, detail="Column is full")
+
+        game["moves"] += 1
+
+        # Check for a winner
+        if check_winner_at(game["board"], row_index, column, player_id):
+            game["status"] = "won"
+            game["winner_id"] = player_id  # Lock the winner
+            return {
+                "message": f"Player {player_id} wins!",
+                "status": game["status"],
+                "winner_id": player_id,  # Include winner ID in the response
+                "row": row_index
+            }
+
+        # Check for a draw
+        if is_board_full(game["board"], game["moves"]):
+            game["status"] = "draw"
+            return {
+                "message": "The game is a draw!",
+                "status": game["status"],
+                "row": row_index
+            }
+
+        # Continue game
+        game["current_turn"] = 2 if player_id == 1 else 1
+        game["status"] = "active"
         return {
-            "message": "The game is a draw!",
-            "board": game["board"],
+            "message": f"Player {player_id} played in column {column}",
             "status": game["status"],
+            "current_turn": game["current_turn"],
             "row": row_index
         }
 
-    # Continue game
-    game["current_turn"] = 2 if player_id == 1 else 1
-    game["status"] = "active"
-    return {
-        "message": f"Player {player_id} played in column {column}",
-        "board": game["board"],
-        "status": game["status"],
-        "current_turn": game["current_turn"],
-        "row": row_index
-    }
+    def played(game: dict, result: dict):
+        publish_move(gameCode, game, column, result["row"], player_id)
+
+    game, result = update_game(online_games, gameCode, play, "Game not found.", played)
+    return {**result, "board": encode_board(game["board"], board_format)}
 
 
 @router_online.patch("/{gameCode}")
-def reset_online_game(gameCode: str):
+def reset_online_game(gameCode: str, board_format: Optional[str] = None, request: Request = None):
+    board_format = requested_board_format(board_format, request)
 
-    if gameCode not in online_games:
-        raise HTTPException(status_code=404, detail="Game not found.")
+    def reset(game: dict) -> int:
+        # If we haven't stored 'next_start_player', or it's the first reset, default to 2.
+        if "next_start_player" not in game:
+            game["next_start_player"] = 2
+        else:
+            game["next_start_player"] = 1 if game["next_start_player"] == 2 else 2
 
-    game = online_games[gameCode]
+        start = game["next_start_player"]
 
-    # If we haven't stored 'next_start_player', or it's the first reset, default to 2.
-    if "next_start_player" not in game:
-        game["next_start_player"] = 2
-    else:
-        game["next_start_player"] = 1 if game["next_start_player"] == 2 else 2
+        game["board"] = [[0]*7 for _ in range(6)]
+        game["moves"] = 0
+        if "winner_id" in game:
+            del game["winner_id"]
+        game.pop("scored", None)
 
-    start = game["next_start_player"]
+        game["status"] = "active"
+        game["current_turn"] = start
+        return start
 
-    game["board"] = [[0]*7 for _ in range(6)]
-    if "winner_id" in game:
-        del game["winner_id"]
+    def was_reset(game: dict, start: int):
+        publish(gameCode, game, {"type": "reset", "status": game["status"], "current_turn": start})
 
-    game["status"] = "active"
-    game["current_turn"] = start
+    game, start = update_game(online_games, gameCode, reset, "Game not found.", was_reset)
 
     return {
         "message": f"Game reset. Player {start} starts now.",
-        "board": game["board"],
+        "board": encode_board(game["board"], board_format),
         "status": game["status"],
         "current_turn": start
     }
@@ -229,29 +557,69 @@ def update_online_score(
     score: int = Body(...)
 ):
 
-    if gameCode not in online_games:
+    if online_games.get(gameCode) is None:
         raise HTTPException(status_code=404, detail="Game not found.")
 
-    user_collection = db["users"]
-    user = user_collection.find_one({"name": name})
-
-    # If user doesn't exist, create it
-    if not user:
-        user_collection.insert_one({"name": name, "score": 0})
-        user = user_collection.find_one({"name": name})
-
-    new_score = user.get("score", 0) + score
-    user_collection.update_one({"name": name}, {"$set": {"score": new_score}})
+    # Atomic increment, the user is created if needed (one round trip, or buffered)
+    new_score = record_scores({name: score})[name]
 
     return {"name": name, "new_score": new_score}
 
+@router_online.post("/scores")
+def update_online_scores(result: GameScores):
+    """
+    Record the score deltas of the players of a finished game in one bulk
+    write. The game is marked as scored first, so the result of a game is
+    counted once even when both players send it; a reset clears the mark.
+    The mark is only removed again when no delta was written.
+    """
+    deltas = {}
+    for delta in result.scores:
+        deltas[delta.name] = deltas.get(delta.name, 0) + delta.score
+
+    def mark_scored(game: dict):
+        if game["status"] not in FINISHED_STATUSES:
+            raise HTTPException(status_code=400, detail="Game is not finished.")
+        if not set(deltas) <= {game["player1"], game["player2"]}:
+            raise HTTPException(status_code=400, detail="Scores must be for the players of the game.")
+        if game.get("scored"):
+            raise HTTPException(status_code=409, detail="Scores already recorded for this game.")
+        game["scored"] = True
+
+    def unmark():
+        # Not recorded: let the players send the scores again
+        update_game(online_games, result.gameCode, lambda game: game.pop("scored", None), "Game not found.")
+
+    update_game(online_games, result.gameCode, mark_scored, "Game not found.")
+    try:
+        write_scores(deltas)
+    except BulkWriteError as error:
+        # Unordered bulk write: the deltas not listed in writeErrors were applied,
+        # sending the scores again would count them twice
+        failed = error.details["writeErrors"]
+        if len(failed) == len(deltas):
+            unmark()
+        else:
+            names = list(deltas)
+            logger.error(f"Scores of game {result.gameCode} partly recorded, lost for: "
+                         f"{', '.join(names[failure['index']] for failure in failed)}")
+        raise
+    except PyMongoError:
+        unmark()
+        raise
+    # Read after the write: a failure here must not let the scores be sent again
+    new_scores = current_scores(list(deltas))
+
+    return {"scores": [{"name": name, "new_score": new_scores.get(name)} for name in deltas]}
+
 @router_online.delete("/{gameCode}")
 def destroy_online_game(gameCode: str):
 
-    if gameCode not in online_games:
-        raise HTTPException(status_code=404, detail="Game not found.")
-
-    del online_games[gameCode]
+    # Under the lock of the game: "closed" is queued after the events of its last update
+    with online_games.locked(gameCode):
+        if not online_games.delete(gameCode):
+            raise HTTPException(status_code=404, detail="Game not found.")
+        game_events.publish(gameCode, {"type": "closed"})
     return {"message": f"Game {gameCode} has been destroyed."}
 
 
@@ -0,0 +1,204 @@
+"""
+Score updates of the players in the users collection (user_db, shared with
+the user-service). Every update is an atomic $inc on the server, with an
+upsert for players who have no account yet: no read-modify-write, so
+concurrent updates of the same player are never lost.
+
+Two concurrent upserts of a new name can collide on the unique name index
+of the user-service; the losing one is retried once and then finds the
+document inserted by the winner.
+
+ScoreBuffer optionally batches the increments (write-behind).
+"""
+from typing import Callable, Dict, List, Optional
+import logging
+import threading
+import time
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+DUPLICATE_KEY = 11000
+
+logger = logging.getLogger(__name__)
+
+
+def add_score(collection, name: str, delta: int) -> int:
+    """
+    Add delta to the score of a player in one round trip; returns the new score.
+    """
+    for attempt in range(2):
+        try:
+            user = collection.find_one_and_update(
+                {"name": name},
+                {"$inc": {"score": delta}},
+                projection={"_id": 0, "score": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return user["score"]
+        except DuplicateKeyError:
+            if attempt:
+                raise
+
+
+def increment_scores(collection, deltas: Dict[str, int]):
+    """
+    Add the deltas of several players in one unordered bulk write. A
+    BulkWriteError raised from here lists in writeErrors the only increments
+    that were not applied, by their index in deltas (also when they failed
+    again in the retry of the colliding upserts, or when that retry failed
+    as a whole).
+    """
+    operations: List[UpdateOne] = [
+        UpdateOne({"name": name}, {"$inc": {"score": delta}}, upsert=True) for name, delta in deltas.items()
+    ]
+    try:
+        collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as error:
+        # Unordered: the other operations were applied, retry only the upserts that collided
+        failures = error.details["writeErrors"]
+        if any(failure["code"] != DUPLICATE_KEY for failure in failures):
+            raise
+        retried = [failure["index"] for failure in failures]
+        try:
+            collection.bulk_write([operations[index] for index in retried], ordered=False)
+        except BulkWriteError as retry_error:
+            # The indexes of the retry count in the retried operations: map them back to deltas
+            details = dict(retry_error.details)
+            details["writeErrors"] = [
+                {**failure, "index": retried[failure["index"]]} for failure in details["writeErrors"]
+            ]
+            raise BulkWriteError(details)
+        except PyMongoError as retry_error:
+            # AutoReconnect, timeout...: the first write still applied the other increments
+            details = dict(error.details)
+            details["writeErrors"] = [
+                {"index": index, "code": getattr(retry_error, "code", None), "errmsg": str(retry_error)}
+                for index in retried
+            ]
+            raise BulkWriteError(details) from retry_error
+
+
+def read_scores(collection, names: List[str]) -> Dict[str, int]:
+    return {
+        user["name"]: user.get("score", 0)
+        for user in collection.find({"name": {"$in": names}}, {"_id": 0, "name": 1, "score": 1})
+    }
+
+
+class ScoreBuffer:
+    """
+    Write-behind buffer of score deltas, coalesced per player name and
+    written as one bulk_write of $inc upserts every `interval` seconds, or as
+    soon as `max_players` players have unflushed deltas.
+
+    A background thread flushes; stop() flushes what is left, so a graceful
+    shutdown loses nothing (a crash loses at most one interval). A failed
+    flush puts the deltas back to be retried at the next one. scores()
+    overlays the unflushed deltas of this process on the stored scores
+    (read-your-writes for the score endpoints of this worker).
+    """
+
+    def __init__(self, collection, interval: float, max_players: int,
+                 clock: Callable[[], float] = time.monotonic):
+        self.collection = collection
+        self.interval = interval
+        self.max_players = max_players
+        self.clock = clock
+        self.pending: Dict[str, int] = {}
+        self.oldest: Optional[float] = None  # Time of the oldest unflushed delta
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # One flush at a time, scores() waits for the running one
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.flushed_players = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+    def add(self, deltas: Dict[str, int]):
+        with self.lock:
+            for name, delta in deltas.items():
+                self.pending[name] = self.pending.get(name, 0) + delta
+            if self.oldest is None:
+                self.oldest = self.clock()
+            full = len(self.pending) >= self.max_players
+        if full:
+            self.wakeup.set()
+
+    def scores(self, names: List[str]) -> Dict[str, int]:
+        with self.flush_lock:
+            stored = read_scores(self.collection, names)
+            with self.lock:
+                return {name: stored.get(name, 0) + self.pending.get(name, 0) for name in names}
+
+    def _restore(self, deltas: Dict[str, int], oldest: Optional[float]):
+        with self.lock:
+            for name, delta in deltas.items():
+                self.pending[name] = self.pending.get(name, 0) + delta
+            if oldest is not None:
+                self.oldest = oldest if self.oldest is None else min(oldest, self.oldest)
+
+    def flush(self) -> int:
+        """
+        Write the pending deltas; returns the number of players written.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                deltas, self.pending = self.pending, {}
+                oldest, self.oldest = self.oldest, None
+            start = self.clock()
+            try:
+                increment_scores(self.collection, deltas)
+            except BulkWriteError as error:
+                names = list(deltas)
+                failed = {names[failure["index"]] for failure in error.details["writeErrors"]}
+                self._restore({name: deltas[name] for name in failed}, oldest)
+                self.failures += 1
+                logger.error(f"Score flush: {len(failed)} of {len(deltas)} players not written, retrying later")
+                return len(deltas) - len(failed)
+            except PyMongoError:
+                self._restore(deltas, oldest)
+                self.failures += 1
+                logger.exception("Score flush failed, retrying later")
+                return 0
+            self.flushes += 1
+            self.flushed_players += len(deltas)
+            self.last_flush_ms = (self.clock() - start) * 1000
+            return len(deltas)
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def start(self):
+        if self.thread is None:
+            self.stopping = False
+            self.thread = threading.Thread(target=self._run, name="score-buffer", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopping = True
+            self.wakeup.set()
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lag = self.clock() - self.oldest if self.oldest is not None else 0.0
+            return {
+                "pending_players": len(self.pending),
+                "lag_seconds": round(lag, 3),
+                "flushes": self.flushes,
+                "flushed_players": self.flushed_players,
+                "failures": self.failures,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+            }
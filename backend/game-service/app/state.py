@@ -0,0 +1,300 @@
+"""
+Storage of the games behind one interface, so that several uvicorn workers
+or replicas can serve the same games and a restart does not lose them.
+
+GAME_STATE_BACKEND=memory (default) keeps the games in this process
+(GameRepository), GAME_STATE_BACKEND=mongo in MongoDB. Games are plain dicts
+carrying a "version": save() only writes a game if the stored version is
+still the one it was read with (compare-and-set) and then bumps it; otherwise
+it raises StateConflict and the caller reads the game again and retries.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+import copy
+import random
+import threading
+
+from pymongo.errors import DuplicateKeyError
+
+from app.board_codec import can_encode, decode_board, encode_bitboard
+from app.repository import GameRepository, OnlineGameRepository
+
+# Fields of an online game holding the player names (unique across live games)
+PLAYER_FIELDS = ("player1", "player2")
+
+
+class GameExists(Exception):
+    """
+    Raised by create() when the key is already used by a live game.
+    """
+
+
+class NameInUse(Exception):
+    """
+    Raised when a player name is already used by another live game.
+    """
+
+
+class GameNotFound(Exception):
+    """
+    Raised by save() when the game was deleted or expired meanwhile.
+    """
+
+
+class StateConflict(Exception):
+    """
+    Raised by save() when the game was changed since it was read.
+    """
+
+
+def initial_version() -> int:
+    """
+    First version of a new game. Random, so that a game created again with the
+    same code does not reuse the versions (ETags) of the previous one.
+    """
+    return random.getrandbits(48)
+
+
+def player_names(game: dict) -> List[str]:
+    return [game[field] for field in PLAYER_FIELDS if game.get(field) is not None]
+
+
+class GameLocks:
+    """
+    locked(key) serializes the updates of one game in this process: a lock
+    per game, created on first use and dropped when no thread holds or waits
+    for it, so moves in different games never wait for each other.
+    """
+
+    def __init__(self):
+        self.game_locks: Dict[Hashable, list] = {}  # key -> [lock, holders and waiters]
+        self.game_locks_lock = threading.Lock()
+
+    @contextmanager
+    def locked(self, key: Hashable) -> Iterator[None]:
+        with self.game_locks_lock:
+            entry = self.game_locks.get(key)
+            if entry is None:
+                entry = self.game_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.game_locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.game_locks[key]
+
+
+class MemoryGameStore(GameLocks):
+    """
+    Games of this process only, kept in a GameRepository (TTL and size bound).
+    get() and values() return the stored games themselves, which callers
+    must not change; get_for_update() returns a copy to change and pass to
+    save(). A game passed to put(), create() or save() belongs to the store
+    afterwards.
+    """
+
+    shared = False
+
+    def __init__(self, repository: GameRepository):
+        super().__init__()
+        self.repository = repository
+
+    def setup(self):
+        pass
+
+    def _check_names(self, key: Hashable, game: dict):
+        if isinstance(self.repository, OnlineGameRepository):
+            for name in player_names(game):
+                owner = self.repository.game_of(name)
+                if owner is not None and owner != key:
+                    raise NameInUse(name)
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        return self.repository.get(key)
+
+    def get_for_update(self, key: Hashable) -> Optional[dict]:
+        # Copied only here: the stored game is replaced by save(), never changed in place
+        game = self.repository.get(key)
+        return copy.deepcopy(game) if game is not None else None
+
+    def get_many(self, keys: List[Hashable]) -> Dict[Hashable, dict]:
+        games = {}
+        for key in keys:
+            game = self.get(key)
+            if game is not None:
+                games[key] = game
+        return games
+
+    def values(self) -> List[dict]:
+        return self.repository.values()
+
+    def put(self, key: Hashable, game: dict) -> dict:
+        with self.repository.lock:
+            self._check_names(key, game)
+            game["version"] = initial_version()
+            self.repository.put(key, game)
+        return game
+
+    def create(self, key: Hashable, game: dict) -> dict:
+        with self.repository.lock:
+            if key in self.repository:
+                raise GameExists(key)
+            return self.put(key, game)
+
+    def save(self, key: Hashable, game: dict) -> dict:
+        with self.repository.lock:
+            current = self.repository.get(key)
+            if current is None:
+                raise GameNotFound(key)
+            if current["version"] != game["version"]:
+                raise StateConflict(key)
+            self._check_names(key, game)
+            game["version"] += 1
+            self.repository.put(key, game)
+        return game
+
+    def delete(self, key: Hashable) -> bool:
+        return self.repository.delete(key)
+
+    def name_in_use(self, name: str) -> bool:
+        return self.repository.name_in_use(name)
+
+
+class MongoGameStore(GameLocks):
+    """
+    Games shared by every worker, one document per game in a collection:
+        {_id: key, version, game: {...}, player_names: [...], expires_at}
+
+    6x7 boards are stored as bitboard strings (16 characters instead of a
+    BSON array of 42 numbers); documents holding a list board are still read.
+
+    expires_at is pushed back on every write (finished_ttl once the game is
+    finished, ttl otherwise) and a TTL index deletes the expired documents;
+    reads ignore the expired documents the TTL monitor has not removed yet.
+    With index_players, a unique index on player_names makes a name usable by
+    one live game at a time, atomically with the write of the game.
+
+    locked(key) only serializes the updates of this worker (so that its
+    events are published in version order): those of the other workers are
+    caught by save().
+    """
+
+    shared = True
+
+    def __init__(self, collection, ttl: float, finished_ttl: float,
+                 is_finished: Callable[[dict], bool], index_players: bool = False):
+        super().__init__()
+        self.collection = collection
+        self.ttl = ttl
+        self.finished_ttl = finished_ttl
+        self.is_finished = is_finished
+        self.index_players = index_players
+
+    def setup(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        if self.index_players:
+            self.collection.create_index("player_names", unique=True)
+
+    def _document(self, key: Hashable, game: dict) -> dict:
+        ttl = self.finished_ttl if self.is_finished(game) else self.ttl
+        document = {
+            "_id": key,
+            "version": game["version"],
+            "game": {field: value for field, value in game.items() if field != "version"},
+            "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+        }
+        board = game.get("board")
+        if board is not None and can_encode(board):
+            document["game"]["board"] = encode_bitboard(board)
+        if self.index_players:
+            document["player_names"] = player_names(game)
+        return document
+
+    @staticmethod
+    def _game(document: dict) -> dict:
+        game = {**document["game"], "version": document["version"]}
+        if "board" in game:
+            game["board"] = decode_board(game["board"])
+        return game
+
+    @staticmethod
+    def _live(query: dict) -> dict:
+        return {**query, "expires_at": {"$gt": datetime.utcnow()}}
+
+    def _purge_expired(self, key: Hashable, game: dict):
+        # Documents past expires_at but not yet removed by the TTL monitor still hold their key and names
+        self.collection.delete_many({
+            "$or": [{"_id": key}, {"player_names": {"$in": player_names(game)}}],
+            "expires_at": {"$lte": datetime.utcnow()},
+        })
+
+    def _write(self, key: Hashable, game: dict, write: Callable[[dict], Any], insert: bool = False):
+        """
+        Run a write, purging expired documents that block it once. Maps
+        duplicate key errors to GameExists / NameInUse.
+        """
+        for attempt in range(2):
+            try:
+                return write(self._document(key, game))
+            except DuplicateKeyError:
+                if attempt == 0:
+                    self._purge_expired(key, game)
+                    continue
+                # Only an insert can collide on _id: otherwise a name is held by another game
+                if insert and self.collection.find_one({"_id": key}, {"_id": 1}) is not None:
+                    raise GameExists(key)
+                raise NameInUse(key)
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        document = self.collection.find_one(self._live({"_id": key}))
+        return self._game(document) if document is not None else None
+
+    def get_for_update(self, key: Hashable) -> Optional[dict]:
+        # Every read builds a new game
+        return self.get(key)
+
+    def get_many(self, keys: List[Hashable]) -> Dict[Hashable, dict]:
+        return {
+            document["_id"]: self._game(document)
+            for document in self.collection.find(self._live({"_id": {"$in": list(keys)}}))
+        }
+
+    def values(self) -> List[dict]:
+        return [self._game(document) for document in self.collection.find(self._live({}))]
+
+    def put(self, key: Hashable, game: dict) -> dict:
+        game["version"] = initial_version()
+        self._write(key, game, lambda document: self.collection.replace_one({"_id": key}, document, upsert=True))
+        return game
+
+    def create(self, key: Hashable, game: dict) -> dict:
+        game["version"] = initial_version()
+        self._write(key, game, self.collection.insert_one, insert=True)
+        return game
+
+    def save(self, key: Hashable, game: dict) -> dict:
+        expected = game["version"]
+        game["version"] = expected + 1
+        try:
+            result = self._write(key, game, lambda document: self.collection.replace_one(
+                self._live({"_id": key, "version": expected}), document
+            ))
+        except (GameExists, NameInUse):
+            game["version"] = expected
+            raise
+        if result.matched_count == 0:
+            game["version"] = expected
+            if self.get(key) is None:
+                raise GameNotFound(key)
+            raise StateConflict(key)
+        return game
+
+    def delete(self, key: Hashable) -> bool:
+        return self.collection.delete_one({"_id": key}).deleted_count > 0
+
+    def name_in_use(self, name: str) -> bool:
+        return self.collection.find_one(self._live({"player_names": name}), {"_id": 1}) is not None
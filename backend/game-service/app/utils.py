@@ -26,3 +26,40 @@ def check_winner(board: List[List[int]], player_id: int) -> bool:
                 return True
 
     return False
+
+
+# Directions (ligne, colonne) à vérifier autour du dernier pion : horizontale, verticale, deux diagonales
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+def check_winner_at(board: List[List[int]], row: int, col: int, player_id: int) -> bool:
+    """
+    Same result as check_winner right after player_id dropped a piece at (row, col):
+    only the four lines going through that cell are scanned.
+    """
+    rows, cols = len(board), len(board[0])
+    for d_row, d_col in DIRECTIONS:
+        count = 1
+        for sign in (1, -1):
+            r, c = row + sign * d_row, col + sign * d_col
+            while 0 <= r < rows and 0 <= c < cols and board[r][c] == player_id:
+                count += 1
+                if count == 4:
+                    return True
+                r += sign * d_row
+                c += sign * d_col
+    return False
+
+
+def count_pieces(board: List[List[int]]) -> int:
+    """
+    Number of pieces on the board, used to seed the move counter of a game.
+    """
+    return sum(1 for row in board for cell in row if cell != 0)
+
+
+def is_board_full(board: List[List[int]], moves: int) -> bool:
+    """
+    Draw check from the move counter instead of a scan of the board.
+    """
+    return moves >= len(board) * len(board[0])
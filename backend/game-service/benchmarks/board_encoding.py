@@ -0,0 +1,82 @@
+"""
+Size and parse time of the board encodings.
+
+Run from backend/game-service:  python -m benchmarks.board_encoding [boards]
+
+Random positions are encoded as the JSON list of rows, as a bitboard and as a
+move sequence. Sizes are those of the /ai/move body, of a Game body and of a
+MongoDB game document. Parse times cover the JSON decoding, the pydantic
+validation and the decoding of the board: for the /ai/move body (a list is
+validated cell by cell, a string is not) and for a Game body (the decoded
+board is validated as a list again).
+"""
+import json
+import random
+import sys
+import time
+from typing import List, Union
+
+import bson
+from pydantic import parse_obj_as
+
+from app.board_codec import decode_board, encode_bitboard
+from app.model_game import Game
+from app.routers.game import drop_piece
+
+
+def random_game(rng: random.Random):
+    """
+    (board, moves) of a random game stopped at a random ply.
+    """
+    board = [[0] * 7 for _ in range(6)]
+    moves = ""
+    player_id = 1
+    for _ in range(rng.randint(0, 42)):
+        column = rng.choice([col for col in range(7) if board[0][col] == 0])
+        drop_piece(board, column, player_id)
+        moves += str(column + 1)
+        player_id = 3 - player_id
+    return board, moves
+
+
+# Type of the board of /ai/move in the ai-service
+MoveBoard = Union[List[List[int]], str]
+
+
+def timed(fn, samples) -> float:
+    start = time.perf_counter()
+    for sample in samples:
+        fn(sample)
+    return (time.perf_counter() - start) / len(samples) * 1e6
+
+
+def main(count: int):
+    rng = random.Random(42)
+    positions = [random_game(rng) for _ in range(count)]
+    players = [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]
+    encodings = {
+        "list": [board for board, _ in positions],
+        "bitboard": [encode_bitboard(board) for board, _ in positions],
+        "moves": [moves for _, moves in positions],
+    }
+    for name, boards in encodings.items():
+        assert all(decode_board(board) == original for board, (original, _) in zip(boards, positions))
+
+    print(f"{count} random positions, mean per board")
+    print(f"{'format':<10}{'/ai/move body':>15}{'Game body':>12}{'Mongo doc':>12}{'parse move':>14}{'parse Game':>14}")
+    for name, boards in encodings.items():
+        move_bodies = [json.dumps(board) for board in boards]
+        game_bodies = [
+            json.dumps({"id": 1, "players": players, "current_turn": 1, "board": board}) for board in boards
+        ]
+        documents = [bson.encode({"_id": "G1", "game": {"board": board}}) for board in boards]
+        move_us = timed(lambda body: decode_board(parse_obj_as(MoveBoard, json.loads(body))), move_bodies)
+        game_us = timed(lambda body: Game(**json.loads(body)), game_bodies)
+        print(
+            f"{name:<10}{sum(map(len, move_bodies)) / count:>13.1f} B{sum(map(len, game_bodies)) / count:>10.1f} B"
+            f"{sum(map(len, documents)) / count:>10.1f} B{move_us:>11.1f} us{game_us:>11.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
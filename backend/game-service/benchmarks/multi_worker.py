@@ -0,0 +1,150 @@
+"""
+Consistency and load test of online games shared by several uvicorn workers
+(GAME_STATE_BACKEND=mongo).
+
+Run from backend/game-service against a MongoDB server:
+    python -m benchmarks.multi_worker --mongo mongodb://localhost:27017 [--workers 4] [--games 200]
+
+A uvicorn server with --workers processes is started on --port. Every game
+gets --writers concurrent clients, each on its own keep-alive connection (so
+the requests of one game land on different workers), firing moves into
+random columns as fast as they can. At the end each game must hold exactly
+the moves that were acknowledged with a 200: no move lost or applied twice
+by concurrent compare-and-set writes. A long-polling client per game checks
+that changes made on other workers reach it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.online_load import HttpConnection
+
+
+class Counters:
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.conflicts = 0
+        self.latencies = []
+        self.wakeups = 0
+        self.errors = []
+
+
+async def play_game(index: int, host: str, port: int, writers: int, moves_per_writer: int, counters: Counters):
+    code = f"mw-{os.getpid()}-{index}"
+    setup = HttpConnection(host, port)
+    await setup.request("POST", "/game-online/", {"playerName": f"{code}-a", "gameCode": code})
+    await setup.request("POST", "/game-online/join", {"playerName": f"{code}-b", "gameCode": code})
+    accepted = [0]
+    done = asyncio.Event()
+
+    async def write(writer: int):
+        connection = HttpConnection(host, port)
+        rng = random.Random(index * 100 + writer)
+        try:
+            for _ in range(moves_per_writer):
+                start = time.monotonic()
+                status, _, data = await connection.request(
+                    "PUT", f"/game-online/{code}?column={rng.randrange(7)}&player_id={writer % 2 + 1}"
+                )
+                counters.latencies.append(time.monotonic() - start)
+                if status == 200:
+                    accepted[0] += 1
+                    counters.accepted += 1
+                    if json.loads(data)["status"] in ("won", "draw"):
+                        break
+                elif status == 409:
+                    counters.conflicts += 1
+                else:
+                    counters.rejected += 1  # Not its turn, full column or game already over
+        finally:
+            connection.close()
+
+    async def long_poll():
+        connection = HttpConnection(host, port)
+        etag = None
+        try:
+            while not done.is_set():
+                status, headers, _ = await connection.request(
+                    "GET", f"/game-online/{code}?wait=5000", headers={"If-None-Match": etag} if etag else None
+                )
+                if status == 200 and etag is not None:
+                    counters.wakeups += 1
+                etag = headers.get("etag", etag)
+        finally:
+            connection.close()
+
+    poller = asyncio.ensure_future(long_poll())
+    await asyncio.gather(*[write(writer) for writer in range(writers)])
+    done.set()
+
+    _, _, data = await setup.request("GET", f"/game-online/{code}")
+    game = json.loads(data)
+    pieces = sum(cell != 0 for row in game["board"] for cell in row)
+    if not (game["moves"] == pieces == accepted[0]):
+        counters.errors.append(f"{code}: {accepted[0]} accepted moves, moves={game['moves']}, {pieces} pieces")
+    await poller
+    await setup.request("DELETE", f"/game-online/{code}")
+    setup.close()
+
+
+def start_server(port: int, workers: int, mongo_uri: str) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log", "--backlog", "4096", "--timeout-keep-alive", "30"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, "GAME_STATE_BACKEND": "mongo", "MONGO_URI": mongo_uri},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    time.sleep(3)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online games shared by several workers")
+    parser.add_argument("--mongo", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=4, help="concurrent clients playing each game")
+    parser.add_argument("--moves", type=int, default=20, help="moves attempted by each client")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.workers, args.mongo)
+    counters = Counters()
+    try:
+        start = time.monotonic()
+        asyncio.get_event_loop().run_until_complete(asyncio.gather(*[
+            play_game(index, "127.0.0.1", args.port, args.writers, args.moves, counters)
+            for index in range(args.games)
+        ]))
+        elapsed = time.monotonic() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(counters.latencies)
+    print(f"{args.workers} workers, {args.games} games x {args.writers} writers: "
+          f"{counters.accepted} moves in {elapsed:.1f} s ({counters.accepted / elapsed:.0f} moves/s), "
+          f"{counters.rejected} rejected, {counters.conflicts} gave up after retries (409)")
+    if latencies:
+        print(f"PUT latency median {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms; "
+              f"{counters.wakeups} long polls woken by a change")
+    if counters.errors:
+        print(f"{len(counters.errors)} inconsistent games:")
+        for error in counters.errors[:20]:
+            print("  " + error)
+        sys.exit(1)
+    print("All games consistent.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Load test of the online games: REST polling (the previous frontend) against
+the WebSocket push channel.
+
+Run from backend/game-service (needs uvicorn and websockets):
+    python -m benchmarks.online_load [--games 1000] [--duration 30] [--mode all]
+
+A uvicorn server is started on --port unless --url points to a running one.
+Every game has two players and plays one random move every --move-interval
+seconds, resetting the board when it ends.
+
+- poll: both players GET the game every 2 s (as the old frontend did) and the
+  player to move GETs it again before its PUT.
+- longpoll: both players GET the game with If-None-Match and wait=25000, so
+  the server answers only when the game changes (or with a 304 on timeout).
+- ws: both players keep a WebSocket open and only send their PUTs; moves reach
+  the opponent as pushed events.
+
+The report gives the HTTP request rate received by the server in each mode,
+the response bytes of the status GETs, and for WebSockets the delay between
+a PUT and the opponent's move event.
+"""
+from typing import Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+
+import websockets
+
+POLL_INTERVAL = 2.0
+
+
+class HttpConnection:
+    """
+    Minimal keep-alive HTTP/1.1 client, enough for the JSON game API.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None,
+                      headers: Optional[dict] = None) -> Tuple[int, dict, bytes]:
+        try:
+            return await self._request(method, path, body, headers or {})
+        except (ConnectionError, IndexError, asyncio.IncompleteReadError):
+            # Keep-alive connection closed by the server: reconnect once, as a browser would
+            self.close()
+            return await self._request(method, path, body, headers or {})
+
+    async def _request(self, method: str, path: str, body: Optional[dict],
+                       headers: dict) -> Tuple[int, dict, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        extra = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n{extra}"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            response_headers[name.lower()] = value.strip()
+        data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        return status, response_headers, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+class Counters:
+    def __init__(self):
+        self.requests = 0
+        self.moves = 0
+        self.events = 0
+        self.status_bytes = 0
+        self.delays = []
+
+
+async def play_game(index: int, mode: str, host: str, port: int, ws_url: str,
+                    move_interval: float, stop: float, counters: Counters):
+    code = f"load-{mode}-{index}"
+    players = [HttpConnection(host, port), HttpConnection(host, port)]
+    rng = random.Random(index)
+    sent = {}  # moves -> time of the PUT, for the event delay
+
+    async def call(player: int, method: str, path: str, body: Optional[dict] = None):
+        counters.requests += 1
+        status, _, data = await players[player - 1].request(method, path, body)
+        return status, json.loads(data) if data else None
+
+    await call(1, "POST", "/game-online/", {"playerName": f"{code}-a", "gameCode": code})
+    await call(2, "POST", "/game-online/join", {"playerName": f"{code}-b", "gameCode": code})
+
+    async def poll(player: int):
+        connection = HttpConnection(host, port)  # The moves use the other connection meanwhile
+        await asyncio.sleep(rng.random() * POLL_INTERVAL)
+        try:
+            while time.monotonic() < stop:
+                counters.requests += 1
+                _, _, data = await connection.request("GET", f"/game-online/{code}")
+                counters.status_bytes += len(data)
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            connection.close()
+
+    async def long_poll(player: int):
+        connection = HttpConnection(host, port)
+        etag = None
+        try:
+            while time.monotonic() < stop:
+                counters.requests += 1
+                status, headers, data = await connection.request(
+                    "GET", f"/game-online/{code}?wait=25000", headers={"If-None-Match": etag} if etag else None
+                )
+                counters.status_bytes += len(data)
+                etag = headers.get("etag", etag)
+        finally:
+            connection.close()
+
+    async def listen(player: int):
+        async with websockets.connect(f"{ws_url}/game-online/{code}/ws") as socket:
+            while True:
+                event = json.loads(await socket.recv())
+                counters.events += 1
+                if event["type"] == "move" and event["player_id"] != player and event["moves"] in sent:
+                    counters.delays.append(time.monotonic() - sent.pop(event["moves"]))
+
+    follow = {"poll": poll, "longpoll": long_poll, "ws": listen}[mode]
+    background = [asyncio.ensure_future(follow(player)) for player in (1, 2)]
+    turn = 1
+    moves = 0
+    await asyncio.sleep(rng.random() * move_interval)
+    while time.monotonic() < stop:
+        if mode != "ws":
+            await call(turn, "GET", f"/game-online/{code}")  # Turn check before the move
+        column = rng.randrange(7)
+        sent[moves + 1] = time.monotonic()
+        status, result = await call(turn, "PUT", f"/game-online/{code}?column={column}&player_id={turn}")
+        if status != 200:
+            sent.pop(moves + 1, None)  # Full column
+        elif result["status"] in ("won", "draw"):
+            counters.moves += 1
+            sent.clear()
+            moves = 0
+            status, result = await call(turn, "PATCH", f"/game-online/{code}")
+            turn = result["current_turn"]
+        else:
+            counters.moves += 1
+            moves += 1
+            turn = result["current_turn"]
+        await asyncio.sleep(move_interval)
+
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await call(1, "DELETE", f"/game-online/{code}")
+    for player in players:
+        player.close()
+
+
+async def run_mode(mode: str, games: int, host: str, port: int, ws_url: str,
+                   duration: float, move_interval: float) -> Counters:
+    counters = Counters()
+    stop = time.monotonic() + duration
+    await asyncio.gather(*[
+        play_game(index, mode, host, port, ws_url, move_interval, stop, counters) for index in range(games)
+    ])
+    return counters
+
+
+def start_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log", "--backlog", "4096", "--timeout-keep-alive", "30"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    time.sleep(2)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online game load test: polling vs WebSocket")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of play per mode")
+    parser.add_argument("--move-interval", type=float, default=2.0, help="seconds between two moves of a game")
+    parser.add_argument("--mode", choices=["poll", "longpoll", "ws", "all"], default="all")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="running game-service (default: start one)")
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        server = start_server(args.port)
+        args.url = f"http://127.0.0.1:{args.port}"
+    parsed = urllib.parse.urlparse(args.url)
+    ws_url = args.url.replace("http", "ws", 1)
+
+    try:
+        for mode in (["poll", "longpoll", "ws"] if args.mode == "all" else [args.mode]):
+            counters = asyncio.get_event_loop().run_until_complete(run_mode(
+                mode, args.games, parsed.hostname, parsed.port or 80, ws_url, args.duration, args.move_interval
+            ))
+            line = (f"{mode:>8}: {args.games} games, {counters.moves} moves, "
+                    f"{counters.requests} HTTP requests ({counters.requests / args.duration:.0f} req/s, "
+                    f"{counters.requests / max(1, counters.moves):.2f} per move)")
+            if mode != "ws":
+                line += f", {counters.status_bytes / 1024:.0f} KiB of status bodies"
+            else:
+                line += f", {counters.events} pushed events"
+                if counters.delays:
+                    delays = sorted(counters.delays)
+                    line += (f", move -> opponent median {statistics.median(delays) * 1000:.1f} ms, "
+                             f"p99 {delays[int(len(delays) * 0.99)] * 1000:.1f} ms")
+            print(line)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
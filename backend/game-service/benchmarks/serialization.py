@@ -0,0 +1,79 @@
+"""
+Serialization cost of the game responses, validated vs lean.
+
+Run from backend/game-service:  python -m benchmarks.serialization [games]
+
+For each endpoint the same content is rendered twice: the way FastAPI
+renders data returned by a handler (validation by the response_model when
+there is one, jsonable_encoder, stdlib json) and the way the handler now
+answers (ORJSONResponse of the stored dicts). Both bodies must decode to the
+same JSON.
+"""
+import json
+import random
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.main import app
+from app.model_game import Game
+from app.routers import game as game_router
+from app.routers.game import drop_piece, get_games, with_board
+
+
+def random_board(rng: random.Random):
+    board = [[0] * 7 for _ in range(6)]
+    player_id = 1
+    for _ in range(rng.randint(0, 42)):
+        drop_piece(board, rng.choice([col for col in range(7) if board[0][col] == 0]), player_id)
+        player_id = 3 - player_id
+    return board
+
+
+def validated_body(path: str, content) -> bytes:
+    """
+    Body rendered as FastAPI does for a handler returning data.
+    """
+    route = next(route for route in app.routes if route.path == path and "GET" in route.methods)
+    if route.response_field is not None:
+        content, errors = route.response_field.validate(content, {}, loc=("response",))
+        assert not errors, errors
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def compare(name: str, repeat: int, validated, lean):
+    assert json.loads(validated()) == json.loads(lean()), f"{name}: bodies differ"
+    timings = []
+    for render in (validated, lean):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = render()
+        timings.append((time.perf_counter() - start) / repeat * 1e3)
+    print(f"{name:<36}{len(body):>10} B{timings[0]:>12.3f} ms{timings[1]:>12.3f} ms{timings[0] / timings[1]:>8.1f}x")
+
+
+def main(count: int):
+    rng = random.Random(42)
+    players = [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]
+    for game_id in range(count):
+        game = Game(id=game_id, players=players, current_turn=1, board=random_board(rng))
+        game_router.games.put(game_id, game.dict())
+    online = {
+        "player1": "Alice", "player2": "Bob", "board": random_board(rng),
+        "current_turn": 1, "status": "active", "moves": 12, "version": 3,
+    }
+    repeat = max(1, 20000 // count)
+
+    print(f"{'endpoint':<36}{'body':>12}{'validated':>15}{'lean':>15}{'gain':>9}")
+    compare(f"GET /game/ ({count} games)", repeat,
+            lambda: validated_body("/game/", game_router.games.values()),
+            lambda: get_games(None, None).body)
+    compare("GET /game-online/{gameCode}", 20000,
+            lambda: validated_body("/game-online/{gameCode}", online),
+            lambda: ORJSONResponse(with_board(online, "list")).body)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
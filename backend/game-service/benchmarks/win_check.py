@@ -0,0 +1,59 @@
+"""
+Timing of the win and draw checks run after every move.
+
+Run from backend/game-service:  python -m benchmarks.win_check [games]
+
+Random games are replayed move by move; after each move the full scan
+(check_winner + scan of the 42 cells) and the local check (check_winner_at +
+move counter) must agree, and both are timed over the same moves.
+"""
+import random
+import sys
+import time
+
+from app.routers.game import drop_piece
+from app.utils import check_winner, check_winner_at, is_board_full
+
+
+def random_moves(rng: random.Random):
+    """
+    Yield (board, row, column, player_id, moves) after every move of a random game.
+    """
+    board = [[0] * 7 for _ in range(6)]
+    player_id = 1
+    for moves in range(1, 43):
+        column = rng.choice([col for col in range(7) if board[0][col] == 0])
+        row = drop_piece(board, column, player_id)
+        yield [list(line) for line in board], row, column, player_id, moves
+        if check_winner(board, player_id):
+            return
+        player_id = 3 - player_id
+
+
+def main(count: int):
+    rng = random.Random(42)
+    samples = [sample for _ in range(count) for sample in random_moves(rng)]
+
+    start = time.perf_counter()
+    full = [
+        (check_winner(board, player_id), all(cell != 0 for line in board for cell in line))
+        for board, _, _, player_id, _ in samples
+    ]
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    local = [
+        (check_winner_at(board, row, column, player_id), is_board_full(board, moves))
+        for board, row, column, player_id, moves in samples
+    ]
+    local_time = time.perf_counter() - start
+
+    assert full == local, "local and full checks disagree"
+    print(
+        f"{len(samples)} moves from {count} games match; full scan {full_time / len(samples) * 1e6:.2f} us/move, "
+        f"local check {local_time / len(samples) * 1e6:.2f} us/move ({full_time / local_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
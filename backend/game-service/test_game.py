@@ -1,9 +1,20 @@
 from fastapi import HTTPException
+from fastapi.testclient import TestClient
 import pytest
+import random
+import threading
+import time
 from unittest.mock import patch, MagicMock
 from app.model_player import Player
 from app.routers.game import *
 from app.model_game import Game
+from app.main import app
+from app.utils import check_winner, check_winner_at, count_pieces
+from app.board_codec import decode_board, encode_bitboard
+from app.repository import GameRepository, OnlineGameRepository
+from app.state import MemoryGameStore, MongoGameStore, StateConflict, GameNotFound
+from app.scores import ScoreBuffer
+from pymongo.errors import AutoReconnect, BulkWriteError
 
 def test_drop_piece_ok():
     board = [
@@ -36,21 +47,56 @@ def test_drop_piece_full_column():
     assert row_index == -1
 
 
+def test_check_winner_at_matches_full_scan():
+    rng = random.Random(0)
+    for _ in range(200):
+        board = [[0] * 7 for _ in range(6)]
+        player_id = 1
+        for _ in range(42):
+            column = rng.choice([col for col in range(7) if board[0][col] == 0])
+            row = drop_piece(board, column, player_id)
+            won = check_winner_at(board, row, column, player_id)
+            assert won == check_winner(board, player_id)
+            if won:
+                break
+            player_id = 3 - player_id
+
+
+def test_check_winner_at_diagonal():
+    board = [
+        [0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 2],
+        [0, 0, 0, 0, 0, 2, 1],
+        [0, 0, 0, 0, 2, 1, 1],
+        [0, 0, 0, 2, 1, 1, 1],
+    ]
+
+    assert check_winner_at(board, 4, 4, 2)
+    assert not check_winner_at(board, 4, 4, 1)
+
+
+def new_game(game_id: int) -> Game:
+    return Game(
+        id=game_id,
+        players=[Player(id=1, name="Alice"), Player(id=2, name="Bob")],
+        current_turn=1,
+        board=[[0]*7 for _ in range(6)],
+    )
+
+
 def test_create_game_ok():
-    mock_game = MagicMock(spec=Game)
-    mock_game.id = 1
-    mock_game.status = None
-    game = create_game(mock_game)
+    game = create_game(new_game(1))
 
     assert game.status == "active"
+    assert games.get(1)["status"] == "active"
 
 def test_play_move_invalid_column():
-    mock_game = MagicMock(spec=Game)
-    mock_game.id = 1
+    game = create_game(new_game(1))
     move = Move(column=-1, player_id=456)
 
     with pytest.raises(HTTPException) as exc_info:
-        play_move(mock_game.id, move)
+        play_move(game.id, move)
 
     assert exc_info.value.status_code == 400
     assert exc_info.value.detail == "Invalid column"
@@ -83,7 +129,7 @@ def test_play_move_column_full(mock_drop_piece):
 
 
 @patch("app.routers.game.drop_piece")
-@patch("app.routers.game.check_winner")
+@patch("app.routers.game.check_winner_at")
 def test_play_move_win(mock_check_winner, mock_drop_piece):
     mock_check_winner.return_value = True
     mock_drop_piece.return_value = 2
@@ -108,7 +154,7 @@ def test_play_move_win(mock_check_winner, mock_drop_piece):
 
 
 @patch("app.routers.game.drop_piece")
-@patch("app.routers.game.check_winner")
+@patch("app.routers.game.check_winner_at")
 def test_play_move_draw(mock_check_winner, mock_drop_piece):
     mock_drop_piece.return_value = 0
     mock_check_winner.return_value = False
@@ -133,7 +179,7 @@ def test_play_move_draw(mock_check_winner, mock_drop_piece):
 
 
 @patch("app.routers.game.drop_piece")
-@patch("app.routers.game.check_winner")
+@patch("app.routers.game.check_winner_at")
 def test_play_move_draw(mock_check_winner, mock_drop_piece):
     mock_drop_piece.return_value = 0
     mock_check_winner.return_value = False
@@ -166,18 +212,24 @@ def test_play_move_game_not_found():
     assert exc_info.value.detail == "Game not found"
 
 
-@patch("app.routers.game.online_games", new_callable=dict)
+def online_store(games=None):
+    repository = OnlineGameRepository(100, 3600, 600, is_finished=lambda game: game.get("status") in ("won", "draw"))
+    for code, game in (games or {}).items():
+        repository[code] = {"version": 1, **game}
+    return MemoryGameStore(repository)
+
+
+@patch("app.routers.game.online_games", new_callable=online_store)
 def test_create_online_game(mock_online_games):
     result = create_online_game(playerName="Alice", gameCode="GAME123")
 
     assert result == {"message": "Online game created successfully."}
-    assert "GAME123" in mock_online_games
-    assert mock_online_games["GAME123"]["player1"] == "Alice"
-    assert mock_online_games["GAME123"]["status"] == "waiting"
+    assert mock_online_games.get("GAME123")["player1"] == "Alice"
+    assert mock_online_games.get("GAME123")["status"] == "waiting"
 
 
 
-@patch("app.routers.game.online_games", {"GAME123": {"player1": "Alice", "player2": None}})
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": None}}))
 def test_join_online_game():
     result = join_online_game(playerName="Bob", gameCode="GAME123")
 
@@ -186,7 +238,7 @@ def test_join_online_game():
     assert result["game"]["status"] == "ready"
 
 #game have already 2 players
-@patch("app.routers.game.online_games", {"GAME123": {"player1": "Alice", "player2": "Bob", "status": "ready"}})
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "status": "ready"}}))
 def test_join_online_game_full():
     with pytest.raises(HTTPException) as exc_info:
         join_online_game(playerName="Charlie", gameCode="GAME123")
@@ -195,9 +247,9 @@ def test_join_online_game_full():
     assert exc_info.value.detail == "Game already has two players."
 
 
-@patch("app.routers.game.online_games", {"GAME123": {"player1": "Alice", "player2": "Bob", "board": [[0]*7 for _ in range(6)], "current_turn": 1, "status": "active"}})
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "board": [[0]*7 for _ in range(6)], "current_turn": 1, "status": "active", "moves": 0}}))
 @patch("app.routers.game.drop_piece")
-@patch("app.routers.game.check_winner")
+@patch("app.routers.game.check_winner_at")
 def test_play_online_move(mock_check_winner, mock_drop_piece):
     mock_drop_piece.return_value = 5
     mock_check_winner.return_value = False
@@ -209,7 +261,7 @@ def test_play_online_move(mock_check_winner, mock_drop_piece):
     assert result["current_turn"] == 2
 
 
-@patch("app.routers.game.online_games", {"GAME123": {"player1": "Alice", "player2": "Bob", "status": "won", "current_turn": 1}})
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "status": "won", "current_turn": 1}}))
 def test_reset_online_game():
     result = reset_online_game(gameCode="GAME123")
 
@@ -220,46 +272,115 @@ def test_reset_online_game():
 
 
 @patch("app.routers.game.db")
-@patch("app.routers.game.online_games", {"GAME123": {}})
+@patch("app.routers.game.online_games", online_store({"GAME123": {}}))
 def test_update_online_score(mock_db):
     mock_user_collection = MagicMock()
     mock_db.__getitem__.return_value = mock_user_collection
-    mock_user_collection.find_one.return_value = {"name": "Alice", "score": 10}
+    mock_user_collection.find_one_and_update.return_value = {"score": 15}
 
     result = update_online_score(gameCode="GAME123", name="Alice", score=5)
 
     assert result == {"name": "Alice", "new_score": 15}
-    mock_user_collection.update_one.assert_called_with({"name": "Alice"}, {"$set": {"score": 15}})
+    mock_user_collection.find_one_and_update.assert_called_once()
+    args, kwargs = mock_user_collection.find_one_and_update.call_args
+    assert args == ({"name": "Alice"}, {"$inc": {"score": 5}})
+    assert kwargs["upsert"] is True
+    mock_user_collection.find_one.assert_not_called()
+    mock_user_collection.update_one.assert_not_called()
+
+@patch("app.routers.game.db")
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "status": "won", "winner_id": 1}}))
+def test_update_online_scores(mock_db):
+    mock_user_collection = MagicMock()
+    mock_db.__getitem__.return_value = mock_user_collection
+    mock_user_collection.find.return_value = [{"name": "Alice", "score": 11}, {"name": "Bob", "score": 3}]
+    scores = GameScores(gameCode="GAME123", scores=[{"name": "Alice", "score": 1}, {"name": "Bob", "score": 0}])
+
+    result = update_online_scores(scores)
+
+    assert result == {"scores": [{"name": "Alice", "new_score": 11}, {"name": "Bob", "new_score": 3}]}
+    (operations,), _ = mock_user_collection.bulk_write.call_args
+    assert [(operation._filter, operation._doc, operation._upsert) for operation in operations] == [
+        ({"name": "Alice"}, {"$inc": {"score": 1}}, True),
+        ({"name": "Bob"}, {"$inc": {"score": 0}}, True),
+    ]
+
+    # Le second joueur envoie le même résultat : compté une seule fois
+    with pytest.raises(HTTPException) as exc_info:
+        update_online_scores(scores)
+    assert exc_info.value.status_code == 409
+    assert mock_user_collection.bulk_write.call_count == 1
+
+def finished_online_store():
+    return online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "status": "won", "winner_id": 1}})
 
-@patch("app.routers.game.online_games", {"GAME123": {"player1": "Alice", "player2": "Bob"}})
+@patch("app.routers.game.db")
+def test_update_online_scores_failures(mock_db):
+    mock_user_collection = MagicMock()
+    mock_db.__getitem__.return_value = mock_user_collection
+    scores = GameScores(gameCode="GAME123", scores=[{"name": "Alice", "score": 1}, {"name": "Bob", "score": 0}])
+    validation = {"code": 121, "errmsg": "Document failed validation"}
+
+    # Rien n'a été écrit : les joueurs peuvent renvoyer les scores
+    for error in (AutoReconnect("down"), BulkWriteError({"writeErrors": [{**validation, "index": 0}, {**validation, "index": 1}]})):
+        with patch("app.routers.game.online_games", finished_online_store()) as store:
+            mock_user_collection.bulk_write.side_effect = error
+            with pytest.raises(type(error)):
+                update_online_scores(scores)
+            assert "scored" not in store.get("GAME123")
+
+    # Le point de Bob est écrit, ou les deux avant l'échec de la relecture : plus de renvoi possible
+    for failure in ({"bulk_write": BulkWriteError({"writeErrors": [{**validation, "index": 0}]})},
+                    {"find": AutoReconnect("down")}):
+        with patch("app.routers.game.online_games", finished_online_store()) as store:
+            mock_user_collection.bulk_write.side_effect = failure.get("bulk_write")
+            mock_user_collection.find.side_effect = failure.get("find")
+            with pytest.raises((BulkWriteError, AutoReconnect)):
+                update_online_scores(scores)
+            assert store.get("GAME123")["scored"] is True
+            with pytest.raises(HTTPException) as exc_info:
+                update_online_scores(scores)
+            assert exc_info.value.status_code == 409
+
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob"}}))
 def test_destroy_online_game():
     response = destroy_online_game(gameCode="GAME123")
     assert response == {"message": "Game GAME123 has been destroyed."}
-    assert "GAME123" not in online_games
+    assert online_games.get("GAME123") is None
 
-@patch("app.routers.game.online_games", {})
+@patch("app.routers.game.online_games", online_store({}))
 def test_destroy_online_game_not_found():
     with pytest.raises(HTTPException) as exc_info:
         destroy_online_game(gameCode="GAME123")
     assert exc_info.value.status_code == 404
     assert exc_info.value.detail == "Game not found."
-@patch("app.routers.game.online_games", {"GAME123": {"player1": "Alice", "player2": "Bob", "status": "ready"}})
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "status": "ready", "version": 7}}))
 def test_get_online_game_status():
-    response = get_online_game_status(gameCode="GAME123")
-    assert response == {"player1": "Alice", "player2": "Bob", "status": "ready"}
+    response = TestClient(app).get("/game-online/GAME123")
+    assert response.json() == {"player1": "Alice", "player2": "Bob", "status": "ready", "version": 7}
+    assert response.headers["ETag"] == '"7"'
+
 
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "status": "ready", "version": 7}}))
+def test_get_online_game_status_not_modified():
+    response = TestClient(app).get("/game-online/GAME123", headers={"If-None-Match": '"7"'})
+    assert response.status_code == 304
+    assert response.content == b""
 
-@patch("app.routers.game.online_games", {})
+    response = TestClient(app).get("/game-online/GAME123", headers={"If-None-Match": '"6"'})
+    assert response.status_code == 200
+
+
+@patch("app.routers.game.online_games", online_store({}))
 def test_get_online_game_status_not_found():
-    with pytest.raises(HTTPException) as exc_info:
-        get_online_game_status(gameCode="GAME123")
-    assert exc_info.value.status_code == 404
-    assert exc_info.value.detail == "Game not found."
+    response = TestClient(app).get("/game-online/GAME123")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Game not found."
 
 
 
 
-@patch("app.routers.game.online_games", {"GAME123": {"player1": "Alice", "player2": "Bob", "board": [[0]*7 for _ in range(6)], "current_turn": 1, "status": "active"}})
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "board": [[0]*7 for _ in range(6)], "current_turn": 1, "status": "active"}}))
 def test_play_online_move_invalid_column():
     with pytest.raises(HTTPException) as exc_info:
         play_online_move(gameCode="GAME123", column=10, player_id=1)
@@ -267,3 +388,424 @@ def test_play_online_move_invalid_column():
     assert exc_info.value.detail == "Invalid column"
 
 
+
+
+def test_game_repository_ttl_and_size():
+    now = [0.0]
+    repository = GameRepository(
+        max_games=2, ttl=100, finished_ttl=10,
+        is_finished=lambda game: game["status"] == "won", clock=lambda: now[0],
+    )
+    repository.put("A", {"status": "active"})
+    repository.put("B", {"status": "won"})
+
+    now[0] = 11
+    assert repository.get("B") is None  # Finished game expired
+    assert repository["A"]["status"] == "active"
+
+    repository.put("C", {"status": "active"})
+    repository.put("D", {"status": "active"})
+    assert "A" not in repository  # Least recently used game dropped
+    assert len(repository) == 2
+
+    now[0] = 200
+    assert repository.values() == []
+
+
+def test_delete_game_not_found():
+    with pytest.raises(HTTPException) as exc_info:
+        delete_game(999)
+
+    assert exc_info.value.status_code == 404
+
+
+def test_online_player_index():
+    store = online_store({"G1": {"player1": "Alice", "player2": None, "status": "waiting"}})
+    with patch("app.routers.game.online_games", store):
+        with pytest.raises(HTTPException) as exc_info:
+            create_online_game(playerName="Alice", gameCode="G2")
+        assert exc_info.value.detail == "Player name is already in use."
+
+        join_online_game(playerName="Bob", gameCode="G1")
+        assert store.repository.game_of("Bob") == "G1"
+        with pytest.raises(HTTPException):
+            create_online_game(playerName="Bob", gameCode="G2")
+
+        destroy_online_game(gameCode="G1")
+        assert not store.name_in_use("Alice") and not store.name_in_use("Bob")
+        create_online_game(playerName="Bob", gameCode="G2")
+        assert store.repository.game_of("Bob") == "G2"
+
+
+def test_online_player_index_expiry():
+    now = [0.0]
+    store = OnlineGameRepository(100, 60, 10, clock=lambda: now[0])
+    store["G1"] = {"player1": "Alice", "player2": "Bob", "status": "active"}
+    assert store.name_in_use("Bob")
+
+    now[0] = 61
+    assert not store.name_in_use("Bob")
+    assert "G1" not in store and store.players == {}
+
+
+@patch("app.routers.game.online_games", online_store())
+def test_online_game_socket_events():
+    client = TestClient(app)
+    client.post("/game-online/", json={"playerName": "Alice", "gameCode": "WS1"})
+    with client.websocket_connect("/game-online/WS1/ws") as socket:
+        assert socket.receive_json()["type"] == "state"
+
+        client.post("/game-online/join", json={"playerName": "Bob", "gameCode": "WS1"})
+        event = socket.receive_json()
+        assert (event["type"], event["player2"], event["status"]) == ("join", "Bob", "ready")
+
+        client.put("/game-online/WS1?column=3&player_id=1")
+        event = socket.receive_json()
+        assert event["type"] == "move"
+        assert (event["column"], event["row"], event["player_id"], event["current_turn"]) == (3, 5, 1, 2)
+
+        client.delete("/game-online/WS1")
+        assert socket.receive_json() == {"type": "closed"}
+
+
+@patch("app.routers.game.online_games", online_store())
+def test_online_game_socket_move_before_subscription():
+    client = TestClient(app)
+    client.post("/game-online/", json={"playerName": "Alice", "gameCode": "WS2"})
+    client.post("/game-online/join", json={"playerName": "Bob", "gameCode": "WS2"})
+    read = read_online_game
+    reads = []
+
+    async def read_then_move(gameCode):
+        game = await read(gameCode)
+        if not reads:  # Coup joué entre la première lecture et l'abonnement : personne ne l'écoute
+            play_online_move(gameCode=gameCode, column=3, player_id=1)
+        reads.append(game)
+        return game
+
+    with patch("app.routers.game.read_online_game", read_then_move):
+        with client.websocket_connect("/game-online/WS2/ws") as socket:
+            state = socket.receive_json()
+            assert state["type"] == "state"
+            assert state["board"][5][3] == 1 and state["moves"] == 1
+
+            client.put("/game-online/WS2?column=3&player_id=2")
+            event = socket.receive_json()
+            assert (event["type"], event["player_id"], event["moves"]) == ("move", 2, 2)
+            client.delete("/game-online/WS2")
+
+
+def test_online_events_published_under_the_game_lock():
+    store = online_store()
+    published = []
+
+    def record(code, event):
+        # Verrou de la partie tenu : deux mises à jour ne peuvent pas publier dans le désordre
+        published.append((event["type"], store.game_locks[code][0].locked()))
+
+    with patch("app.routers.game.online_games", store), patch.object(game_events, "publish", record):
+        create_online_game(playerName="Alice", gameCode="EV1")
+        join_online_game(playerName="Bob", gameCode="EV1")
+        play_online_move(gameCode="EV1", column=3, player_id=1)
+        reset_online_game(gameCode="EV1")
+        destroy_online_game(gameCode="EV1")
+    assert published == [("join", True), ("move", True), ("reset", True), ("closed", True)]
+    assert store.game_locks == {}
+    # Stockage partagé : les mises à jour de ce worker sont aussi sérialisées par partie
+    mongo_store = MongoGameStore(MagicMock(), 3600, 600, is_finished)
+    with mongo_store.locked("EV1"):
+        assert mongo_store.game_locks["EV1"][0].locked()
+    assert mongo_store.game_locks == {}
+
+
+@patch("app.routers.game.online_games", online_store())
+def test_get_online_game_status_long_poll():
+    client = TestClient(app)
+    client.post("/game-online/", json={"playerName": "Alice", "gameCode": "LP1"})
+    etag = client.get("/game-online/LP1").headers["ETag"]
+
+    # Rien ne change : 304 après l'attente
+    response = client.get("/game-online/LP1?wait=50", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Un coup joué pendant l'attente réveille la requête
+    def play_later():
+        time.sleep(0.2)
+        play_online_move(gameCode="LP1", column=3, player_id=1)
+
+    threading.Thread(target=play_later).start()
+    start = time.monotonic()
+    response = client.get("/game-online/LP1?wait=5000", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert time.monotonic() - start < 4
+    assert response.json()["board"][5][3] == 1
+    assert response.headers["ETag"] != etag
+
+
+def test_memory_store_compare_and_set():
+    store = online_store({"G1": {"player1": "Alice", "player2": None, "status": "waiting"}})
+    assert store.get("G1") is store.get("G1")  # Lectures sans copie
+    first, second = store.get_for_update("G1"), store.get_for_update("G1")
+    assert first is not second and first["player2"] is None
+
+    first["player2"] = "Bob"
+    assert store.save("G1", first)["version"] == 2
+    second["status"] = "ready"
+    with pytest.raises(StateConflict):
+        store.save("G1", second)  # Lu avant le premier enregistrement
+    assert store.get("G1")["player2"] == "Bob"
+
+    store.delete("G1")
+    with pytest.raises(GameNotFound):
+        store.save("G1", first)
+
+
+def test_update_game_retries_on_conflict():
+    store = online_store({"G1": {"player1": "Alice", "player2": "Bob", "status": "active", "moves": 0}})
+
+    def play(game):
+        if game["moves"] == 0:
+            # Un autre worker enregistre la partie entre la lecture et l'écriture
+            other = store.get_for_update("G1")
+            other["moves"] = 1
+            store.save("G1", other)
+        game["moves"] += 1
+
+    with patch("app.routers.game.online_games", store):
+        game, _ = update_game(store, "G1", play, "Game not found.")
+    assert game["moves"] == 2
+    assert store.get("G1")["moves"] == 2
+
+
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "board": [[0]*7 for _ in range(6)], "current_turn": 1, "status": "active", "moves": 0}}))
+def test_play_online_move_not_your_turn():
+    with pytest.raises(HTTPException) as exc_info:
+        play_online_move(gameCode="GAME123", column=3, player_id=2)
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Not your turn."
+
+
+def test_concurrent_online_moves_keep_board_invariants():
+    store = online_store()
+    codes = [f"S{index}" for index in range(4)]
+    for code in codes:
+        store.put(code, {"player1": f"{code}-a", "player2": f"{code}-b", "board": [[0]*7 for _ in range(6)],
+                         "current_turn": 1, "status": "active", "moves": 0})
+    accepted = {code: 0 for code in codes}
+    counter_lock = threading.Lock()
+
+    def hammer(code, player_id, seed):
+        rng = random.Random(seed)
+        for _ in range(60):
+            try:
+                play_online_move(gameCode=code, column=rng.randrange(7), player_id=player_id)
+            except HTTPException as error:
+                assert error.detail in ("Not your turn.", "Column is full", "Game is not in a playable state.")
+                continue
+            with counter_lock:
+                accepted[code] += 1
+
+    # Plusieurs requêtes par joueur et par partie en même temps, comme un double clic
+    threads = [
+        threading.Thread(target=hammer, args=(code, player_id, seed))
+        for code in codes for player_id in (1, 2) for seed in range(3)
+    ]
+    with patch("app.routers.game.online_games", store):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for code in codes:
+        game = store.get(code)
+        board = game["board"]
+        ones = sum(cell == 1 for row in board for cell in row)
+        twos = sum(cell == 2 for row in board for cell in row)
+        assert ones + twos == game["moves"] == accepted[code]
+        assert ones - twos in (0, 1)  # Player 1 started and turns alternated
+        for column in range(7):  # No piece floating above an empty cell
+            cells = [board[row][column] for row in range(6)]
+            assert cells == sorted(cells, key=lambda cell: cell != 0)
+        if game["status"] == "active":
+            assert game["current_turn"] == (1 if ones == twos else 2)
+    assert store.game_locks == {}
+
+
+def test_score_buffer_coalesces_and_flushes():
+    now = [0.0]
+    collection = MagicMock()
+    collection.find.return_value = [{"name": "Alice", "score": 10}]
+    buffer = ScoreBuffer(collection, interval=60, max_players=100, clock=lambda: now[0])
+
+    buffer.add({"Alice": 1, "Bob": 1})
+    buffer.add({"Alice": 2})
+    now[0] = 3
+    assert buffer.stats()["lag_seconds"] == 3
+    # Les points pas encore écrits s'ajoutent au score lu en base
+    assert buffer.scores(["Alice", "Bob"]) == {"Alice": 13, "Bob": 1}
+    collection.bulk_write.assert_not_called()
+
+    assert buffer.flush() == 2
+    (operations,), _ = collection.bulk_write.call_args
+    assert sorted((operation._filter["name"], operation._doc["$inc"]["score"]) for operation in operations) == [
+        ("Alice", 3), ("Bob", 1)
+    ]
+    assert buffer.stats()["pending_players"] == 0 and buffer.stats()["lag_seconds"] == 0
+
+
+def test_score_buffer_failed_flush_is_retried():
+    collection = MagicMock()
+    collection.bulk_write.side_effect = [AutoReconnect("down"), None]
+    buffer = ScoreBuffer(collection, interval=60, max_players=100)
+
+    buffer.add({"Alice": 1})
+    assert buffer.flush() == 0
+    buffer.add({"Alice": 1})
+    assert buffer.flush() == 1
+    (operations,), _ = collection.bulk_write.call_args
+    assert [operation._doc for operation in operations] == [{"$inc": {"score": 2}}]
+    assert buffer.stats()["failures"] == 1
+
+
+def test_score_buffer_retry_failure_restores_the_right_players():
+    collection = MagicMock()
+    duplicate = {"code": 11000, "errmsg": "E11000 duplicate key"}
+    collection.bulk_write.side_effect = [
+        BulkWriteError({"writeErrors": [{**duplicate, "index": 1}, {**duplicate, "index": 2}]}),
+        # Relance de Bob et Carol : Carol échoue encore (index 1 de la relance)
+        BulkWriteError({"writeErrors": [{**duplicate, "index": 1}]}),
+    ]
+    buffer = ScoreBuffer(collection, interval=60, max_players=100)
+
+    buffer.add({"Alice": 1, "Bob": 5, "Carol": 7})
+    assert buffer.flush() == 2
+    # Seul le point de Carol reste à écrire : Bob n'est pas compté deux fois
+    assert buffer.pending == {"Carol": 7}
+    assert buffer.stats()["failures"] == 1
+
+
+class FakeScores:
+    """
+    users collection applying the $inc of bulk_write, with a scripted failure per call:
+    "duplicate" for the upserts of the names in `colliding`, or an exception to raise.
+    """
+
+    def __init__(self, failures, colliding=()):
+        self.scores = {}
+        self.failures = list(failures)
+        self.colliding = set(colliding)
+
+    def bulk_write(self, operations, ordered=True):
+        failure = self.failures.pop(0) if self.failures else None
+        if isinstance(failure, Exception):
+            raise failure
+        errors = []
+        for index, operation in enumerate(operations):
+            name = operation._filter["name"]
+            if failure == "duplicate" and name in self.colliding:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.scores[name] = self.scores.get(name, 0) + operation._doc["$inc"]["score"]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+def test_score_buffer_retry_connection_failure_restores_the_retried_players():
+    # Upserts de Bob et Carol en collision, puis la relance perd la connexion
+    collection = FakeScores(["duplicate", AutoReconnect("down")], colliding={"Bob", "Carol"})
+    buffer = ScoreBuffer(collection, interval=60, max_players=100)
+
+    buffer.add({"Alice": 1, "Bob": 5, "Carol": 7, "Dan": 2})
+    assert buffer.flush() == 2
+    assert collection.scores == {"Alice": 1, "Dan": 2}
+    assert buffer.pending == {"Bob": 5, "Carol": 7}
+
+    assert buffer.flush() == 2
+    assert collection.scores == {"Alice": 1, "Bob": 5, "Carol": 7, "Dan": 2}
+
+
+def test_score_buffer_size_threshold_and_stop():
+    collection = MagicMock()
+    buffer = ScoreBuffer(collection, interval=60, max_players=2)
+    buffer.start()
+    buffer.add({"Alice": 1, "Bob": 1})  # Seuil atteint : écrit sans attendre l'intervalle
+    deadline = time.monotonic() + 5
+    while not collection.bulk_write.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert collection.bulk_write.call_count == 1
+
+    buffer.add({"Carol": 1})
+    buffer.stop()  # Arrêt : le reste est écrit
+    assert collection.bulk_write.call_count == 2
+    assert buffer.stats()["pending_players"] == 0
+
+
+def test_board_codec_round_trip():
+    rng = random.Random(1)
+    for _ in range(200):
+        board = [[0] * 7 for _ in range(6)]
+        player_id = 1
+        for _ in range(rng.randint(0, 42)):
+            drop_piece(board, rng.choice([col for col in range(7) if board[0][col] == 0]), player_id)
+            player_id = 3 - player_id
+        encoded = encode_bitboard(board)
+        assert len(encoded) == 16 and encoded[0] == "A"
+        assert decode_board(encoded) == board
+
+    board = decode_board("4453")
+    assert board[5][:4] == [0, 0, 2, 1] and board[4][3] == 2
+    assert count_pieces(board) == 4
+    for invalid in ("48", "4444444", "A" * 15 + "C", "A" * 16 + "="):  # C : pion en l'air
+        with pytest.raises(ValueError):
+            decode_board(invalid)
+
+
+def test_create_game_compact_board():
+    client = TestClient(app)
+    body = {"id": 77, "players": [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}], "current_turn": 1, "board": "44"}
+
+    response = client.post("/game/?board_format=bitboard", json=body)
+    assert response.status_code == 200
+    assert decode_board(response.json()["board"]) == games.get(77)["board"]
+    assert response.json()["moves"] == 2
+
+    response = client.put("/game/77", json={"column": 3, "player_id": 1}, headers={"Accept": "application/json; board=bitboard"})
+    assert decode_board(response.json()["board"])[3][3] == 1
+    assert client.put("/game/77?board_format=ascii", json={"column": 3, "player_id": 2}).status_code == 400
+
+
+@patch("app.routers.game.online_games", online_store({"GAME123": {"player1": "Alice", "player2": "Bob", "status": "ready", "version": 7, "board": decode_board("4")}}))
+def test_get_online_game_status_bitboard():
+    client = TestClient(app)
+    response = client.get("/game-online/GAME123?board_format=bitboard")
+    assert response.json()["board"] == encode_bitboard(decode_board("4"))
+    assert response.headers["ETag"] == '"7-bitboard"'
+
+    # L'ETag de la représentation en liste ne vaut pas pour le bitboard
+    response = client.get("/game-online/GAME123?board_format=bitboard", headers={"If-None-Match": '"7"'})
+    assert response.status_code == 200
+    response = client.get("/game-online/GAME123?board_format=bitboard", headers={"If-None-Match": '"7-bitboard"'})
+    assert response.status_code == 304
+
+
+def test_mongo_store_keeps_boards_compact():
+    store = MongoGameStore(MagicMock(), 3600, 600, lambda game: False)
+    game = {"player1": "Alice", "board": decode_board("4453"), "version": 3}
+
+    document = store._document("G1", game)
+    assert document["game"]["board"] == encode_bitboard(game["board"])
+    assert store._game(document) == game
+    # Documents written before the compact encoding
+    assert store._game({"game": {"board": game["board"]}, "version": 3})["board"] == game["board"]
+
+
+@patch("app.routers.game.games", new_callable=lambda: MemoryGameStore(GameRepository(100, 3600, 600)))
+def test_get_games_matches_response_model(mock_games):
+    create_game(new_game(5))
+    play_move(5, Move(column=3, player_id=1))
+    response = TestClient(app).get("/game/")
+
+    # Réponse envoyée sans revalidation : identique à celle du modèle Game
+    assert response.json() == [Game(**game).dict() for game in mock_games.values()]
+    assert "version" not in response.json()[0]
+    assert mock_games.values()[0] is mock_games.get(5)  # Liste lue sans copier les parties
@@ -0,0 +1,242 @@
+"""
+Cache des lectures de scores, placé derrière la dépendance get_user_collection.
+
+- score de chaque joueur (/users/score/{name}) : LRU de SCORE_CACHE_SIZE noms ;
+- liste des scores (/users/scores) et début du classement (/users/leaderboard,
+  voir app/leaderboard.py) : une entrée chacun.
+
+Les scores sont aussi écrits par le game-service, directement dans la base.
+Quand MongoDB fournit les change streams (replica set), watch_users()
+invalide les entrées touchées dès qu'un document change, et les entrées
+vivent SCORE_CACHE_WATCHED_TTL secondes ; sinon elles expirent après
+SCORE_CACHE_TTL secondes (LEADERBOARD_CACHE_TTL pour le classement). Les
+écritures passant par CachedUserCollection invalident tout de suite.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import asyncio
+import logging
+import os
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.leaderboard import LEADERBOARD_CACHE_TTL, top_cache
+
+SCORE_CACHE_SIZE = int(os.getenv("SCORE_CACHE_SIZE", "10000"))
+SCORE_CACHE_TTL = float(os.getenv("SCORE_CACHE_TTL", "5"))
+SCORE_CACHE_WATCHED_TTL = float(os.getenv("SCORE_CACHE_WATCHED_TTL", "300"))
+# Champs dont la modification change une réponse en cache (pas hashed_password)
+CACHED_FIELDS = {"name", "email", "score"}
+# Champs des listes d'utilisateurs renvoyées (ceux de UserResponse)
+USER_PROJECTION = {"_id": 0, "name": 1, "email": 1, "score": 1}
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    At most `max_size` entries, each valid `ttl` seconds after it was stored;
+    the least recently read entry is dropped first. Counts hits and misses.
+
+    generation changes at every invalidation: a value read from the database
+    before an invalidation is not stored after it (put with that generation).
+    """
+
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, stored at)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self.entries.get(key)
+        if entry is None or self.clock() - entry[1] > self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        if generation is not None and generation != self.generation:
+            return
+        self.entries[key] = (value, self.clock())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self.entries.pop(key, None)
+        self.generation += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.generation += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+score_cache = LRUCache(SCORE_CACHE_SIZE, SCORE_CACHE_TTL)
+scores_list_cache = LRUCache(1, SCORE_CACHE_TTL)
+watching = False  # True while a change stream feeds the invalidations
+
+
+def use_watched_ttl(watched: bool):
+    score_cache.ttl = scores_list_cache.ttl = SCORE_CACHE_WATCHED_TTL if watched else SCORE_CACHE_TTL
+    top_cache.ttl = SCORE_CACHE_WATCHED_TTL if watched else LEADERBOARD_CACHE_TTL
+
+
+def invalidate(name: Optional[str] = None):
+    """
+    Drop what a change of the user `name` (or of any user) can make stale.
+    """
+    if name is None:
+        score_cache.clear()
+    else:
+        score_cache.invalidate(name)
+    scores_list_cache.clear()
+    top_cache.invalidate()
+
+
+class CachedUserCollection:
+    """
+    The users collection as given to the routes: cached score reads, writes
+    that invalidate, and every other Motor method passed through.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name: str):
+        return getattr(self.collection, name)
+
+    async def score(self, name: str) -> Optional[int]:
+        score = score_cache.get(name)
+        if score is MISSING:
+            generation = score_cache.generation
+            user = await self.collection.find_one({"name": name}, {"_id": 0, "score": 1})
+            if user is None:
+                return None  # Not cached: the user may register at any time
+            score = user["score"]
+            score_cache.put(name, score, generation)
+        return score
+
+    async def scores(self) -> list:
+        users = scores_list_cache.get("all")
+        if users is MISSING:
+            generation = scores_list_cache.generation
+            users = await self.collection.find({}, USER_PROJECTION).to_list(None)
+            scores_list_cache.put("all", users, generation)
+        return users
+
+    async def insert_one(self, document: dict, *args, **kwargs):
+        result = await self.collection.insert_one(document, *args, **kwargs)
+        invalidate(document.get("name"))
+        return result
+
+    async def update_one(self, query: dict, update: dict, *args, **kwargs):
+        result = await self.collection.update_one(query, update, *args, **kwargs)
+        if set(update.get("$set", {})) & CACHED_FIELDS or set(update) - {"$set"}:
+            invalidate(query.get("name"))
+        return result
+
+    async def delete_one(self, query: dict, *args, **kwargs):
+        result = await self.collection.delete_one(query, *args, **kwargs)
+        invalidate()  # Deleted by id: the name is not known here
+        return result
+
+
+def apply_change(change: dict):
+    """
+    Invalidate the entries made stale by one change stream event.
+    """
+    operation = change["operationType"]
+    if operation == "update":
+        if not set(change["updateDescription"]["updatedFields"]) & CACHED_FIELDS \
+                and not change["updateDescription"].get("removedFields"):
+            return  # e.g. a password rehashed on login
+    if operation in ("insert", "update", "replace"):
+        document = change.get("fullDocument")
+        invalidate(document.get("name") if document else None)
+    else:  # delete, drop, rename, invalidate...
+        invalidate()
+
+
+async def watch_users(collection, retry_delay: float = 5):
+    """
+    Follow the changes of the users collection and invalidate the caches.
+    Without change streams (standalone mongod) the TTL stays short and this
+    returns; on other errors the stream is reopened where it stopped.
+    """
+    global watching
+    resume_token = None
+    while True:
+        try:
+            async with collection.watch(full_document="updateLookup", resume_after=resume_token) as stream:
+                change = await stream.try_next()  # Opens the stream, raises without change streams
+                # Open: the entries cached before could have missed changes
+                watching = True
+                invalidate()
+                use_watched_ttl(True)
+                while stream.alive:
+                    if change is not None:
+                        apply_change(change)
+                    resume_token = stream.resume_token
+                    change = await stream.try_next()
+        except OperationFailure as error:
+            watching = False
+            use_watched_ttl(False)
+            if error.code in (40573, 40324):  # Not a replica set / $changeStream unknown
+                logger.info("Change streams unavailable, score caches expire after %ss", SCORE_CACHE_TTL)
+                return
+            logger.warning(f"Change stream failed ({error}), reopening")
+            resume_token = None  # The token may be the cause (e.g. rolled off the oplog)
+        except PyMongoError as error:
+            watching = False
+            use_watched_ttl(False)
+            logger.warning(f"Change stream interrupted ({error}), reopening")
+        await asyncio.sleep(retry_delay)
+
+
+watch_task: Optional[asyncio.Task] = None
+
+
+def start_watcher(collection):
+    global watch_task
+    if watch_task is None:
+        watch_task = asyncio.ensure_future(watch_users(collection))
+
+
+def stop_watcher():
+    global watch_task, watching
+    if watch_task is not None:
+        watch_task.cancel()
+        watch_task = None
+    watching = False
+    use_watched_ttl(False)
+
+
+def stats() -> dict:
+    return {
+        "change_stream": watching,
+        "scores": score_cache.stats(),
+        "scores_list": scores_list_cache.stats(),
+        "leaderboard_top": top_cache.stats(),
+    }
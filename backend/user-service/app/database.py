@@ -0,0 +1,85 @@
+"""
+Connexion MongoDB partagée du service utilisateur (Motor, asynchrone).
+
+Un seul client, donc un seul pool de connexions, est créé au démarrage de
+l'application (open_client) et fermé à son arrêt (close_client). Les tailles
+du pool et les délais sont réglés par les variables d'environnement MONGO_*.
+"""
+from typing import Optional
+import logging
+import os
+
+from pymongo.errors import PyMongoError
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from app.cache import CachedUserCollection
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+MONGO_DB = os.getenv("MONGO_DB", "user_db")
+
+client: Optional[AsyncIOMotorClient] = None
+
+logger = logging.getLogger(__name__)
+
+# Index de la collection users : recherche par nom / email (uniques) et classement par score.
+# email est sparse : le game-service crée sans email les joueurs qui marquent des points sans compte
+USER_INDEXES = [
+    ([("name", 1)], {"unique": True}),
+    ([("email", 1)], {"unique": True, "sparse": True}),
+    ([("score", -1), ("name", 1)], {}),
+]
+
+
+def client_options() -> dict:
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000")),
+        # Attente d'une connexion libre du pool quand les maxPoolSize sont occupées
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000")),
+    }
+
+
+def open_client() -> AsyncIOMotorClient:
+    """
+    Crée le client partagé. Doit être appelé depuis la boucle asyncio de
+    l'application (événement startup).
+    """
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(MONGO_URI, **client_options())
+    return client
+
+
+def close_client():
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+
+def get_db() -> AsyncIOMotorDatabase:
+    # Le client est normalement ouvert au démarrage ; sinon (tests sans startup) à la première requête
+    return open_client()[MONGO_DB]
+
+
+def get_user_collection() -> CachedUserCollection:
+    # Lectures de scores en cache et écritures qui l'invalident (voir app/cache.py)
+    return CachedUserCollection(get_db()["users"])
+
+
+async def create_indexes():
+    """
+    Crée les index au démarrage (sans effet s'ils existent déjà). Un index
+    impossible à créer, par exemple unique sur des doublons existants, est
+    signalé sans empêcher le service de démarrer.
+    """
+    collection = get_user_collection()
+    for keys, options in USER_INDEXES:
+        try:
+            await collection.create_index(keys, **options)
+        except PyMongoError as error:
+            logger.error(f"Could not create index {keys} on users: {error}")
@@ -0,0 +1,137 @@
+"""
+Classement des joueurs : pages triées par score décroissant (puis par nom),
+lues sur l'index {score: -1, name: 1} avec une pagination par curseur.
+
+Le curseur d'une page est le couple (score, nom) de sa dernière ligne : la
+page suivante reprend juste après sans skip, quel que soit son rang. Les
+LEADERBOARD_TOP_N premières lignes, les plus demandées, sont gardées en cache
+LEADERBOARD_CACHE_TTL secondes, ou jusqu'à leur invalidation par app/cache.py.
+"""
+from typing import List, Optional, Tuple
+import base64
+import binascii
+import json
+import os
+import time
+
+LEADERBOARD_TOP_N = int(os.getenv("LEADERBOARD_TOP_N", "100"))
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", "5"))
+LEADERBOARD_SORT = [("score", -1), ("name", 1)]
+LEADERBOARD_PROJECTION = {"_id": 0, "name": 1, "score": 1}
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a cursor was not produced by encode_cursor.
+    """
+
+
+def encode_cursor(entry: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps([entry["score"], entry["name"]]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        score, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(score, int) or not isinstance(name, str):
+        raise InvalidCursor(cursor)
+    return score, name
+
+
+def after_query(cursor: Optional[Tuple[int, str]]) -> dict:
+    # Lignes strictement après le curseur dans l'ordre (score décroissant, nom croissant)
+    if cursor is None:
+        return {}
+    score, name = cursor
+    return {"$or": [{"score": {"$lt": score}}, {"score": score, "name": {"$gt": name}}]}
+
+
+class TopCache:
+    """
+    First LEADERBOARD_TOP_N rows of the leaderboard, reloaded when older than
+    the TTL or invalidated. complete tells whether they are all the rows
+    there are. Rows read before an invalidation are not stored after it.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.rows: Optional[List[dict]] = None
+        self.loaded_at = 0.0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def fresh(self) -> bool:
+        return self.rows is not None and time.monotonic() - self.loaded_at < self.ttl
+
+    def store(self, rows: List[dict], generation: Optional[int] = None):
+        if generation is not None and generation != self.generation:
+            return
+        self.rows = rows
+        self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self.rows = None
+        self.generation += 1
+
+    @property
+    def complete(self) -> bool:
+        return self.rows is not None and len(self.rows) < self.size
+
+    def page(self, cursor: Optional[Tuple[int, str]], limit: int) -> Optional[Tuple[List[dict], bool]]:
+        """
+        The page after cursor and whether more rows follow, or None when the
+        cache cannot answer (cursor or end of the page beyond the cached rows).
+        """
+        if cursor is None:
+            start = 0
+        else:
+            keys = [(row["score"], row["name"]) for row in self.rows]
+            if cursor not in keys:
+                return None
+            start = keys.index(cursor) + 1
+        end = start + limit
+        if end > len(self.rows) and not self.complete:
+            return None
+        # A page ending on the last cached row is followed by the rows beyond the cache
+        return self.rows[start:end], end < len(self.rows) or not self.complete
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+top_cache = TopCache(LEADERBOARD_TOP_N, LEADERBOARD_CACHE_TTL)
+
+
+async def leaderboard_page(user_collection, cursor: Optional[str], limit: int) -> dict:
+    """
+    {"entries": [{"name", "score"}, ...], "next": cursor of the next page or None}
+    """
+    after = decode_cursor(cursor) if cursor else None
+    page = None
+    if not top_cache.fresh():
+        generation = top_cache.generation
+        top_cache.store(await user_collection.find({}, LEADERBOARD_PROJECTION)
+                        .sort(LEADERBOARD_SORT).limit(top_cache.size).to_list(None), generation)
+    if top_cache.rows is not None:
+        page = top_cache.page(after, limit)
+    if page is not None:
+        top_cache.hits += 1
+        rows, more = page
+    else:
+        top_cache.misses += 1
+        rows = await (user_collection.find(after_query(after), LEADERBOARD_PROJECTION)
+                      .sort(LEADERBOARD_SORT).limit(limit + 1).to_list(None))
+        more = len(rows) > limit
+        rows = rows[:limit]
+    return {"entries": rows, "next": encode_cursor(rows[-1]) if more and rows else None}
@@ -1,10 +1,11 @@
 from fastapi import FastAPI, Depends
+from fastapi.responses import ORJSONResponse
 from app.routers import user
-from pymongo import MongoClient
+from app import cache, database, passwords
 from fastapi.middleware.cors import CORSMiddleware
-import os
 
-app = FastAPI()
+# Réponses sérialisées par orjson
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,10 +15,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configuration de la connexion à MongoDB
-mongo_uri = os.getenv("MONGO_URI", "mongodb://mongo:27017")
-client = MongoClient(mongo_uri)
-db = client["user_db"]
+# Connexion à MongoDB : un pool partagé, ouvert au démarrage et fermé à l'arrêt (voir app/database.py)
+@app.on_event("startup")
+async def open_database():
+    database.open_client()
+    await database.create_indexes()
+
+@app.on_event("shutdown")
+def close_database():
+    database.close_client()
+
+# Invalidation du cache des scores par les change streams de MongoDB (voir app/cache.py)
+@app.on_event("startup")
+def start_cache_watcher():
+    cache.start_watcher(database.get_db()["users"])
+
+@app.on_event("shutdown")
+def stop_cache_watcher():
+    cache.stop_watcher()
+
+# Processus de hachage des mots de passe (bcrypt)
+@app.on_event("startup")
+def start_password_pool():
+    passwords.password_pool.start()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    passwords.password_pool.shutdown()
 
 # Inclure les routes du service utilisateur
 app.include_router(user.user_router)
@@ -0,0 +1,122 @@
+"""
+Hachage des mots de passe (bcrypt) dans un pool de processus dédié.
+
+bcrypt est volontairement lent (~250 ms au coût 12) : exécuté dans le
+gestionnaire de requête ou dans le pool de threads, une rafale de connexions
+bloque les autres routes. Les calculs partent donc dans PASSWORD_WORKERS
+processus, avec au plus PASSWORD_QUEUE calculs en attente au-delà ;
+au-delà, PasswordPoolSaturated est levée et la route répond 503.
+
+Le coût est BCRYPT_ROUNDS ; un hachage de coût inférieur est refait lors de
+la connexion suivante (verify_password renvoie alors le nouveau hachage).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import multiprocessing
+import os
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# min_rounds : verify_and_update signale les hachages d'un coût plus faible
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+
+class PasswordPoolSaturated(Exception):
+    """
+    Raised when every worker is busy and the waiting queue is full.
+    """
+
+
+def hash_in_worker(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_in_worker(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordPool:
+    """
+    Process pool for the bcrypt calls with a bounded number of pending jobs
+    and queue-depth counters (GET /auth/stats).
+
+    With workers=0 the jobs run on the default thread pool of the event loop
+    (tests and development, no extra processes).
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0  # Running and queued jobs
+        self.peak_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self.workers > 0 and self.executor is None:
+            # spawn: workers must not inherit the threads of the running server (Motor)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.pending - max(1, self.workers))
+
+    async def run(self, fn, *args):
+        if self.pending >= max(1, self.workers) + self.max_queue:
+            self.rejected += 1
+            raise PasswordPoolSaturated()
+        self.pending += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            result = await asyncio.get_event_loop().run_in_executor(self.executor, fn, *args)
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "pending": self.pending,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_pool = PasswordPool(
+    workers=int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1))),
+    max_queue=int(os.getenv("PASSWORD_QUEUE", "64")),
+)
+
+
+async def hash_password(password: str) -> str:
+    return await password_pool.run(hash_in_worker, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password. Returns (valid, new hash), the new hash being set when
+    the stored one uses a lower cost than BCRYPT_ROUNDS.
+    """
+    return await password_pool.run(verify_in_worker, password, hashed_password)
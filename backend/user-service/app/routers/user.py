@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from pymongo.collection import Collection
-from pymongo import MongoClient
-from passlib.context import CryptContext
-import os
 import logging
 from typing import List, Optional
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.database import get_user_collection
+from app.leaderboard import InvalidCursor, leaderboard_page
+from app import cache
+from app.passwords import PasswordPoolSaturated, hash_password, verify_password, password_pool
 
 class UserCreate(BaseModel):
     name: str
@@ -18,7 +20,6 @@ class UserResponse(BaseModel):
     _id: Optional[str] = Field(None, alias="_id")  # MongoDB ObjectId, alias to handle _id correctly
     name: str
     email: str
-    hashed_password: Optional[str] = None  # Only for internal use, don't send in the response
     score: int
 
     class Config:
@@ -31,47 +32,45 @@ class UserResponse(BaseModel):
 user_router = APIRouter(prefix="/users", tags=["users"])
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
-# MongoDB configuration
-mongo_uri = os.getenv("MONGO_URI", "mongodb://mongo:27017")
-client = MongoClient(mongo_uri)
-db = client["user_db"]
-
 # Logger configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing runs in a process pool (see app/passwords.py)
+def password_busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Too many password checks, please retry.",
+                         headers={"Retry-After": "1"})
+
+rehashed_passwords = 0
 
-def get_user_collection() -> Collection:
-    return db["users"]
+# Listes d'utilisateurs : les documents sont lus avec exactement les champs de UserResponse
+# et envoyés tels quels (ORJSONResponse), sans revalidation par le modèle de réponse
+# (response_model reste pour la documentation OpenAPI)
 
 # Route to get all users
 @user_router.get("/", response_model=List[UserResponse])
-def get_users(user_collection=Depends(get_user_collection)):
+async def get_users(user_collection=Depends(get_user_collection)):
     logger.info("Request received to get all users")
-    users = list(user_collection.find())
-    
-    # Convert ObjectId to string for all users
-    for user in users:
-        user["_id"] = str(user["_id"])  # Convert ObjectId to string
-    
+    users = await user_collection.find({}, cache.USER_PROJECTION).to_list(None)
     logger.info(f"Retrieved {len(users)} users")
-    return users
+    return ORJSONResponse(users)
 
 
 # Route to register a user
 @user_router.post("/", response_model=UserResponse)
-def create_user(user: UserCreate, user_collection=Depends(get_user_collection)):
+async def create_user(user: UserCreate, user_collection=Depends(get_user_collection)):
     logger.info("Register user request received")
 
     # Check if the email or name already exists
-    if user_collection.find_one({"email": user.email}) or user_collection.find_one({"name": user.name}):
+    if await user_collection.find_one({"$or": [{"email": user.email}, {"name": user.name}]}, {"_id": 1}):
         logger.error("Email or name already registered")
         raise HTTPException(status_code=400, detail="Email or name already registered")
     
     # Hash the password
-    hashed_password = pwd_context.hash(user.password)  # Hash the plain password
+    try:
+        hashed_password = await hash_password(user.password)  # Hash the plain password
+    except PasswordPoolSaturated:
+        raise password_busy()
     
     # Prepare user data for insertion into MongoDB
     user_dict = user.dict(exclude={"password"})  # Exclude plain password from the data going into DB
@@ -80,7 +79,11 @@ def create_user(user: UserCreate, user_collection=Depends(get_user_collection)):
     logger.info(f"Inserting user data into database: {user_dict}")
     
     # Insert user into the database
-    result = user_collection.insert_one(user_dict)
+    try:
+        result = await user_collection.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Same name or email registered concurrently (unique indexes)
+        raise HTTPException(status_code=400, detail="Email or name already registered")
 
     # Check if the insertion was successful
     if result.acknowledged:
@@ -93,7 +96,7 @@ def create_user(user: UserCreate, user_collection=Depends(get_user_collection)):
 
 
 @user_router.delete("/{user_id}", status_code=204)
-def delete_user(user_id: str, user_collection=Depends(get_user_collection)):
+async def delete_user(user_id: str, user_collection=Depends(get_user_collection)):
     """
     Supprime un utilisateur par son ID.
     """
@@ -105,7 +108,7 @@ def delete_user(user_id: str, user_collection=Depends(get_user_collection)):
     logger.info(f"Delete request received for user ID: {user_id}")
 
     # Supprime l'utilisateur
-    result = user_collection.delete_one({"_id": ObjectId(user_id)})
+    result = await user_collection.delete_one({"_id": ObjectId(user_id)})
 
     # Vérifie si un utilisateur a été supprimé
     if result.deleted_count == 1:
@@ -118,39 +121,74 @@ def delete_user(user_id: str, user_collection=Depends(get_user_collection)):
 
 # Route to login a user
 @auth_router.post("/")
-def login_user(
+async def login_user(
     user_collection=Depends(get_user_collection),
     name: str = Body(..., embed=True),
     password: str = Body(..., embed=True)
 ):
+    global rehashed_passwords
     logger.info(f"Login request received for name={name}")
-    db_user = user_collection.find_one({"name": name})
-    if db_user and pwd_context.verify(password, db_user["hashed_password"]):
-        logger.info("Login successful")
-        return {"success": True, "message": "Login successful!"}
+    db_user = await user_collection.find_one({"name": name}, {"hashed_password": 1})
+    if db_user:
+        try:
+            valid, new_hash = await verify_password(password, db_user["hashed_password"])
+        except PasswordPoolSaturated:
+            raise password_busy()
+        if valid:
+            if new_hash is not None:
+                # Hash made with a lower BCRYPT_ROUNDS: store it again at the current cost
+                # (only if unchanged: concurrent logins of the same user rehash it once)
+                result = await user_collection.update_one(
+                    {"_id": db_user["_id"], "hashed_password": db_user["hashed_password"]},
+                    {"$set": {"hashed_password": new_hash}},
+                )
+                rehashed_passwords += result.modified_count
+            logger.info("Login successful")
+            return {"success": True, "message": "Login successful!"}
     logger.error("Invalid username or password")
     raise HTTPException(status_code=400, detail="Invalid username or password")
 
 # Route to get the score of a user
 @user_router.get("/score/{name}", response_model=int)
-def get_user_score(name: str, user_collection=Depends(get_user_collection)):
+async def get_user_score(name: str, user_collection=Depends(get_user_collection)):
     logger.info(f"Request received to get score for user {name}")
-    user = user_collection.find_one({"name": name})
-    if user:
-        return user["score"]
+    score = await user_collection.score(name)
+    if score is not None:
+        return score
     else:
         logger.error(f"User {name} not found")
         raise HTTPException(status_code=404, detail="User not found")
 
+# Route to get the leaderboard, best scores first, one page at a time
+@user_router.get("/leaderboard")
+async def get_leaderboard(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user_collection=Depends(get_user_collection),
+):
+    """
+    Page of {"name", "score"} entries. Pass the returned "next" as cursor to
+    get the following page; it is null on the last page.
+    """
+    try:
+        return ORJSONResponse(await leaderboard_page(user_collection, cursor, limit))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 # Route to get all users' scores
 @user_router.get("/scores", response_model=List[UserResponse])
-def get_all_scores(user_collection=Depends(get_user_collection)):
+async def get_all_scores(user_collection=Depends(get_user_collection)):
     logger.info("Request received to get all users' scores")
-    users = list(user_collection.find({}, {"name": 1, "email": 1, "score": 1}))
-    
-    # Convert ObjectId to string for all users
-    for user in users:
-        user["_id"] = str(user["_id"])  # Convert ObjectId to string
-    
+    users = await user_collection.scores()
     logger.info(f"Retrieved scores for {len(users)} users")
-    return users
\ No newline at end of file
+    return ORJSONResponse(users)
+
+# Route to get the score cache counters (entries, hit ratio, change stream state)
+@user_router.get("/cache/stats")
+def get_cache_stats():
+    return cache.stats()
+
+# Route to get the password pool counters (queue depth, rejections)
+@auth_router.get("/stats")
+def get_auth_stats():
+    return {**password_pool.stats(), "rehashed": rehashed_passwords}
@@ -0,0 +1,66 @@
+"""
+Serialization cost of the user lists and of the leaderboard, validated vs lean.
+
+Run from backend/user-service:  python -m benchmarks.serialization [users]
+
+No database is needed: the documents the handlers read are generated. For
+each endpoint the same documents are rendered the way FastAPI renders data
+returned by a handler (validation by the response_model when there is one,
+jsonable_encoder, stdlib json) and the way the handler now answers
+(ORJSONResponse of the documents). Both bodies must decode to the same JSON.
+"""
+import json
+import random
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.leaderboard import encode_cursor
+from app.main import app
+
+
+def validated_body(path: str, content) -> bytes:
+    """
+    Body rendered as FastAPI does for a handler returning data.
+    """
+    route = next(route for route in app.routes if route.path == path and "GET" in route.methods)
+    if route.response_field is not None:
+        content, errors = route.response_field.validate(content, {}, loc=("response",))
+        assert not errors, errors
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def compare(name: str, repeat: int, validated, lean):
+    assert json.loads(validated()) == json.loads(lean()), f"{name}: bodies differ"
+    timings = []
+    for render in (validated, lean):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = render()
+        timings.append((time.perf_counter() - start) / repeat * 1e3)
+    print(f"{name:<36}{len(body):>10} B{timings[0]:>12.3f} ms{timings[1]:>12.3f} ms{timings[0] / timings[1]:>8.1f}x")
+
+
+def main(count: int):
+    rng = random.Random(42)
+    # Documents as read with cache.USER_PROJECTION
+    users = [{"name": f"player{index}", "email": f"player{index}@example.com", "score": rng.randint(0, 5000)}
+             for index in range(count)]
+    top = sorted(({"name": user["name"], "score": user["score"]} for user in users),
+                 key=lambda user: (-user["score"], user["name"]))[:50]
+    page = {"entries": top, "next": encode_cursor(top[-1])}
+    repeat = max(1, 20000 // count)
+
+    print(f"{'endpoint':<36}{'body':>12}{'validated':>15}{'lean':>15}{'gain':>9}")
+    compare(f"GET /users/ ({count} users)", repeat,
+            lambda: validated_body("/users/", users), lambda: ORJSONResponse(users).body)
+    compare(f"GET /users/scores ({count} users)", repeat,
+            lambda: validated_body("/users/scores", users), lambda: ORJSONResponse(users).body)
+    compare("GET /users/leaderboard (50 entries)", 2000,
+            lambda: validated_body("/users/leaderboard", page), lambda: ORJSONResponse(page).body)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,197 @@
+"""
+Throughput of GET /users/scores and POST /auth/ against a local mongod.
+
+Run from backend/user-service:
+    python -m benchmarks.users_load --mongo mongodb://localhost:27017 [--users 1000] [--clients 50]
+
+A uvicorn server is started on --port with MONGO_DB=--db (a scratch database
+seeded with --users users, dropped at the end) unless --url points to a
+running one. To compare two versions of the service, run the benchmark once
+per checkout: the requests only use the public API. Versions that ignore
+MONGO_DB always use user_db: pass --db user_db, against a disposable mongod
+only (the database is dropped at the end).
+
+Each endpoint is hammered for --duration seconds by --clients concurrent
+keep-alive connections; the report gives requests/s and latency percentiles.
+A last "login storm" scenario measures the latency of GET /users/score/{name}
+(one request every 20 ms) while the clients hammer POST /auth/.
+"""
+from typing import Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+
+from passlib.context import CryptContext
+from pymongo import MongoClient
+
+PASSWORD = "benchmark-password"
+
+
+class HttpConnection:
+    """
+    Minimal keep-alive HTTP/1.1 client, enough for the JSON user API.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, bytes]:
+        try:
+            return await self._request(method, path, body)
+        except (ConnectionError, IndexError, asyncio.IncompleteReadError):
+            # Keep-alive connection closed by the server: reconnect once
+            self.close()
+            return await self._request(method, path, body)
+
+    async def _request(self, method: str, path: str, body: Optional[dict]) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def seed(mongo_uri: str, db: str, users: int):
+    # One hash for every user: seeding through POST /users/ would time bcrypt, not the service
+    hashed_password = CryptContext(schemes=["bcrypt"]).hash(PASSWORD)
+    collection = MongoClient(mongo_uri)[db]["users"]
+    collection.drop()
+    collection.insert_many([
+        {"name": f"user{index}", "email": f"user{index}@example.com", "hashed_password": hashed_password,
+         "score": index % 500}
+        for index in range(users)
+    ])
+
+
+async def probe(host: str, port: int, duration: float, path: str) -> list:
+    connection = HttpConnection(host, port)
+    latencies = []
+    stop = time.monotonic() + duration
+    try:
+        while time.monotonic() < stop:
+            start = time.monotonic()
+            await connection.request("GET", path)
+            latencies.append(time.monotonic() - start)
+            await asyncio.sleep(0.02)
+    finally:
+        connection.close()
+    return latencies
+
+
+def percentiles(latencies: list) -> str:
+    latencies = sorted(latencies)
+    return (f"median {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+
+async def hammer(host: str, port: int, clients: int, duration: float, request) -> Tuple[int, list, int]:
+    latencies = []
+    errors = [0]
+    stop = time.monotonic() + duration
+
+    async def client(index: int):
+        connection = HttpConnection(host, port)
+        count = 0
+        try:
+            while time.monotonic() < stop:
+                method, path, body = request(index, count)
+                start = time.monotonic()
+                status, _ = await connection.request(method, path, body)
+                latencies.append(time.monotonic() - start)
+                if status != 200:
+                    errors[0] += 1
+                count += 1
+        finally:
+            connection.close()
+
+    await asyncio.gather(*[client(index) for index in range(clients)])
+    return len(latencies), latencies, errors[0]
+
+
+def start_server(port: int, mongo_uri: str, db: str) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log", "--backlog", "4096"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, "MONGO_URI": mongo_uri, "MONGO_DB": db},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    time.sleep(2)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="user-service throughput: /users/scores and /auth/")
+    parser.add_argument("--mongo", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="user_db_benchmark", help="scratch database seeded and dropped")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15, help="seconds per endpoint")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--url", help="running user-service using --db (default: start one)")
+    args = parser.parse_args()
+
+    seed(args.mongo, args.db, args.users)
+    server = None
+    if args.url is None:
+        server = start_server(args.port, args.mongo, args.db)
+        args.url = f"http://127.0.0.1:{args.port}"
+    parsed = urllib.parse.urlparse(args.url)
+
+    scenarios = {
+        "GET /users/scores": lambda index, count: ("GET", "/users/scores", None),
+        "POST /auth/": lambda index, count: (
+            "POST", "/auth/", {"name": f"user{(index * 7919 + count) % args.users}", "password": PASSWORD}
+        ),
+    }
+    loop = asyncio.get_event_loop()
+    host, port = parsed.hostname, parsed.port or 80
+    try:
+        for name, request in scenarios.items():
+            count, latencies, errors = loop.run_until_complete(
+                hammer(host, port, args.clients, args.duration, request)
+            )
+            print(f"{name:>18}: {count / args.duration:.0f} req/s, {percentiles(latencies)}, {errors} errors")
+
+        (count, _, errors), latencies = loop.run_until_complete(asyncio.gather(
+            hammer(host, port, args.clients, args.duration, scenarios["POST /auth/"]),
+            probe(host, port, args.duration, "/users/score/user0"),
+        ))
+        print(f"{'login storm':>18}: {count / args.duration:.0f} logins/s ({errors} errors), "
+              f"GET /users/score/{{name}} {percentiles(latencies)}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        MongoClient(args.mongo).drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
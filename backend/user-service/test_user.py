@@ -0,0 +1,328 @@
+from fastapi.testclient import TestClient
+from pymongo.errors import OperationFailure
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+import os
+import pytest
+import time
+
+# bcrypt au coût minimal et hachage sur le pool de threads, avant d'importer l'application
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["PASSWORD_WORKERS"] = "0"
+
+from app import cache, database, leaderboard, passwords
+from app.cache import CachedUserCollection, LRUCache, MISSING, apply_change
+from app.leaderboard import InvalidCursor, TopCache, decode_cursor, encode_cursor, leaderboard_page
+from app.main import app
+from app.passwords import PasswordPool, PasswordPoolSaturated, hash_in_worker, verify_in_worker
+
+
+def mock_collection(find_one=None):
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=find_one)
+    collection.create_index = AsyncMock()
+    return collection
+
+
+def matches(document: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict):
+            for operator, value in condition.items():
+                if not {"$lt": document[field] < value, "$gt": document[field] > value}[operator]:
+                    return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda document: document[field], reverse=direction == -1)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents
+
+
+class FakeUsers:
+    """
+    Collection users en mémoire, pour les find() du classement ({} et after_query).
+    """
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        fields = [field for field, shown in projection.items() if shown]
+        return FakeCursor([{field: user[field] for field in fields} for user in self.users if matches(user, query)])
+
+
+def client_for(collection) -> TestClient:
+    """
+    Client de l'application dont les routes lisent `collection` (sans démarrage : pas de MongoDB).
+    """
+    app.dependency_overrides[database.get_user_collection] = lambda: CachedUserCollection(collection)
+    return TestClient(app)
+
+
+def teardown_function():
+    app.dependency_overrides.clear()
+    cache.invalidate()
+
+
+def test_create_indexes():
+    collection = mock_collection()
+    with patch.object(database, "get_user_collection", return_value=collection):
+        asyncio.run(database.create_indexes())
+    calls = [(call.args[0], call.kwargs) for call in collection.create_index.call_args_list]
+    assert calls == [
+        ([("name", 1)], {"unique": True}),
+        # sparse : les joueurs créés par le game-service n'ont pas d'email
+        ([("email", 1)], {"unique": True, "sparse": True}),
+        ([("score", -1), ("name", 1)], {}),
+    ]
+
+
+def test_create_indexes_failure_does_not_stop_the_others():
+    collection = mock_collection()
+    collection.create_index.side_effect = [None, OperationFailure("E11000 duplicate key"), None]
+    with patch.object(database, "get_user_collection", return_value=collection), \
+            patch.object(database.logger, "error") as log_error:
+        asyncio.run(database.create_indexes())
+    assert collection.create_index.call_count == 3
+    log_error.assert_called_once()
+    assert "email" in log_error.call_args.args[0]
+
+
+def test_get_user_score_reads_by_name():
+    collection = mock_collection(find_one={"score": 42})
+    response = client_for(collection).get("/users/score/Alice")
+    assert response.status_code == 200
+    assert response.json() == 42
+    collection.find_one.assert_awaited_once_with({"name": "Alice"}, {"_id": 0, "score": 1})
+
+
+def test_get_user_score_not_found():
+    response = client_for(mock_collection(find_one=None)).get("/users/score/Nobody")
+    assert response.status_code == 404
+
+
+def test_create_user_already_registered():
+    collection = mock_collection(find_one={"_id": "64b000000000000000000000"})
+    collection.insert_one = AsyncMock()
+    response = client_for(collection).post(
+        "/users/", json={"name": "Alice", "email": "alice@example.com", "password": "secret"}
+    )
+    assert response.status_code == 400
+    # Un seul aller-retour, sur les index name et email
+    collection.find_one.assert_awaited_once_with(
+        {"$or": [{"email": "alice@example.com"}, {"name": "Alice"}]}, {"_id": 1}
+    )
+    collection.insert_one.assert_not_awaited()
+
+
+def test_password_pool_without_workers_uses_threads():
+    pool = PasswordPool(workers=0, max_queue=4)
+    pool.start()
+    assert pool.executor is None  # Pas de processus : pool de threads par défaut de la boucle
+
+    async def hash_and_verify():
+        hashed = await pool.run(hash_in_worker, "secret")
+        return await pool.run(verify_in_worker, "secret", hashed), await pool.run(verify_in_worker, "wrong", hashed)
+
+    assert asyncio.run(hash_and_verify()) == ((True, None), (False, None))
+    assert pool.stats()["completed"] == 3 and pool.pending == 0
+    pool.shutdown()
+
+
+def test_password_pool_saturated():
+    # Sans processus, un calcul en cours et un en attente au plus
+    pool = PasswordPool(workers=0, max_queue=1)
+
+    async def burst():
+        return await asyncio.gather(*[pool.run(time.sleep, 0.05) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert results[:2] == [None, None]
+    assert isinstance(results[2], PasswordPoolSaturated)
+    assert (pool.stats()["rejected"], pool.stats()["completed"], pool.stats()["peak_queued"]) == (1, 2, 1)
+
+
+def test_login_with_password_pool():
+    hashed = hash_in_worker("secret")
+    collection = mock_collection(find_one={"_id": "64b000000000000000000000", "hashed_password": hashed})
+    client = client_for(collection)
+    assert client.post("/auth/", json={"name": "Alice", "password": "secret"}).json()["success"]
+    assert client.post("/auth/", json={"name": "Alice", "password": "wrong"}).status_code == 400
+
+
+def test_login_password_pool_saturated():
+    collection = mock_collection(find_one={"_id": "64b000000000000000000000", "hashed_password": "x"})
+    with patch.object(passwords.password_pool, "run", AsyncMock(side_effect=PasswordPoolSaturated())):
+        response = client_for(collection).post("/auth/", json={"name": "Alice", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def ranked_users():
+    # Beaucoup d'égalités de score : départagées par le nom
+    names = ["Zoe", "Bob", "Eve", "Alice", "Dan", "Carol", "Yann", "Fred", "Gus", "Hugo", "Ines"]
+    return [{"name": name, "email": f"{name}@example.com", "score": [50, 20, 50, 20, 10][index % 5]}
+            for index, name in enumerate(names)]
+
+
+def read_all_pages(collection, limit: int):
+    entries, cursor, pages = [], None, 0
+    while True:
+        page = asyncio.run(leaderboard_page(collection, cursor, limit))
+        entries += page["entries"]
+        pages += 1
+        cursor = page["next"]
+        if cursor is None:
+            return entries, pages
+
+
+def test_leaderboard_pages_follow_score_then_name():
+    users = ranked_users()
+    expected = sorted(({"name": user["name"], "score": user["score"]} for user in users),
+                      key=lambda entry: (-entry["score"], entry["name"]))
+    # Début du classement en cache (4 lignes), pages suivantes lues sur l'index avec after_query
+    for top in (TopCache(4, 60), TopCache(100, 60)):
+        with patch.object(leaderboard, "top_cache", top):
+            for limit in (1, 3, 4, 11, 50):
+                assert read_all_pages(FakeUsers(users), limit) == (expected, max(1, -(-len(users) // limit)))
+
+
+def test_leaderboard_cursor_resumes_after_ties():
+    collection = FakeUsers(ranked_users())
+    with patch.object(leaderboard, "top_cache", TopCache(2, 60)):
+        first = asyncio.run(leaderboard_page(collection, None, 4))
+        assert [entry["name"] for entry in first["entries"]] == ["Carol", "Eve", "Fred", "Ines"]
+        assert decode_cursor(first["next"]) == (50, "Ines")
+        second = asyncio.run(leaderboard_page(collection, first["next"], 2))
+    # Même score que le curseur et nom après, puis les scores inférieurs
+    assert collection.queries[-1] == {"$or": [{"score": {"$lt": 50}}, {"score": 50, "name": {"$gt": "Ines"}}]}
+    assert second["entries"] == [{"name": "Zoe", "score": 50}, {"name": "Alice", "score": 20}]
+
+
+def test_leaderboard_top_cache_answers_first_pages():
+    collection = FakeUsers(ranked_users())
+    with patch.object(leaderboard, "top_cache", TopCache(100, 60)) as top:
+        read_all_pages(collection, 3)
+        read_all_pages(collection, 5)
+        assert len(collection.queries) == 1  # Le classement complet tient dans le cache
+        assert (top.hits, top.misses) == (7, 0)
+
+
+def test_leaderboard_invalid_cursor():
+    for cursor in ("not base64!", encode_cursor({"score": "50", "name": "Eve"})[:-2], "WzUwXQ=="):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor)
+    response = client_for(FakeUsers(ranked_users())).get("/users/leaderboard?cursor=WzUwXQ==")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_leaderboard_route():
+    with patch.object(leaderboard, "top_cache", TopCache(100, 60)):
+        client = client_for(FakeUsers(ranked_users()))
+        page = client.get("/users/leaderboard?limit=2").json()
+        assert [entry["name"] for entry in page["entries"]] == ["Carol", "Eve"]
+        page = client.get(f"/users/leaderboard?limit=2&cursor={page['next']}").json()
+        assert [entry["name"] for entry in page["entries"]] == ["Fred", "Ines"]
+    assert client.get("/users/leaderboard?limit=0").status_code == 422
+
+
+def users_collection(score=42):
+    collection = mock_collection(find_one={"score": score})
+    collection.find.return_value.to_list = AsyncMock(return_value=[{"name": "Alice", "email": "a@b.c", "score": score}])
+    for method in ("insert_one", "update_one", "delete_one"):
+        setattr(collection, method, AsyncMock())
+    return collection
+
+
+def test_score_cache_invalidated_by_writes():
+    collection = users_collection()
+    with patch.object(database, "get_db", return_value={"users": collection}):
+        client = TestClient(app)
+        assert client.get("/users/score/Alice").json() == 42
+        assert client.get("/users/score/Alice").json() == 42
+        assert client.get("/users/scores").json()[0]["score"] == 42
+        assert client.get("/users/scores").json()[0]["score"] == 42
+        assert (collection.find_one.await_count, collection.find.call_count) == (1, 1)
+
+        # Écriture passant par get_user_collection : les lectures suivantes vont à la base
+        users = database.get_user_collection()
+        collection.find_one.return_value = {"score": 45}
+        collection.find.return_value.to_list.return_value = [{"name": "Alice", "email": "a@b.c", "score": 45}]
+        asyncio.run(users.update_one({"name": "Alice"}, {"$inc": {"score": 3}}))
+        assert client.get("/users/score/Alice").json() == 45
+        assert client.get("/users/scores").json()[0]["score"] == 45
+        assert (collection.find_one.await_count, collection.find.call_count) == (2, 2)
+
+        # Mot de passe rehaché : aucune réponse en cache ne change
+        asyncio.run(users.update_one({"_id": 1}, {"$set": {"hashed_password": "x"}}))
+        client.get("/users/score/Alice")
+        client.get("/users/scores")
+        assert (collection.find_one.await_count, collection.find.call_count) == (2, 2)
+
+        asyncio.run(users.insert_one({"name": "Bob", "score": 0}))
+        client.get("/users/score/Alice")  # Autre nom : toujours en cache
+        client.get("/users/scores")
+        assert (collection.find_one.await_count, collection.find.call_count) == (2, 3)
+
+        asyncio.run(users.delete_one({"_id": 1}))  # Nom inconnu : tout est invalidé
+        client.get("/users/score/Alice")
+        assert collection.find_one.await_count == 3
+
+
+def test_score_read_before_invalidation_is_not_cached():
+    collection = users_collection()
+    users = CachedUserCollection(collection)
+
+    async def find_one_then_write(*args):
+        cache.invalidate("Alice")  # Écriture pendant la lecture
+        return {"score": 42}
+
+    collection.find_one.side_effect = find_one_then_write
+    assert asyncio.run(users.score("Alice")) == 42
+    assert cache.score_cache.get("Alice") is MISSING
+
+
+def test_lru_cache_ttl_and_size():
+    now = [0]
+    lru = LRUCache(max_size=2, ttl=5, clock=lambda: now[0])
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)  # "b" est le moins récemment lu
+    assert lru.get("b") is MISSING
+    now[0] = 6
+    assert lru.get("a") is MISSING and lru.get("c") is MISSING
+    assert lru.stats()["hits"] == 1 and lru.stats()["misses"] == 3
+
+
+def test_change_stream_events_invalidate():
+    cache.score_cache.put("Alice", 42)
+    cache.score_cache.put("Bob", 7)
+    apply_change({"operationType": "update", "fullDocument": {"name": "Alice"},
+                  "updateDescription": {"updatedFields": {"hashed_password": "x"}, "removedFields": []}})
+    assert cache.score_cache.get("Alice") == 42
+    apply_change({"operationType": "update", "fullDocument": {"name": "Alice"},
+                  "updateDescription": {"updatedFields": {"score": 50}, "removedFields": []}})
+    assert cache.score_cache.get("Alice") is MISSING and cache.score_cache.get("Bob") == 7
+    apply_change({"operationType": "delete", "documentKey": {"_id": 1}})
+    assert cache.score_cache.get("Bob") is MISSING
@@ -0,0 +1,41 @@
+"""
+Chaque service de backend/ a son propre package `app`, et pytest lance les
+tests de tous les services dans le même processus : les modules `app` du
+service d'un test sont remis dans sys.modules avant d'importer son fichier de
+tests et avant chacun de ses tests (pour les patch("app....") notamment).
+"""
+import os
+import sys
+
+import pytest
+
+service_apps = {}  # Dossier du service -> ses modules app
+current_service = None
+
+
+def use_service_app(service_dir: str):
+    global current_service
+    if service_dir == current_service:
+        return
+    loaded = {name: sys.modules.pop(name) for name in list(sys.modules) if name == "app" or name.startswith("app.")}
+    if current_service is not None:
+        service_apps[current_service] = loaded
+    sys.modules.update(service_apps.get(service_dir, {}))
+    if service_dir not in sys.path:
+        sys.path.insert(0, service_dir)
+    current_service = service_dir
+
+
+def service_of(path) -> str:
+    return os.path.dirname(str(path))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collectstart(collector):
+    if isinstance(collector, pytest.Module):
+        use_service_app(service_of(collector.fspath))
+
+
+@pytest.fixture(autouse=True)
+def service_app(request):
+    use_service_app(service_of(request.node.fspath))
@@ -46,7 +46,13 @@ document.addEventListener('DOMContentLoaded', function() {
     let isOnlineGame = false;
     let onlineGameCode = null;
     let localPlayerId = 1;
-    let pollIntervalId = null;
+    let pollToken = null;
+    const LONG_POLL_WAIT_MS = 25000;
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+    let gameSocket = null;
+    let onlineState = null;
+    let lastBoardHash = null;
+    let opponentAnnounced = false;
     let gameOver = false;
     game_difficulty = null;
     aiGame = false;
@@ -129,6 +135,10 @@ document.addEventListener('DOMContentLoaded', function() {
 
             if (response.ok) {
                 const data = await response.json();
+                // Simuler le temps de réflexion de l'IA côté client
+                if (data.think_ms) {
+                    await new Promise(resolve => setTimeout(resolve, data.think_ms));
+                }
                 return data.column; // Supposons que l'API renvoie la colonne à jouer
             } else {
                 const errorData = await response.json();
@@ -174,7 +184,8 @@ document.addEventListener('DOMContentLoaded', function() {
               createBoard({});
               previousBoardState = blankBoard(rows, cols);
 
-              pollForOpponent(gameCode);
+              opponentAnnounced = false;
+              listenForMoves(gameCode);
               updateOnlineScoreboard();
           } else {
               const err = await response.json();
@@ -229,88 +240,162 @@ document.addEventListener('DOMContentLoaded', function() {
   });
 
 
-    //WAIT for Opponent
-    function pollForOpponent(gameCode) {
-        const intervalId = setInterval(async () => {
-            try {
-                const resp = await fetch(`${BASE_URL}/game-online/${gameCode}`);
-                if (!resp.ok) return;
-                const data = await resp.json();
-
-                if (data.player1) player1Name = data.player1;
-                if (data.player2) player2Name = data.player2;
-
-                if (data.status === 'ready') {
-                    clearInterval(intervalId);
-                    messageElement.textContent = `Le joueur ${player2Name} a rejoint !`;
-                    pollForMoves(gameCode);
+    // LISTEN for the game events: WebSocket push channel, REST polling as fallback
+    function listenForMoves(gameCode) {
+        if (pollToken || (gameSocket && gameSocket.readyState <= WebSocket.OPEN)) return;
+        lastBoardHash = null;
+        if (!('WebSocket' in window)) {
+            pollForMoves(gameCode);
+            return;
+        }
 
-                    updateOnlineScoreboard();
-                }
-            } catch (err) {
-                console.error("pollForOpponent:", err);
+        const socket = new WebSocket(`${BASE_URL.replace(/^http/, 'ws')}/game-online/${gameCode}/ws`);
+        gameSocket = socket;
+        socket.onmessage = (message) => handleGameEvent(JSON.parse(message.data));
+        socket.onclose = () => {
+            if (gameSocket !== socket) return; // Fermée volontairement
+            gameSocket = null;
+            onlineState = null;
+            if (isOnlineGame && onlineGameCode === gameCode) {
+                pollForMoves(gameCode);
             }
-        }, 2000);
+        };
     }
 
-    //  MAIN ONLINE POLLING
-    function pollForMoves(gameCode) {
-      console.log("pollformoves");
-      if (pollIntervalId) {
-          clearInterval(pollIntervalId);
-      }
-
-      let previousBoardHash = null;
-
-      pollIntervalId = setInterval(async () => {
-          try {
-              const resp = await fetch(`${BASE_URL}/game-online/${gameCode}`);
-              if (!resp.ok) return;
-              const data = await resp.json();
+    function closeGameSocket() {
+        if (gameSocket) {
+            const socket = gameSocket;
+            gameSocket = null;
+            socket.close();
+        }
+        onlineState = null;
+        pollToken = null;
+    }
 
-              if (data.player1) player1Name = data.player1;
-              if (data.player2) player2Name = data.player2;
+    // APPLY an event pushed by the server to the local copy of the game
+    function handleGameEvent(event) {
+        if (event.type === 'state') {
+            onlineState = event;
+        } else if (!onlineState) {
+            return;
+        } else if (event.type === 'join') {
+            onlineState.player2 = event.player2;
+            onlineState.status = event.status;
+            updateOnlineScoreboard();
+        } else if (event.type === 'move') {
+            if (event.moves <= onlineState.moves) return; // Déjà dans l'état reçu
+            onlineState.board = onlineState.board.map(row => [...row]);
+            onlineState.board[event.row][event.column] = event.player_id;
+            onlineState.moves = event.moves;
+            onlineState.current_turn = event.current_turn;
+            if (event.status === 'active') onlineState.status = event.status;
+        } else if (event.type === 'end') {
+            onlineState.status = event.status;
+            if (event.winner_id) onlineState.winner_id = event.winner_id;
+        } else if (event.type === 'reset') {
+            onlineState.board = blankBoard(rows, cols);
+            onlineState.moves = 0;
+            onlineState.status = event.status;
+            onlineState.current_turn = event.current_turn;
+            delete onlineState.winner_id;
+        } else if (event.type === 'closed') {
+            gameSocket = null;
+            onlineState = null;
+            boardElement.style.pointerEvents = "none";
+            messageElement.textContent = "La partie a été fermée.";
+            return;
+        }
+        applyOnlineState(onlineState);
+    }
 
-              // Check status
-              if (data.status === "won") {
-                  if (!gameOver) {
-                      gameOver = true;
-                      renderOnlineBoard(data);
-                      celebrateWinOffline(data.winner_id);
-                  }
-              } else if (data.status === "draw") {
-                  if (!gameOver) {
-                      gameOver = true;
-                      renderOnlineBoard(data);
-                      messageElement.textContent = "Match nul !";
-                      boardElement.style.pointerEvents = "none";
-                      restartButton.style.display = "block";
-                      menuButton.style.display = "block";
-                  }
-              } else if (data.status === "active") {
-                  if (gameOver) {
-                      gameOver = false;
-                      boardElement.style.pointerEvents = "auto";
-                      restartButton.style.display = "none";
-                      menuButton.style.display = "none";
-                      messageElement.textContent = "La partie est réinitialisée !";
-                  }
+    // Current state of the online game: local copy when the WebSocket is open, GET otherwise
+    async function fetchOnlineState(gameCode) {
+        if (gameSocket && gameSocket.readyState === WebSocket.OPEN && onlineState) {
+            return onlineState;
+        }
+        const resp = await fetch(`${BASE_URL}/game-online/${gameCode}`);
+        if (!resp.ok) return null;
+        return await resp.json();
+    }
 
-                  // Vérifier si le plateau a changé avant de le rendre
-                  const currentBoardHash = JSON.stringify(data.board); // Convertir le plateau en chaîne pour comparaison
-                  if (currentBoardHash !== previousBoardHash) {
-                      renderOnlineBoard(data);
-                      previousBoardHash = currentBoardHash; // Mettre à jour le hash
+    //  ONLINE LONG POLLING (fallback when the WebSocket is unavailable)
+    // The server holds the request until the game changes (ETag / If-None-Match)
+    function pollForMoves(gameCode) {
+      console.log("pollformoves");
+      const token = {};
+      pollToken = token;
+      lastBoardHash = null;
+      let etag = null;
+
+      (async () => {
+          while (pollToken === token) {
+              try {
+                  const resp = await fetch(`${BASE_URL}/game-online/${gameCode}?wait=${LONG_POLL_WAIT_MS}`, {
+                      headers: etag ? { 'If-None-Match': etag } : {}
+                  });
+                  if (pollToken !== token) break;
+                  if (resp.status === 304) continue;
+                  if (!resp.ok) {
+                      await sleep(2000);
+                      continue;
                   }
-
-                  updateOnlineTurn(data);
+                  etag = resp.headers.get('ETag');
+                  applyOnlineState(await resp.json());
+              } catch (err) {
+                  console.error("pollForMoves error:", err);
+                  await sleep(2000);
               }
-          } catch (err) {
-              console.error("pollForMoves error:", err);
           }
-      }, 2000);
+      })();
   }
 
+    // UPDATE the page from the online game state
+    function applyOnlineState(data) {
+        if (data.player1) player1Name = data.player1;
+        if (data.player2) player2Name = data.player2;
+
+        // Check status
+        if (data.status === "ready") {
+            if (localPlayerId === 1 && !opponentAnnounced) {
+                opponentAnnounced = true;
+                messageElement.textContent = `Le joueur ${player2Name} a rejoint !`;
+                updateOnlineScoreboard();
+            }
+        } else if (data.status === "won") {
+            if (!gameOver) {
+                gameOver = true;
+                renderOnlineBoard(data);
+                celebrateWinOffline(data.winner_id);
+            }
+        } else if (data.status === "draw") {
+            if (!gameOver) {
+                gameOver = true;
+                renderOnlineBoard(data);
+                messageElement.textContent = "Match nul !";
+                boardElement.style.pointerEvents = "none";
+                restartButton.style.display = "block";
+                menuButton.style.display = "block";
+            }
+        } else if (data.status === "active") {
+            if (gameOver) {
+                gameOver = false;
+                boardElement.style.pointerEvents = "auto";
+                restartButton.style.display = "none";
+                menuButton.style.display = "none";
+                messageElement.textContent = "La partie est réinitialisée !";
+            }
+
+            // Vérifier si le plateau a changé avant de le rendre
+            const currentBoardHash = JSON.stringify(data.board); // Convertir le plateau en chaîne pour comparaison
+            if (currentBoardHash !== lastBoardHash) {
+                renderOnlineBoard(data);
+                lastBoardHash = currentBoardHash; // Mettre à jour le hash
+            }
+
+            updateOnlineTurn(data);
+        }
+    }
+
 
     // DETERMINE WHOSE TURN
     function updateOnlineTurn(data) {
@@ -374,9 +459,6 @@ document.addEventListener('DOMContentLoaded', function() {
           const data = await resp.json();
 
           gameOver = false;
-          if (pollIntervalId) {
-              clearInterval(pollIntervalId);
-          }
           boardElement.innerHTML = '';
           previousBoardState = blankBoard(rows, cols);
           createBoard({});
@@ -384,7 +466,7 @@ document.addEventListener('DOMContentLoaded', function() {
           restartButton.style.display = 'none';
           menuButton.style.display = 'none';
 
-          pollForMoves(gameCode);
+          listenForMoves(gameCode);
       } catch (error) {
           console.error("resetOnlineGame error:", error);
       }
@@ -460,9 +542,8 @@ document.addEventListener('DOMContentLoaded', function() {
     async function handleClick(col, gameData) {
         if (isOnlineGame && onlineGameCode) {
             try {
-                const st = await fetch(`${BASE_URL}/game-online/${onlineGameCode}`);
-                if (!st.ok) return;
-                const currentData = await st.json();
+                const currentData = await fetchOnlineState(onlineGameCode);
+                if (!currentData) return;
 
                 if (currentData.current_turn !== localPlayerId) {
                     alert("Pas votre tour!");
@@ -590,15 +671,11 @@ document.addEventListener('DOMContentLoaded', function() {
             createBoard({});
             previousBoardState = blankBoard(rows, cols);
 
-            if (data.status === 'ready') {
-                pollForMoves(gc);
-            } else if (data.status === 'waiting') {
+            if (data.status === 'waiting') {
                 alert("En attente d'un autre joueur...");
                 messageElement.textContent = "En attente...";
-                pollForMoves(gc);
-            } else {
-                pollForMoves(gc);
             }
+            listenForMoves(gc);
 
             updateOnlineScoreboard();
         } catch (er) {
@@ -905,11 +982,10 @@ window.placePiece = async function(column) {
     if (isOnlineGame && onlineGameCode) {
         try {
             // Vérifie si c'est le tour du joueur
-            const response = await fetch(`${BASE_URL}/game-online/${onlineGameCode}`);
-            if (!response.ok) {
+            const gameState = await fetchOnlineState(onlineGameCode);
+            if (!gameState) {
                 throw new Error('Erreur lors de la récupération de l\'état du jeu');
             }
-            const gameState = await response.json();
 
             if (gameState.current_turn !== localPlayerId) {
                 alert("Ce n'est pas votre tour!");
@@ -948,6 +1024,7 @@ menuButton.addEventListener('click', async () => {
 
 menuButton.addEventListener('click', async () => {
   // destroy the code on the server
+  closeGameSocket();
   if (isOnlineGame && onlineGameCode) {
       try {
           const resp = await fetch(`${BASE_URL}/game-online/${onlineGameCode}`, {